@@ -0,0 +1,74 @@
+"""Publication des fichiers CSS/JS de l'application en fichiers statiques.
+
+Les sources de `assets/` sont copiées dans `static/` sous un nom contenant
+l'empreinte de leur contenu (`style.3f2a9c1b0d4e.css`). Streamlit les sert
+sous `app/static/` (voir `.streamlit/config.toml`) : le navigateur les
+télécharge une seule fois, et toute modification produit une nouvelle URL.
+Les copies d'une version précédente du même fichier sont supprimées à la
+publication.
+
+Streamlit sert `app/static/` sans durée de cache : en production, le proxy
+inverse doit ajouter `Cache-Control: public, max-age=31536000,
+immutable` sur ce chemin (voir README).
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent
+DOSSIER_SOURCES = RACINE / "assets"
+DOSSIER_STATIQUE = RACINE / "static"
+PREFIXE_URL = "app/static/"
+
+
+@lru_cache(maxsize=None)
+def url_actif(nom):
+    """Publie `assets/<nom>` sous un nom haché et retourne son URL"""
+    source = DOSSIER_SOURCES / nom
+    contenu = source.read_bytes()
+    empreinte = hashlib.sha256(contenu).hexdigest()[:12]
+    cible = DOSSIER_STATIQUE / f"{source.stem}.{empreinte}{source.suffix}"
+
+    if not cible.exists():
+        DOSSIER_STATIQUE.mkdir(exist_ok=True)
+        # Écriture atomique : plusieurs workers peuvent publier en même temps
+        temporaire = cible.with_name(f"{cible.name}.{os.getpid()}.tmp")
+        temporaire.write_bytes(contenu)
+        temporaire.replace(cible)
+    _supprimer_anciennes(source, cible)
+    return PREFIXE_URL + cible.name
+
+
+def _supprimer_anciennes(source, cible):
+    """Supprime de `static/` les copies hachées de `source` autres que `cible`"""
+    motif = re.compile(rf"{re.escape(source.stem)}\.[0-9a-f]{{12}}{re.escape(source.suffix)}")
+    for chemin in DOSSIER_STATIQUE.glob(f"{source.stem}.*{source.suffix}"):
+        if chemin != cible and motif.fullmatch(chemin.name):
+            # Un autre worker a pu la supprimer entre-temps
+            chemin.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def script_chargement():
+    """Petit script qui ajoute la feuille de style et le script de défilement
+    à la page, une seule fois par onglet"""
+    css = url_actif("style.css")
+    js = url_actif("defilement.js")
+    return f"""<script>
+(function () {{
+    if (!document.querySelector('link[href="{css}"]')) {{
+        const lien = document.createElement('link');
+        lien.rel = 'stylesheet';
+        lien.href = '{css}';
+        document.head.appendChild(lien);
+    }}
+    if (!document.querySelector('script[src="{js}"]')) {{
+        const script = document.createElement('script');
+        script.src = '{js}';
+        script.defer = true;
+        document.head.appendChild(script);
+    }}
+}})();
+</script>"""
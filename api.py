@@ -0,0 +1,332 @@
+"""API HTTP JSON d'estimation, sans Streamlit.
+
+Serveur asyncio minimal (HTTP/1.1, keep-alive) exposant le moteur de
+`tarification` :
+
+    GET  /sante         -> {"statut": "ok"}
+    GET  /metrics       -> métriques au format texte Prometheus
+    POST /estimation    {"perimetre": 70, "hauteur": "2.0m (standard)",
+                         "localite": "Cotonou", "type_parcelle": "Angle"}
+    POST /estimations   {"devis": [{...}, {...}]}
+    POST /localites     {"recherche": "calavi", "limite": 10}
+    GET  /whatsapp/statuts  abonnement au webhook (hub.mode, hub.verify_token,
+                            hub.challenge)
+    POST /whatsapp/statuts  notification de statuts WhatsApp Cloud (webhook
+                            signé X-Hub-Signature-256)
+
+Une localité se désigne par son nom exact ou son début (« calavi ») ; la
+localité retenue est renvoyée dans la réponse (`localite`, ou `localites`
+pour un lot). Un nom qui ne fait que ressembler à une localité est refusé
+(400).
+
+Lancement :
+    python api.py --hote 0.0.0.0 --port 8080
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import namedtuple
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from localites import index_localites
+from metriques import REGISTRE
+from tarification import COLONNES, PERIMETRE_MAX, PERIMETRE_MIN, coefficients, config_tarifs, estimer
+from whatsapp import enregistrer_statuts, jeton_verification_valide, signature_valide
+
+logger = logging.getLogger(__name__)
+
+TAILLE_MAX_CORPS = 8 * 1024 * 1024
+
+STATUTS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+Requete = namedtuple("Requete", "corps entetes parametres")  # corps brut, pour les routes de ROUTES_BRUTES
+
+REQUETES = REGISTRE.compteur("cloture_api_requetes_total", "Requêtes traitées par l'API", ("route", "statut"))
+DUREE_REQUETES = REGISTRE.histogramme("cloture_api_duree_secondes", "Durée de traitement des requêtes", ("route",))
+
+
+class ErreurRequete(Exception):
+    """Requête invalide, renvoyée au client avec le statut HTTP associé"""
+
+    def __init__(self, message, statut=400):
+        super().__init__(message)
+        self.statut = statut
+
+
+# -----------------------------
+# VALIDATION
+# -----------------------------
+def _libelle(devis, champ, table):
+    """Libellé connu de la grille tarifaire (ErreurRequete sinon)"""
+    valeur = devis[champ]
+    if not isinstance(valeur, str) or valeur not in table:
+        raise ErreurRequete(f"Valeur de {champ} inconnue : {valeur!r} (acceptées : {', '.join(table)})")
+
+
+def _valider_devis(devis, config):
+    if not isinstance(devis, dict):
+        raise ErreurRequete("Chaque devis doit être un objet JSON")
+    manquants = [c for c in COLONNES if c not in devis]
+    if manquants:
+        raise ErreurRequete(f"Champs manquants : {', '.join(manquants)}")
+    if not isinstance(devis["localite"], str):
+        raise ErreurRequete("La localité doit être un texte")
+    _libelle(devis, "hauteur", config.coeff_hauteur)
+    _libelle(devis, "type_parcelle", config.types_parcelle)
+    perimetre = devis["perimetre"]
+    if isinstance(perimetre, bool) or not isinstance(perimetre, (int, float)):
+        raise ErreurRequete("Le périmètre doit être un nombre")
+    if not PERIMETRE_MIN <= perimetre <= PERIMETRE_MAX:
+        raise ErreurRequete(f"Le périmètre doit être compris entre {PERIMETRE_MIN} et {PERIMETRE_MAX} ml")
+    return devis
+
+
+# -----------------------------
+# ROUTES
+# -----------------------------
+def route_sante(_corps):
+    return {"statut": "ok"}
+
+
+def route_metriques(_corps):
+    return REGISTRE.exporter()
+
+
+def _localites(noms, config):
+    """Localités connues désignées par leur nom exact ou son début (ErreurRequete sinon).
+
+    Pas de rapprochement approximatif : un nom inconnu mais voisin d'une
+    localité (« Lagos », Lalo) serait tarifé comme elle sans que l'appelant
+    le sache.
+    """
+    index = index_localites(config.localites)
+    resolues = {nom: index.resoudre(nom, approchant=False) for nom in set(noms)}
+    inconnues = sorted(str(nom) for nom, localite in resolues.items() if localite is None)
+    if inconnues:
+        raise ErreurRequete(f"Localités inconnues (nom exact ou début de nom attendu) : {', '.join(inconnues)}")
+    return [resolues[nom] for nom in noms]
+
+
+def route_estimation(corps):
+    config = config_tarifs()
+    devis = _valider_devis(corps, config)
+    devis = {**devis, "localite": _localites([devis["localite"]], config)[0]}
+    coeff_localite, coeff_hauteur, coeff_type = coefficients(
+        devis["hauteur"], devis["localite"], devis["type_parcelle"], config
+    )
+    estimation = estimer(devis["perimetre"], devis["hauteur"], devis["localite"], devis["type_parcelle"], config)
+    return {
+        "estimation": round(float(estimation)),
+        "localite": devis["localite"],
+        "version_tarifs": config.version,
+        "coefficients": {
+            "localite": float(coeff_localite),
+            "hauteur": float(coeff_hauteur),
+            "type_parcelle": float(coeff_type),
+        },
+    }
+
+
+def route_estimations(corps):
+    if not isinstance(corps, dict) or not isinstance(corps.get("devis"), list):
+        raise ErreurRequete("Le corps doit contenir une liste 'devis'")
+    config = config_tarifs()
+    lot = [_valider_devis(devis, config) for devis in corps["devis"]]
+    colonnes = {c: [devis[c] for devis in lot] for c in COLONNES}
+    colonnes["localite"] = _localites(colonnes["localite"], config)
+    estimations = estimer(**colonnes, config=config)
+    return {
+        "estimations": np.rint(estimations).astype(np.int64).tolist(),
+        "localites": colonnes["localite"],
+        "version_tarifs": config.version,
+    }
+
+
+def route_localites(corps):
+    corps = corps or {}
+    if not isinstance(corps, dict) or not isinstance(corps.get("recherche", ""), str):
+        raise ErreurRequete("Le corps doit contenir un texte 'recherche'")
+    limite = corps.get("limite", 10)
+    if isinstance(limite, bool) or not isinstance(limite, int) or not 1 <= limite <= 100:
+        raise ErreurRequete("La limite doit être un entier entre 1 et 100")
+    config = config_tarifs()
+    localites = index_localites(config.localites).chercher(corps.get("recherche", ""), limite)
+    return {
+        "localites": [
+            {"nom": nom, "commune": config.communes.get(nom, nom),
+             "departement": config.departements.get(config.communes.get(nom, nom))}
+            for nom in localites
+        ],
+        "version_tarifs": config.version,
+    }
+
+
+def route_abonnement_whatsapp(requete):
+    """Vérification de l'abonnement au webhook : renvoie hub.challenge"""
+    parametres = requete.parametres
+    if parametres.get("hub.mode") != "subscribe" or not jeton_verification_valide(parametres.get("hub.verify_token", "")):
+        raise ErreurRequete("Jeton de vérification invalide", 403)
+    return parametres.get("hub.challenge", "")
+
+
+def route_statuts_whatsapp(requete):
+    if not signature_valide(requete.corps, requete.entetes.get("x-hub-signature-256", "")):
+        raise ErreurRequete("Signature invalide", 403)
+    try:
+        corps = json.loads(requete.corps)
+    except ValueError:
+        raise ErreurRequete("JSON invalide") from None
+    if not isinstance(corps, dict):
+        raise ErreurRequete("Notification de statuts invalide")
+    try:
+        return {"mis_a_jour": enregistrer_statuts(corps)}
+    except (AttributeError, TypeError) as exc:
+        raise ErreurRequete("Notification de statuts invalide") from exc
+
+
+ROUTES = {
+    ("GET", "/sante"): route_sante,
+    ("GET", "/metrics"): route_metriques,
+    ("POST", "/estimation"): route_estimation,
+    ("POST", "/estimations"): route_estimations,
+    ("POST", "/localites"): route_localites,
+}
+# Routes recevant la requête brute (Requete) au lieu du JSON décodé
+ROUTES_BRUTES = {
+    ("GET", "/whatsapp/statuts"): route_abonnement_whatsapp,
+    ("POST", "/whatsapp/statuts"): route_statuts_whatsapp,
+}
+# Routes bloquantes (SQLite), exécutées hors de la boucle d'événements
+BLOQUANTES = {("POST", "/whatsapp/statuts")}
+
+
+def traiter(methode, chemin, corps, entetes=None, parametres=None):
+    """Exécute une route et retourne (statut, objet JSON ou texte)"""
+    cle = (methode, chemin)
+    if cle not in ROUTES and cle not in ROUTES_BRUTES:
+        if any(c == chemin for _, c in (*ROUTES, *ROUTES_BRUTES)):
+            return 405, {"erreur": "Méthode non autorisée"}
+        return 404, {"erreur": "Route inconnue"}
+    try:
+        if cle in ROUTES_BRUTES:
+            return 200, ROUTES_BRUTES[cle](Requete(corps, entetes or {}, parametres or {}))
+        try:
+            donnees = json.loads(corps) if corps else None
+        except ValueError:
+            return 400, {"erreur": "JSON invalide"}
+        return 200, ROUTES[cle](donnees)
+    except ErreurRequete as exc:
+        return exc.statut, {"erreur": str(exc)}
+    except Exception:
+        logger.exception("Erreur interne sur %s %s", methode, chemin)
+        return 500, {"erreur": "Erreur interne"}
+
+
+# -----------------------------
+# SERVEUR HTTP
+# -----------------------------
+def _reponse(statut, objet, duree_us, garder):
+    if isinstance(objet, str):
+        corps, type_contenu = objet.encode(), "text/plain; version=0.0.4"
+    else:
+        corps = json.dumps(objet, ensure_ascii=False, separators=(",", ":")).encode()
+        type_contenu = "application/json"
+    entetes = (
+        f"HTTP/1.1 {statut} {STATUTS.get(statut, '')}\r\n"
+        f"Content-Type: {type_contenu}; charset=utf-8\r\n"
+        f"Content-Length: {len(corps)}\r\n"
+        f"X-Temps-Traitement-Us: {duree_us}\r\n"
+        f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n"
+    )
+    return entetes.encode() + corps
+
+
+async def gerer_connexion(lecteur, ecrivain):
+    try:
+        while True:
+            ligne = await lecteur.readline()
+            if not ligne:
+                break
+            try:
+                methode, cible, version = ligne.decode("latin-1").split()
+            except ValueError:
+                break
+
+            entetes = {}
+            while True:
+                ligne = await lecteur.readline()
+                if ligne in (b"\r\n", b"\n", b""):
+                    break
+                nom, _, valeur = ligne.decode("latin-1").partition(":")
+                entetes[nom.strip().lower()] = valeur.strip()
+
+            garder = entetes.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+            longueur = entetes.get("content-length", "0").strip() or "0"
+            # Longueur invalide : le corps ne peut pas être délimité, la connexion est fermée
+            if not longueur.isascii() or not longueur.isdigit():
+                ecrivain.write(_reponse(400, {"erreur": "Content-Length invalide"}, 0, False))
+                await ecrivain.drain()
+                break
+            longueur = int(longueur)
+            if longueur > TAILLE_MAX_CORPS:
+                ecrivain.write(_reponse(413, {"erreur": "Corps trop volumineux"}, 0, False))
+                await ecrivain.drain()
+                break
+            corps = await lecteur.readexactly(longueur) if longueur else b""
+
+            chemin, _, requete = cible.partition("?")
+            parametres = {nom: valeurs[0] for nom, valeurs in parse_qs(requete).items()}
+            debut = time.perf_counter_ns()
+            if (methode, chemin) in BLOQUANTES:
+                statut, objet = await asyncio.get_running_loop().run_in_executor(
+                    None, traiter, methode, chemin, corps, entetes, parametres)
+            else:
+                statut, objet = traiter(methode, chemin, corps, entetes, parametres)
+            duree_us = (time.perf_counter_ns() - debut) // 1000
+            route = chemin if (methode, chemin) in ROUTES or (methode, chemin) in ROUTES_BRUTES else "autre"
+            REQUETES.inc(route=route, statut=statut)
+            DUREE_REQUETES.observer(duree_us / 1e6, route=route)
+
+            ecrivain.write(_reponse(statut, objet, duree_us, garder))
+            await ecrivain.drain()
+            if not garder:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        ecrivain.close()
+
+
+async def servir(hote="127.0.0.1", port=8080):
+    serveur = await asyncio.start_server(gerer_connexion, hote, port, backlog=1024)
+    async with serveur:
+        await serveur.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API JSON d'estimation de clôture")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    print(f"API d'estimation sur http://{args.hote}:{args.port}")
+    try:
+        asyncio.run(servir(args.hote, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,23 @@
 import streamlit as st
-from urllib.parse import quote
+import math
+import os
+import time
+from functools import partial
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from actifs import script_chargement
+from devis import OPTIONS_PARCELLE, OPTIONS_PROJET, OPTIONS_TOPO, Devis
+from devis_pdf import CHAMPS as CHAMPS_PDF, cle_devis, donnees_devis
+import entonnoir
+from fourchette import fourchette
+from indexation import JALONS, config_indices, libelle_mois, mois_courant, projeter
+from leads import CHAMPS as CHAMPS_LEAD, enregistrer as enregistrer_lead
+from localites import index_localites
+import modeles_whatsapp
+from ressources import (DUREE_SECTION, ENTONNOIR, RERUNS, TAILLE_SESSION, RenduEstimation, cache_pdf,
+                        cache_rendus, grille_courante, limiteur_reruns, magasin_sessions, sessions_actives)
+from sessions import nouveau_jeton
+import whatsapp
 
 # -----------------------------
 # CONFIGURATION DE LA PAGE
@@ -12,230 +30,394 @@ st.set_page_config(
 )
 
 # -----------------------------
-# CSS SIMPLIFIÉ ET CORRIGÉ - BARRE DE PROGRESSION SUPPRIMÉE
+# MÉTRIQUES - EXPORT PROMETHEUS (ressources.py)
 # -----------------------------
-st.markdown("""
-<style>
-    /* Reset */
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    .main-container {
-        max-width: 900px;
-        margin: 0 auto;
-        padding: 20px;
-    }
-    
-    /* CONTENT SECTIONS */
-    .content-section {
-        padding: 25px;
-        background: white;
-        border-radius: 12px;
-        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        margin-bottom: 30px;
-        border-left: 4px solid #1a73e8;
-        animation: slideIn 0.5s ease;
-    }
-    
-    @keyframes slideIn {
-        from { 
-            opacity: 0;
-            transform: translateY(20px);
-        }
-        to { 
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    /* RESPONSIVE */
-    @media (max-width: 768px) {
-        .main-container {
-            padding: 10px;
-        }
-        
-        .content-section {
-            padding: 20px 15px;
-            margin-bottom: 20px;
-        }
-        
-        h1 {
-            font-size: 1.7rem !important;
-        }
-        
-        h2 {
-            font-size: 1.4rem !important;
-        }
-    }
-    
-    /* MESSAGES - CORRIGÉ (texte lisible) */
-    .message-box {
-        padding: 15px;
-        border-radius: 8px;
-        margin: 15px 0;
-        border-left: 4px solid;
-    }
-    
-    .message-info {
-        background: #e8f4fd !important;
-        border-left-color: #1a73e8 !important;
-        color: #1a446b !important;
-    }
-    
-    .message-warning {
-        background: #fff3cd !important;
-        border-left-color: #ffc107 !important;
-        color: #856404 !important;
-    }
-    
-    .message-success {
-        background: #d4edda !important;
-        border-left-color: #28a745 !important;
-        color: #155724 !important;
-    }
-    
-    /* Force le texte en noir dans les messages */
-    .message-box strong {
-        color: #000 !important;
-    }
-    
-    .message-box p, .message-box div {
-        color: #000 !important;
-    }
-    
-    /* BOUTONS */
-    .btn-primary {
-        background: #1a73e8;
-        color: white;
-        border: none;
-        padding: 14px 28px;
-        border-radius: 8px;
-        font-size: 16px;
-        font-weight: 600;
-        cursor: pointer;
-        transition: all 0.3s;
-        width: 100%;
-        margin-top: 20px;
-    }
-    
-    .btn-primary:hover {
-        background: #0d5bb5;
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(26, 115, 232, 0.3);
-    }
-    
-    .btn-secondary {
-        background: #f5f5f5;
-        color: #333;
-        border: 1px solid #ddd;
-        padding: 12px 24px;
-        border-radius: 8px;
-        font-size: 15px;
-        cursor: pointer;
-        transition: all 0.3s;
-        width: 100%;
-    }
-    
-    .btn-secondary:hover {
-        background: #e0e0e0;
-    }
-    
-    /* ESTIMATION BOX */
-    .estimation-card {
-        background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
-        border-radius: 12px;
-        padding: 30px;
-        margin: 30px 0;
-        border: 2px solid #1a73e8;
-        text-align: center;
-    }
-    
-    /* WHATSAPP BUTTON */
-    .btn-whatsapp {
-        background: #25D366;
-        color: white;
-        padding: 18px 40px;
-        font-size: 18px;
-        font-weight: 600;
-        border: none;
-        border-radius: 10px;
-        cursor: pointer;
-        transition: all 0.3s;
-        width: 100%;
-        max-width: 400px;
-        display: block;
-        margin: 30px auto;
-        text-align: center;
-        text-decoration: none;
-    }
-    
-    .btn-whatsapp:hover {
-        background: #1da851;
-        transform: translateY(-3px);
-        box-shadow: 0 6px 20px rgba(37, 211, 102, 0.4);
-    }
-</style>
-""", unsafe_allow_html=True)
+def compter_rerun(etape):
+    """Compte une exécution de la page ou d'une étape pour la session courante"""
+    RERUNS.inc(etape=etape)
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        sessions_actives().vue(ctx.session_id)
+        # Une admission par exécution : page complète, ou fragment relancé seul
+        if etape == "app" or ctx.fragment_ids_this_run:
+            limiter_rerun(ctx)
 
 # -----------------------------
-# DONNÉES
+# LIMITATION DU DÉBIT (limitation.py, LIMITE_*)
 # -----------------------------
-PRIX_BASE_ML = 51107
-
-COEFF_LOCALITE = {"Cotonou": 1.05}
-COEFF_HAUTEUR = {
-    "1.8m": 0.95,
-    "2.0m (standard)": 1.00,
-    "2.5m": 1.15,
-    "3.0m": 1.35
-}
+ENTETE_IP = os.environ.get("LIMITE_IP_ENTETE")
+
+def adresse_client():
+    """IP du client : premier élément de l'en-tête LIMITE_IP_ENTETE (proxy de confiance),
+    sinon la socket. None sans LIMITE_IP_ENTETE : l'adresse vue peut être partagée
+    par tous les clients (NAT, répartiteur de charge), la portée IP est désactivée"""
+    if not ENTETE_IP:
+        return None
+    valeur = st.context.headers.get(ENTETE_IP)
+    if valeur:
+        return valeur.split(",")[0].strip()
+    ip = st.context.ip_address
+    return ip if isinstance(ip, str) else None
+
+def limiter_rerun(ctx):
+    """Refuse l'exécution, avec un message et sans attendre, si la session ou l'IP dépasse son débit"""
+    if st.session_state.pop("rerun_interne", False):
+        return  # st.rerun() d'une exécution déjà admise
+    if limiteur_reruns().controler(ctx.session_id, adresse_client()):
+        st.warning("Trop de requêtes : patientez quelques secondes avant de continuer.")
+        st.stop()
+
+def modifier_estimation():
+    """Callback des flèches de hauteur et du périmètre : dans une rafale, le
+    recalcul est reporté jusqu'à LIMITE_FUSION secondes sans modification"""
+    maintenant = time.monotonic()
+    precedente = st.session_state.get("modifie_le", float("-inf"))
+    st.session_state.modifie_le = maintenant
+    limiteur = limiteur_reruns()
+    if limiteur.en_rafale(precedente, maintenant):
+        st.session_state.recalcul_le = maintenant + limiteur.fusion
+    demander_rerun_complet()
+
+@st.fragment(run_every=limiteur_reruns().fusion or None)
+def recalcul_differe():
+    """Affiché pendant une rafale seulement : relance la page une fois la fenêtre de
+    fusion écoulée, sans bloquer le thread du script"""
+    if time.monotonic() >= st.session_state.get("recalcul_le", 0.0):
+        st.session_state.pop("recalcul_le", None)
+        relancer()
+
+def relancer():
+    """st.rerun() qui ne consomme pas de jeton : l'exécution en cours a déjà été admise"""
+    st.session_state.rerun_interne = True
+    st.rerun()
+
+def emettre_evenement(evenement):
+    """Événement de l'entonnoir (entonnoir.py) avec les choix courants du devis"""
+    devis = st.session_state.devis
+    entonnoir.emettre(evenement, devis.localite, devis.hauteur, devis.longueur_totale)
 
-TYPES_PARCELLE = {
-    "Angle": 1.10,
-    "Entre 3 parcelles": 1.15
-}
+# -----------------------------
+# CSS ET SCRIPT DE DÉFILEMENT - FICHIERS STATIQUES (assets/)
+# -----------------------------
+with DUREE_SECTION.mesurer(section="actifs"):
+    st.html(script_chargement(), unsafe_allow_javascript=True)
+
+# -----------------------------
+# DONNÉES
+# -----------------------------
+from tarification import PERIMETRE_MAX, PERIMETRE_MIN, estimer
 
 # -----------------------------
 # FONCTIONS - SUPPRIMÉ show_progress_bar()
 # -----------------------------
-def calculate_estimation():
+def libelle_localite(config, nom):
+    """Libellé d'une localité dans la liste : département ou commune de rattachement"""
+    if nom in config.communes:
+        return f"{nom} ({config.communes[nom]})"
+    departement = config.departements.get(nom)
+    return f"{nom} — {departement}" if departement else nom
+
+COLONNES_SEGMENTS = ["longueur", "hauteur", "type_parcelle"]
+
+def tableau_segments(segments, prix=None):
+    """DataFrame des tronçons ; pandas n'est chargé qu'à la première clôture en tronçons"""
+    import pandas as pd
+
+    tableau = pd.DataFrame(list(segments), columns=COLONNES_SEGMENTS)
+    return tableau if prix is None else tableau.assign(prix=prix)
+
+def cartes_estimation(estimation, plage, description, version):
+    """Cartes HTML de l'estimation et de sa fourchette pour les étapes 2 et 3"""
+    ligne_fourchette = f"""<p style='color: #444; margin: 5px 0;'>Fourchette probable : <strong>{plage.p10:,.0f} – {plage.p90:,.0f} FCFA</strong></p>
+        <p style='color: #888; font-size: 0.8rem; margin: 0;'>8 chances sur 10 • médiane {plage.p50:,.0f} FCFA</p>"""
+    carte_etape2 = f"""
+    <div class='estimation-card'>
+        <h2 style='color: #666; margin: 0;'>Estimation du coût</h2>
+        <h1 style='color: #1a73e8; margin: 15px 0; font-size: 2.8rem;'>{estimation:,.0f} FCFA</h1>
+        {ligne_fourchette}
+        <p style='color: #666; margin: 5px 0;'>Pour {description}</p>
+        <p style='color: #888; font-size: 0.9rem; margin-top: 10px;'>Inclut fondations, murs, chaînage, enduit • TTC</p>
+        <p style='color: #aaa; font-size: 0.75rem; margin-top: 5px;'>Tarifs v{version}</p>
+    </div>
+    """
+    carte_etape3 = f"""
+    <div style='background: #f0f7ff; border-radius: 12px; padding: 25px; margin: 30px 0; border: 2px solid #1a73e8; text-align: center;'>
+        <h2 style='color: #1a73e8; margin: 0;'>ESTIMATION FINALE</h2>
+        <h1 style='color: #1a73e8; margin: 15px 0; font-size: 3rem;'>{estimation:,.0f} FCFA</h1>
+        {ligne_fourchette}
+        <p style='color: #666; margin: 5px 0;'>Basé sur DQE validé • Estimation envoyée sous 24h</p>
+    </div>
+    """
+    return carte_etape2, carte_etape3
+
+def rendre_estimation(grille, perimetre, hauteur, localite, type_parcelle, topo):
+    """Calcule l'estimation, sa fourchette et prépare les cartes HTML des étapes 2 et 3"""
+    estimation = grille.estimer(perimetre, hauteur, localite, type_parcelle)
+    plage = fourchette(perimetre, hauteur, localite, type_parcelle, topo, grille.config)
+    description = f"{perimetre} ml • {hauteur} • {localite}"
+    return RenduEstimation(estimation, plage, *cartes_estimation(estimation, plage, description, grille.version))
+
+def rendre_segments(grille, segments, localite, topo):
+    """Estimation d'une clôture en plusieurs tronçons, en un seul calcul vectorisé"""
+    longueurs, hauteurs, types = zip(*segments)
+    prix = estimer(longueurs, hauteurs, localite, types, grille.config)
+    estimation = float(prix.sum())
+    plage = fourchette(longueurs, hauteurs, localite, types, topo, grille.config)
+    description = f"{sum(longueurs):g} ml en {len(segments)} tronçons • {localite}"
+    return RenduEstimation(estimation, plage, *cartes_estimation(estimation, plage, description, grille.version),
+                           tuple(prix.tolist()))
+
+def rendu_estimation(grille=None):
+    """Estimation et cartes de la configuration courante, mises en cache
+    par configuration et version des tarifs"""
+    grille = grille or grille_courante()
+    devis = st.session_state.devis
+    if devis.segments:
+        cle = (devis.segments, devis.localite, devis.topo, grille.version)
+        return cache_rendus().obtenir(cle, lambda: rendre_segments(grille, *cle[:3]))
+    cle = (devis.perimetre, devis.hauteur, devis.localite, devis.type_parcelle, devis.topo, grille.version)
+    return cache_rendus().obtenir(cle, lambda: rendre_estimation(grille, *cle[:5]))
+
+def calculate_estimation(grille=None):
     """Calcule l'estimation du coût"""
-    coeff_localite = COEFF_LOCALITE.get(st.session_state.localite, 1.0)
-    coeff_hauteur = COEFF_HAUTEUR.get(st.session_state.hauteur, 1.0)
-    coeff_type = TYPES_PARCELLE.get(st.session_state.type_parcelle, 1.0)
-    
-    return PRIX_BASE_ML * st.session_state.perimetre * coeff_localite * coeff_hauteur * coeff_type
+    return rendu_estimation(grille).estimation
+
+def grille_comparaison_html():
+    """Tableau HTML des estimations pour toutes les hauteurs et tous les types"""
+    grille = grille_courante()
+    devis = st.session_state.devis
+    prix = grille.comparaison(devis.perimetre, devis.localite)
+    
+    entete = "".join(f"<th style='padding: 8px;'>{t}</th>" for t in grille.types)
+    lignes = []
+    for hauteur, ligne in zip(grille.hauteurs, prix):
+        cellules = []
+        for type_parcelle, valeur in zip(grille.types, ligne):
+            actuel = hauteur == devis.hauteur and type_parcelle == devis.type_parcelle
+            style = "padding: 8px; text-align: right;" + (" background: #e8f4fd; font-weight: bold; color: #1a73e8;" if actuel else "")
+            cellules.append(f"<td style='{style}'>{valeur:,.0f} FCFA</td>")
+        lignes.append(f"<tr><td style='padding: 8px; font-weight: 600;'>{hauteur}</td>{''.join(cellules)}</tr>")
+    
+    return f"""
+    <table style='width: 100%; border-collapse: collapse;'>
+        <tr><th style='padding: 8px; text-align: left;'>Hauteur</th>{entete}</tr>
+        {''.join(lignes)}
+    </table>
+    <p style='color: #888; font-size: 0.85rem; margin-top: 8px;'>Pour {devis.perimetre} ml à {devis.localite}</p>
+    """
+
+PARCELLES_PROJETEES = ("recherche", "futur")  # clients qui construiront dans plusieurs mois
+
+def courbe_projection_html(estimation, serie, depart):
+    """Courbe SVG du coût projeté sur l'horizon et coûts aux JALONS"""
+    couts = projeter(estimation, serie, depart)
+    horizon = len(couts) - 1
+    bas, haut = couts.min(), couts.max()
+    xs = [40 + 540 * mois / horizon for mois in range(horizon + 1)]
+    ys = 170 - 140 * (couts - bas) / ((haut - bas) or 1)
+    points = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+    reperes, lignes = [], []
+    for mois in (m for m in JALONS if m <= horizon):
+        reperes.append(f"<circle cx='{xs[mois]:.1f}' cy='{ys[mois]:.1f}' r='4' fill='#1a73e8'/>"
+                       f"<text x='{xs[mois]:.1f}' y='192' text-anchor='middle' font-size='12' fill='#666'>{mois} mois</text>")
+        lignes.append(f"<tr><td style='padding: 6px;'>Dans {mois} mois ({libelle_mois(depart + mois)})</td>"
+                      f"<td style='padding: 6px; text-align: right; font-weight: 600;'>{couts[mois]:,.0f} FCFA</td>"
+                      f"<td style='padding: 6px; text-align: right; color: #888;'>{couts[mois] / estimation - 1:+.1%}</td></tr>")
+    prevision = "prévisions" if depart > serie.dernier_releve else f"relevés jusqu'en {libelle_mois(serie.dernier_releve)}, prévisions au-delà"
+    return f"""
+    <svg viewBox='0 0 600 200' style='width: 100%; max-height: 220px;'>
+        <line x1='40' y1='170' x2='580' y2='170' stroke='#ddd'/>
+        <text x='40' y='{ys[0] - 8:.0f}' font-size='12' fill='#666'>{estimation:,.0f}</text>
+        <polyline points='{points}' fill='none' stroke='#1a73e8' stroke-width='2.5'/>
+        {''.join(reperes)}
+    </svg>
+    <table style='width: 100%; border-collapse: collapse;'>{''.join(lignes)}</table>
+    <p style='color: #888; font-size: 0.8rem; margin-top: 8px;'>Indice des prix des matériaux ({prevision}) • main-d'œuvre +{serie.inflation_main_oeuvre:.0%} par an</p>
+    """
+
+def rendu_projection(estimation):
+    """Projection de l'estimation, mise en cache par estimation, version des
+    indices et mois courant ; None sans fichier d'indices"""
+    serie = config_indices()
+    if serie is None:
+        return None
+    depart = mois_courant()
+    cle = ("projection", estimation, serie.version, depart)
+    return cache_rendus().obtenir(cle, lambda: courbe_projection_html(estimation, serie, depart))
+
+def restaurer_session():
+    """Reprend le devis enregistré sous le jeton de l'URL, ou en attribue un nouveau"""
+    magasin = magasin_sessions()
+    if magasin is None or "jeton_session" in st.session_state:
+        return
+    jeton = st.query_params.get("session")
+    donnees = magasin.charger(jeton) if jeton else None
+    try:
+        st.session_state.devis = Devis.deserialiser(donnees)
+    except (TypeError, ValueError):  # absente, expirée ou d'un format précédent
+        jeton = nouveau_jeton()
+        st.query_params["session"] = jeton
+    st.session_state.jeton_session = jeton
+
+def sauver_session():
+    """Enregistre l'avancement du devis s'il a changé depuis le dernier enregistrement"""
+    magasin = magasin_sessions()
+    if magasin is None or "jeton_session" not in st.session_state:
+        return
+    donnees = st.session_state.devis.serialiser()
+    if st.session_state.get("session_sauvee") != donnees:
+        magasin.sauver(st.session_state.jeton_session, donnees)
+        st.session_state.session_sauvee = donnees
+
+def oublier_session():
+    """Supprime la session enregistrée (nouvelle estimation)"""
+    magasin = magasin_sessions()
+    if magasin is not None and "jeton_session" in st.session_state:
+        magasin.supprimer(st.session_state.jeton_session)
+        del st.query_params["session"]
+
+def demander_rerun_complet(etape=2):
+    """Les étapes suivantes reprennent les choix de l'étape `etape` (l'étape 2
+    le levé et la parcelle, le récapitulatif de l'étape 3 tous les choix) :
+    si l'une d'elles est affichée, une modification doit relancer toute la page"""
+    if st.session_state.devis.etape > etape:
+        st.session_state.rerun_complet = True
+
+def appliquer_rerun_complet():
+    """Relance toute la page si un callback de fragment l'a demandé"""
+    if st.session_state.pop("rerun_complet", False):
+        relancer()
+
+def choisir_option(champ, valeur):
+    """Enregistre un choix de l'étape 1 (parcelle ou levé topo)"""
+    setattr(st.session_state.devis, champ, valeur)
+    demander_rerun_complet(1)
+
+def saisir_segments(devis, grille):
+    """Tableau éditable des tronçons : longueur, hauteur et type de chacun"""
+    # Le tableau de départ reste identique d'un rerun à l'autre : st.data_editor
+    # conserve les modifications de l'utilisateur relativement à lui
+    if "segments_base" not in st.session_state:
+        if devis.segments:
+            lignes = devis.segments
+        elif devis.cotes_leve:
+            lignes = [(cote, devis.hauteur, devis.type_parcelle) for cote in devis.cotes_leve]
+        else:
+            lignes = [(float(devis.perimetre), devis.hauteur, devis.type_parcelle)]
+        st.session_state.segments_base = tableau_segments(lignes)
+
+    tableau = st.data_editor(
+        st.session_state.segments_base,
+        key="segments_editeur",
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "longueur": st.column_config.NumberColumn("Longueur (ml)", min_value=0.1, max_value=PERIMETRE_MAX, step=0.1, required=True),
+            "hauteur": st.column_config.SelectboxColumn("Hauteur", options=grille.hauteurs, required=True),
+            "type_parcelle": st.column_config.SelectboxColumn("Type / mitoyenneté", options=grille.types, required=True),
+        },
+        on_change=demander_rerun_complet
+    ).dropna()
+    tableau = tableau[tableau["longueur"] > 0]
+    devis.segments = tuple(zip(tableau["longueur"].astype(float).round(2).tolist(),
+                               tableau["hauteur"].tolist(), tableau["type_parcelle"].tolist()))
+
+def quitter_segments():
+    """Retour à une clôture uniforme : le tableau des tronçons repart de zéro"""
+    st.session_state.devis.segments = ()
+    st.session_state.pop("segments_base", None)
+    st.session_state.pop("segments_editeur", None)
+
+def resume_segments(devis, prix_segments, max_lignes=10):
+    """Lignes du détail par tronçon ; au-delà de `max_lignes`, regroupées par hauteur et type"""
+    if len(devis.segments) <= max_lignes:
+        return [f"- {longueur:g} ml • {hauteur} • {type_parcelle} : {prix:,.0f} FCFA"
+                for (longueur, hauteur, type_parcelle), prix in zip(devis.segments, prix_segments)]
+    groupes = tableau_segments(devis.segments, prix_segments) \
+        .groupby(["hauteur", "type_parcelle"], sort=False).agg(nombre=("prix", "size"), longueur=("longueur", "sum"), prix=("prix", "sum"))
+    return [f"- {ligne.nombre} tronçons, {ligne.longueur:g} ml • {hauteur} • {type_parcelle} : {ligne.prix:,.0f} FCFA"
+            for (hauteur, type_parcelle), ligne in groupes.iterrows()]
+
+def importer_leve():
+    """Mesure le levé topographique importé et applique son périmètre au devis"""
+    from leve_topo import mesurer_fichier  # pandas, chargé au premier levé importé
+
+    devis = st.session_state.devis
+    fichier = st.session_state.leve_fichier
+    st.session_state.pop("leve_erreur", None)
+    devis.cotes_leve = ()
+    # Levé retiré, refusé ou appliqué : l'étape 2 affichée doit le refléter
+    demander_rerun_complet(1)
+    if fichier is None:
+        return
+    try:
+        leve = mesurer_fichier(fichier.getvalue(), fichier.name)
+    except ValueError as exc:
+        st.session_state.leve_erreur = str(exc)
+        return
+    perimetre = math.ceil(round(leve.perimetre, 2))
+    if not PERIMETRE_MIN <= perimetre <= PERIMETRE_MAX:
+        st.session_state.leve_erreur = (
+            f"Périmètre mesuré : {leve.perimetre:,.1f} ml, hors de la plage {PERIMETRE_MIN} à {PERIMETRE_MAX} ml. "
+            "Contactez-nous pour une étude personnalisée."
+        )
+        return
+    devis.perimetre = perimetre
+    devis.cotes_leve = tuple(round(float(cote), 2) for cote in leve.cotes)
+    if devis.segments:
+        quitter_segments()
+    # Le champ périmètre de l'étape 2 reprend la valeur du levé
+    st.session_state.pop("perimetre_input", None)
+
+def changer_hauteur(pas):
+    """Passe à la hauteur précédente (-1) ou suivante (+1)"""
+    devis = st.session_state.devis
+    hauteur_options = grille_courante().hauteurs
+    current_index = hauteur_options.index(devis.hauteur) if devis.hauteur in hauteur_options else 1
+    if 0 <= current_index + pas < len(hauteur_options):
+        devis.hauteur = hauteur_options[current_index + pas]
+    modifier_estimation()
+
+LIBELLES_ENVOI = {
+    "en_attente": "⏳ En file d'envoi…",
+    "en_cours": "📤 Envoi en cours…",
+    "envoye": "✅ Estimation envoyée sur WhatsApp",
+    "remis": "✅ Estimation remise sur votre WhatsApp",
+    "lu": "✅ Estimation lue",
+    "echec": "❌ L'envoi automatique a échoué : utilisez le bouton WhatsApp ci-dessus",
+}
+
+def envoyer_whatsapp(message):
+    """Dépose le message d'estimation dans la boîte d'envoi WhatsApp (envoi en arrière-plan)"""
+    st.session_state.pop("envoi_whatsapp_erreur", None)
+    try:
+        st.session_state.envoi_whatsapp = whatsapp.deposer(st.session_state.devis.telephone, message)
+    except ValueError as exc:
+        st.session_state.envoi_whatsapp_erreur = str(exc)
+
+@st.fragment(run_every=2)
+def suivre_envoi_whatsapp(id_message):
+    """Statut de l'envoi, actualisé jusqu'à un statut final"""
+    statut = whatsapp.boite_envoi().statut(id_message)
+    st.caption(LIBELLES_ENVOI.get(statut.statut if statut else None, "Envoi introuvable"))
+    if statut is None or statut.statut in whatsapp.FINAUX:
+        relancer()
 
 # -----------------------------
 # INITIALISATION
 # -----------------------------
-if 'current_step' not in st.session_state:
-    st.session_state.current_step = 1
-
-# Initialiser les valeurs
-defaults = {
-    'parcelle': None,
-    'topo': None,
-    'localite': "Abomey-Calavi",
-    'type_parcelle': "Angle",
-    'perimetre': 70,
-    'hauteur': "2.0m (standard)",
-    'nom': "",
-    'telephone': "",
-    'email': "",
-    'projet': "Maison individuelle"
-}
+restaurer_session()
 
-for key, value in defaults.items():
-    if key not in st.session_state:
-        st.session_state[key] = value
+# Le devis (devis.py) porte tout l'état de la session
+if 'devis' not in st.session_state:
+    st.session_state.devis = Devis()
+    emettre_evenement("arrivee")
 
 # -----------------------------
 # APPLICATION PRINCIPALE
 # -----------------------------
+compter_rerun("app")
 st.markdown("<div class='main-container'>", unsafe_allow_html=True)
 
 # Titre principal
@@ -245,78 +427,96 @@ st.markdown("<p style='text-align: center; color: #666; margin-bottom: 30px;'>Ob
 # -----------------------------
 # ÉTAPE 1: VOTRE PROJET
 # -----------------------------
-st.markdown("<div class='content-section'>", unsafe_allow_html=True)
-st.markdown("<h2 style='color: #1a73e8; margin-bottom: 20px;'>🎯 Étape 1: Votre projet</h2>", unsafe_allow_html=True)
-
-st.markdown("<h3 style='margin-bottom: 15px;'>1. Votre situation</h3>", unsafe_allow_html=True)
-cols = st.columns(3)
-options_parcelle = [
-    ("Terrain disponible", "Je possède le terrain", "possede"),
-    ("En recherche", "Je cherche un terrain", "recherche"),
-    ("Projet futur", "Planification à venir", "futur")
-]
-
-for i, (title, desc, value) in enumerate(options_parcelle):
-    with cols[i]:
-        is_selected = st.session_state.parcelle == value
-        if st.button(f"**{title}**\n\n{desc}", 
-                    key=f"parcelle_{i}",
-                    type="primary" if is_selected else "secondary",
-                    use_container_width=True):
-            st.session_state.parcelle = value
-            st.rerun()
-
-if st.session_state.parcelle:
-    st.markdown("<h3 style='margin-top: 25px; margin-bottom: 15px;'>2. Levé topographique</h3>", unsafe_allow_html=True)
-    
+@st.fragment
+@DUREE_SECTION.chronometrer(section="etape_1")
+def etape_1():
+    """Étape 1 : situation de la parcelle et levé topographique"""
+    compter_rerun("1")
+    appliquer_rerun_complet()
+    devis = st.session_state.devis
+    st.markdown("<div class='content-section'>", unsafe_allow_html=True)
+    st.markdown("<h2 style='color: #1a73e8; margin-bottom: 20px;'>🎯 Étape 1: Votre projet</h2>", unsafe_allow_html=True)
+
+    st.markdown("<h3 style='margin-bottom: 15px;'>1. Votre situation</h3>", unsafe_allow_html=True)
     cols = st.columns(3)
-    options_topo = [
-        ("Disponible", "J'ai le document", "oui"),
-        ("À réaliser", "Je souhaite le faire", "a_faire"),
-        ("Non", "Je n'ai pas", "non")
-    ]
-    
-    for i, (title, desc, value) in enumerate(options_topo):
+
+    for i, (value, (title, desc, _)) in enumerate(OPTIONS_PARCELLE.items()):
         with cols[i]:
-            is_selected = st.session_state.topo == value
-            if st.button(f"**{title}**\n\n{desc}", 
-                        key=f"topo_{i}",
-                        type="primary" if is_selected else "secondary",
-                        use_container_width=True):
-                st.session_state.topo = value
-                st.rerun()
-
-if st.session_state.parcelle and (st.session_state.topo or st.session_state.parcelle != "possede"):
-    st.divider()
+            is_selected = devis.parcelle == value
+            st.button(f"**{title}**\n\n{desc}", 
+                      key=f"parcelle_{i}",
+                      type="primary" if is_selected else "secondary",
+                      use_container_width=True,
+                      on_click=choisir_option,
+                      args=("parcelle", value))
+
+    if devis.parcelle:
+        st.markdown("<h3 style='margin-top: 25px; margin-bottom: 15px;'>2. Levé topographique</h3>", unsafe_allow_html=True)
+    
+        cols = st.columns(3)
+    
+        for i, (value, (title, desc, _)) in enumerate(OPTIONS_TOPO.items()):
+            with cols[i]:
+                is_selected = devis.topo == value
+                st.button(f"**{title}**\n\n{desc}", 
+                          key=f"topo_{i}",
+                          type="primary" if is_selected else "secondary",
+                          use_container_width=True,
+                          on_click=choisir_option,
+                          args=("topo", value))
+
+        # Levé disponible : le périmètre est calculé depuis le fichier
+        if devis.topo == "oui":
+            st.file_uploader("Importez votre levé (CSV, GeoJSON ou DXF) pour calculer le périmètre",
+                             type=["csv", "txt", "geojson", "json", "dxf"],
+                             key="leve_fichier",
+                             on_change=importer_leve)
+            if st.session_state.get("leve_erreur"):
+                st.markdown(f"<div class='message-box message-warning'><strong>{st.session_state.leve_erreur}</strong></div>", unsafe_allow_html=True)
+            elif devis.cotes_leve:
+                cotes = " • ".join(f"{cote:.2f} m" for cote in devis.cotes_leve[:12]) + (" • …" if len(devis.cotes_leve) > 12 else "")
+                st.markdown(f"<div class='message-box message-success'><strong>📐 Périmètre du levé : {devis.perimetre_leve:.2f} ml ({len(devis.cotes_leve)} côtés)</strong><br>{cotes}</div>", unsafe_allow_html=True)
+
+    if devis.parcelle and (devis.topo or devis.parcelle != "possede"):
+        st.divider()
     
-    # Récapitulatif étape 1
-    col1, col2 = st.columns(2)
-    with col1:
-        parcelle_text = {"possede": "Terrain disponible", "recherche": "En recherche", "futur": "Projet futur"}.get(st.session_state.parcelle, "-")
-        st.metric("📌 Parcelle", parcelle_text)
+        # Récapitulatif étape 1
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("📌 Parcelle", devis.libelle_parcelle)
     
-    with col2:
-        if st.session_state.topo:
-            topo_text = {"oui": "Levé disponible", "a_faire": "À réaliser", "non": "Non disponible"}.get(st.session_state.topo, "-")
-            st.metric("📐 Levé topo", topo_text)
+        with col2:
+            if devis.topo:
+                st.metric("📐 Levé topo", devis.libelle_topo)
     
-    # Bouton pour passer à l'étape 2
-    if st.button("**Continuer vers la simulation →**", 
-                 type="primary", 
-                 use_container_width=True,
-                 key="btn_step1_continue"):
-        st.session_state.current_step = 2
-        st.rerun()
+        # Bouton pour passer à l'étape 2
+        if st.button("**Continuer vers la simulation →**", 
+                     type="primary", 
+                     use_container_width=True,
+                     key="btn_step1_continue"):
+            devis.etape = 2
+            ENTONNOIR.inc(transition="etape1_etape2")
+            emettre_evenement("etape2")
+            relancer()
 
-elif st.session_state.parcelle:
-    st.markdown("<div class='message-box message-info'><strong>Veuillez répondre à la deuxième question pour continuer</strong></div>", unsafe_allow_html=True)
+    elif devis.parcelle:
+        st.markdown("<div class='message-box message-info'><strong>Veuillez répondre à la deuxième question pour continuer</strong></div>", unsafe_allow_html=True)
 
-st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+    sauver_session()
+
+etape_1()
 
 # -----------------------------
 # ÉTAPE 2: SIMULATION
 # -----------------------------
-if st.session_state.current_step >= 2:
+@st.fragment
+@DUREE_SECTION.chronometrer(section="etape_2")
+def etape_2():
+    """Étape 2 : simulation et carte d'estimation"""
+    compter_rerun("2")
+    appliquer_rerun_complet()
+    devis = st.session_state.devis
     st.markdown("<div class='content-section'>", unsafe_allow_html=True)
     st.markdown("<h2 style='color: #1a73e8; margin-bottom: 20px;'>🧮 Étape 2: Simulation</h2>", unsafe_allow_html=True)
     
@@ -325,60 +525,67 @@ if st.session_state.current_step >= 2:
                  key="btn_back_to_step1",
                  use_container_width=True,
                  type="secondary"):
-        st.session_state.current_step = 1
-        st.rerun()
+        devis.etape = 1
+        relancer()
     
+    grille = grille_courante()
     cols = st.columns(2)
     
     with cols[0]:
         st.markdown("<h3 style='margin-bottom: 10px;'>Localisation</h3>", unsafe_allow_html=True)
-        localites = ["Abomey-Calavi", "Cotonou", "Dassa-Zoumè", "Sèmè-Podji", "Ouidah", "Allada", "Porto-Novo", "Parakou", "Bohicon", "Abomey"]
-        st.session_state.localite = st.selectbox(
-            "Sélectionnez votre ville",
-            localites,
-            index=0,
+        # Saisie libre acceptée : une commune inconnue prend le tarif de la plus proche
+        index = index_localites(grille.config.localites)
+        saisie = st.selectbox(
+            "Sélectionnez votre commune ou arrondissement",
+            grille.localites,
+            index=grille.localites.index(index.resoudre(devis.localite, grille.localites[0])),
+            format_func=partial(libelle_localite, grille.config),
+            accept_new_options=True,
             key="localite_select",
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=demander_rerun_complet
         )
+        devis.localite = index.resoudre(saisie or devis.localite, devis.localite)
+        if saisie and devis.localite != saisie:
+            st.caption(f"« {saisie} » : tarif de {devis.localite} appliqué.")
         
         st.markdown("<h3 style='margin-top: 25px; margin-bottom: 10px;'>Type de parcelle</h3>", unsafe_allow_html=True)
-        st.session_state.type_parcelle = st.selectbox(
+        devis.type_parcelle = st.selectbox(
             "Forme de votre terrain",
-            list(TYPES_PARCELLE.keys()),
-            index=0,
+            grille.types,
+            index=grille.types.index(devis.type_parcelle) if devis.type_parcelle in grille.types else 0,
             key="type_parcelle_select",
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=demander_rerun_complet
         )
     
     with cols[1]:
         st.markdown("<h3 style='margin-bottom: 10px;'>Périmètre de la parcelle (ml)</h3>", unsafe_allow_html=True)
         
         # SEULEMENT le widget natif Streamlit
-        st.session_state.perimetre = st.number_input(
+        devis.perimetre = st.number_input(
             "Périmètre",
             min_value=10,
             max_value=500,
-            value=st.session_state.perimetre,
+            value=devis.perimetre,
             step=1,
             key="perimetre_input",
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=modifier_estimation
         )
         
-        st.markdown(f"<p style='text-align: center; color: #666; margin-top: 10px;'><strong>Périmètre sélectionné :</strong> {st.session_state.perimetre} ml</p>", unsafe_allow_html=True)
+        st.markdown(f"<p style='text-align: center; color: #666; margin-top: 10px;'><strong>Périmètre sélectionné :</strong> {devis.perimetre} ml</p>", unsafe_allow_html=True)
+        if devis.cotes_leve:
+            st.markdown(f"<p style='text-align: center; color: #888; font-size: 0.85rem;'>Levé topo : {devis.perimetre_leve:.2f} ml, {len(devis.cotes_leve)} côtés</p>", unsafe_allow_html=True)
         
         st.markdown("<h3 style='margin-top: 25px; margin-bottom: 10px;'>Hauteur de clôture</h3>", unsafe_allow_html=True)
         
         # Widget pour la hauteur
-        hauteur_options = list(COEFF_HAUTEUR.keys())
-        current_index = hauteur_options.index(st.session_state.hauteur) if st.session_state.hauteur in hauteur_options else 1
-        
         col_h_minus, col_h_middle, col_h_plus = st.columns([1, 2, 1])
         
         with col_h_minus:
-            if st.button("⬅️", key="hauteur_minus", use_container_width=True):
-                if current_index > 0:
-                    st.session_state.hauteur = hauteur_options[current_index - 1]
-                st.rerun()
+            st.button("⬅️", key="hauteur_minus", use_container_width=True,
+                      on_click=changer_hauteur, args=(-1,))
         
         with col_h_middle:
             st.markdown(f"""
@@ -393,28 +600,69 @@ if st.session_state.current_step >= 2:
                 color: #1a73e8;
                 margin: 0 auto;
             '>
-                {st.session_state.hauteur}
+                {devis.hauteur}
             </div>
             """, unsafe_allow_html=True)
         
         with col_h_plus:
-            if st.button("➡️", key="hauteur_plus", use_container_width=True):
-                if current_index < len(hauteur_options) - 1:
-                    st.session_state.hauteur = hauteur_options[current_index + 1]
-                st.rerun()
+            st.button("➡️", key="hauteur_plus", use_container_width=True,
+                      on_click=changer_hauteur, args=(1,))
+    
+    # Clôture en plusieurs tronçons : longueur, hauteur et type propres à chacun
+    if st.toggle("Clôture en plusieurs tronçons (hauteurs différentes, murs mitoyens…)",
+                 value=bool(devis.segments),
+                 key="mode_segments",
+                 on_change=demander_rerun_complet):
+        st.caption("Le périmètre (ou les côtés du levé), la hauteur et le type ci-dessus servent de point de départ.")
+        saisir_segments(devis, grille)
+    elif devis.segments or "segments_base" in st.session_state:
+        quitter_segments()
+    
+    # Rafale de modifications : l'estimation sera recalculée une fois la rafale terminée
+    if time.monotonic() < st.session_state.get("recalcul_le", 0.0):
+        st.divider()
+        st.info("⏳ Mise à jour de l'estimation…")
+        recalcul_differe()
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+    st.session_state.pop("recalcul_le", None)
     
     # CALCUL ET AFFICHAGE DE L'ESTIMATION
-    st.session_state.estimation = calculate_estimation()
+    with DUREE_SECTION.mesurer(section="estimation"):
+        rendu = rendu_estimation(grille)
+    devis.estimation = rendu.estimation
+    devis.version_tarifs = grille.version
     
     st.divider()
-    st.markdown(f"""
-    <div class='estimation-card'>
-        <h2 style='color: #666; margin: 0;'>Estimation du coût</h2>
-        <h1 style='color: #1a73e8; margin: 15px 0; font-size: 2.8rem;'>{st.session_state.estimation:,.0f} FCFA</h1>
-        <p style='color: #666; margin: 5px 0;'>Pour {st.session_state.perimetre} ml • {st.session_state.hauteur} • {st.session_state.localite}</p>
-        <p style='color: #888; font-size: 0.9rem; margin-top: 10px;'>Inclut fondations, murs, chaînage, enduit • TTC</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(rendu.carte_etape2, unsafe_allow_html=True)
+    if devis.topo != "oui":
+        st.caption("Sans levé topographique, la longueur réelle est incertaine : la fourchette est plus large.")
+    
+    # Construction dans plusieurs mois : coût projeté selon l'indice des prix des matériaux
+    if devis.parcelle in PARCELLES_PROJETEES:
+        with DUREE_SECTION.mesurer(section="projection"):
+            projection = rendu_projection(rendu.estimation)
+        if projection:
+            with st.expander("📈 Coût selon la date de vos travaux", expanded=True):
+                st.markdown(projection, unsafe_allow_html=True)
+    
+    if devis.segments:
+        with st.expander(f"📏 Détail des {len(devis.segments)} tronçons"):
+            st.dataframe(
+                tableau_segments(devis.segments, rendu.prix_segments),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "longueur": st.column_config.NumberColumn("Longueur (ml)", format="%.2f"),
+                    "hauteur": "Hauteur",
+                    "type_parcelle": "Type / mitoyenneté",
+                    "prix": st.column_config.NumberColumn("Estimation (FCFA)", format="%,.0f"),
+                }
+            )
+    else:
+        # Comparatif toutes hauteurs × types de parcelle pour le périmètre choisi
+        with st.expander("📊 Comparer les hauteurs et types de parcelle"):
+            st.markdown(grille_comparaison_html(), unsafe_allow_html=True)
     
     # Messages informatifs - CORRIGÉS (texte noir lisible)
     st.markdown("""
@@ -438,15 +686,26 @@ if st.session_state.current_step >= 2:
                  type="primary", 
                  use_container_width=True,
                  key="btn_step2_continue"):
-        st.session_state.current_step = 3
-        st.rerun()
+        devis.etape = 3
+        ENTONNOIR.inc(transition="etape2_etape3")
+        emettre_evenement("etape3")
+        relancer()
     
     st.markdown("</div>", unsafe_allow_html=True)
+    sauver_session()
+if st.session_state.devis.etape >= 2:
+    etape_2()
+
 
 # -----------------------------
 # ÉTAPE 3: CONTACT
 # -----------------------------
-if st.session_state.current_step == 3:
+@st.fragment
+@DUREE_SECTION.chronometrer(section="etape_3")
+def etape_3():
+    """Étape 3 : coordonnées et envoi WhatsApp"""
+    compter_rerun("3")
+    devis = st.session_state.devis
     st.markdown("<div class='content-section'>", unsafe_allow_html=True)
     st.markdown("<h2 style='color: #1a73e8; margin-bottom: 20px;'>📋 Étape 3: Contact</h2>", unsafe_allow_html=True)
     
@@ -455,47 +714,34 @@ if st.session_state.current_step == 3:
                  key="btn_back_to_step2",
                  use_container_width=True,
                  type="secondary"):
-        st.session_state.current_step = 2
-        st.rerun()
+        devis.etape = 2
+        relancer()
     
     # RÉCAPITULATIF COMPLET
     st.markdown("<h3 style='margin-bottom: 20px;'>Récapitulatif de votre projet</h3>", unsafe_allow_html=True)
     
-    parcelle_text = {
-        "possede": "Terrain disponible",
-        "recherche": "En recherche de terrain", 
-        "futur": "Projet futur"
-    }.get(st.session_state.parcelle, "Non spécifié")
-    
-    topo_text = {
-        "oui": "Levé disponible",
-        "a_faire": "À réaliser",
-        "non": "Non disponible"
-    }.get(st.session_state.topo, "Non spécifié")
-    
     # Métriques
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("📌 Parcelle", parcelle_text)
-        st.metric("📐 Levé topo", topo_text)
+        st.metric("📌 Parcelle", devis.libelle_parcelle)
+        st.metric("📐 Levé topo", devis.libelle_topo)
     
     with col2:
-        st.metric("📍 Localité", st.session_state.localite)
-        st.metric("🔺 Type parcelle", st.session_state.type_parcelle)
+        st.metric("📍 Localité", devis.localite)
+        st.metric("🔺 Type parcelle", "Par tronçon" if devis.segments else devis.type_parcelle)
     
     with col3:
-        st.metric("📏 Périmètre", f"{st.session_state.perimetre} ml")
-        st.metric("📐 Hauteur", st.session_state.hauteur)
+        if devis.segments:
+            st.metric("📏 Longueur totale", f"{devis.longueur_totale:g} ml")
+            st.metric("📐 Tronçons", len(devis.segments))
+        else:
+            st.metric("📏 Périmètre", f"{devis.perimetre} ml")
+            st.metric("📐 Hauteur", devis.hauteur)
     
     # ESTIMATION FINALE
-    st.markdown(f"""
-    <div style='background: #f0f7ff; border-radius: 12px; padding: 25px; margin: 30px 0; border: 2px solid #1a73e8; text-align: center;'>
-        <h2 style='color: #1a73e8; margin: 0;'>ESTIMATION FINALE</h2>
-        <h1 style='color: #1a73e8; margin: 15px 0; font-size: 3rem;'>{st.session_state.estimation:,.0f} FCFA</h1>
-        <p style='color: #666; margin: 5px 0;'>Basé sur DQE validé • Estimation envoyée sous 24h</p>
-    </div>
-    """, unsafe_allow_html=True)
+    rendu = rendu_estimation()
+    st.markdown(rendu.carte_etape3, unsafe_allow_html=True)
     
     # FORMULAIRE DE CONTACT
     st.markdown("<h3 style='margin-bottom: 20px;'>Vos coordonnées</h3>", unsafe_allow_html=True)
@@ -503,66 +749,90 @@ if st.session_state.current_step == 3:
     
     col1, col2 = st.columns(2)
     with col1:
-        st.session_state.nom = st.text_input(
+        devis.nom = st.text_input(
             "Votre nom complet *",
-            value=st.session_state.nom,
+            value=devis.nom,
             placeholder="Ex: Jean Dupont",
             key="nom_input"
         )
     
     with col2:
-        st.session_state.telephone = st.text_input(
+        devis.telephone = st.text_input(
             "Votre numéro WhatsApp *",
-            value=st.session_state.telephone,
+            value=devis.telephone,
             placeholder="Ex: 01 23 45 67 89",
             key="telephone_input"
         )
     
-    st.session_state.email = st.text_input(
+    devis.email = st.text_input(
         "Votre email (facultatif)",
-        value=st.session_state.email,
+        value=devis.email,
         placeholder="email@exemple.com",
         key="email_input"
     )
     
-    st.session_state.projet = st.selectbox(
+    devis.projet = st.selectbox(
         "Avez-vous un projet de construction ?",
-        ["Maison individuelle", "Immeuble", "Commerce", "Autre projet", "Pas de projet immédiat"],
-        index=0,
+        OPTIONS_PROJET,
+        index=OPTIONS_PROJET.index(devis.projet) if devis.projet in OPTIONS_PROJET else 0,
         key="projet_select"
     )
     
     # Validation et bouton WhatsApp
-    if st.session_state.nom and st.session_state.telephone:
+    if devis.nom and devis.telephone:
         st.markdown("<div class='message-box message-success'><strong>✅ Toutes les informations sont complètes. Cliquez ci-dessous pour recevoir votre estimation.</strong></div>", unsafe_allow_html=True)
         
         # Préparation du message WhatsApp
-        message = f"""*ESTIMATION CLÔTURE - EXO PLANETE GROUPE*
-
-*Informations client*
-Nom : {st.session_state.nom}
-Téléphone : {st.session_state.telephone}
-Email : {st.session_state.email if st.session_state.email else 'Non fourni'}
-
-*Critères du projet*
-Parcelle : {parcelle_text}
-Levé topo : {topo_text}
-Localité : {st.session_state.localite}
-Type parcelle : {st.session_state.type_parcelle}
-Périmètre : {st.session_state.perimetre} ml
-Hauteur : {st.session_state.hauteur}
-Projet futur : {st.session_state.projet}
-
-*Estimation*
-Coût estimé : {st.session_state.estimation:,.0f} FCFA
-
-*Demande*
-{'Intéressé par devis détaillé des matériaux' if st.session_state.projet != 'Pas de projet immédiat' else 'Information seulement'}
-
---- 
-Envoyé via l'outil d'estimation en ligne"""
-
-        whatsapp_url = "https://wa.me/2290166815278?text=" + quote(message)
+        with DUREE_SECTION.mesurer(section="message_whatsapp"):
+            detail_leve = f" (levé topo : {devis.perimetre_leve:.2f} ml, {len(devis.cotes_leve)} côtés)" if devis.cotes_leve else ""
+            if devis.segments:
+                criteres_cloture = "\n".join([
+                    f"Clôture : {devis.longueur_totale:g} ml en {len(devis.segments)} tronçons{detail_leve}",
+                    *resume_segments(devis, rendu.prix_segments),
+                ])
+            else:
+                criteres_cloture = f"""Type parcelle : {devis.type_parcelle}
+Périmètre : {devis.perimetre} ml{detail_leve}
+Hauteur : {devis.hauteur}"""
+            valeurs = {
+                "nom": devis.nom,
+                "telephone": devis.telephone,
+                "email": devis.email or "Non fourni",
+                "parcelle": devis.libelle_parcelle,
+                "topo": devis.libelle_topo,
+                "localite": devis.localite,
+                "criteres": criteres_cloture,
+                "projet": devis.projet,
+                "demande": devis.libelle_demande,
+                "estimation": devis.estimation,
+                "p10": rendu.fourchette.p10,
+                "p90": rendu.fourchette.p90,
+                "version_tarifs": devis.version_tarifs,
+            }
+            # Saisie inchangée (rerun d'un autre widget) : message et lien déjà prêts
+            signature = hash(tuple(valeurs.values()))
+            if st.session_state.get("message_whatsapp", (None,))[0] != signature:
+                modele = modeles_whatsapp.modele(projet=devis.projet)
+                st.session_state.message_whatsapp = (
+                    signature, modele.rendre(valeurs), modeles_whatsapp.lien(modeles_whatsapp.NUMERO_SOCIETE, modele.encoder(valeurs)))
+            _, message, whatsapp_url = st.session_state.message_whatsapp
+        
+        # Enregistrement du lead (écriture SQLite en arrière-plan, une fois par contenu) :
+        # une ligne par session, mise à jour à chaque correction des coordonnées ou du devis
+        lead = devis.champs(CHAMPS_LEAD
+                            + (("cotes_leve",) if devis.cotes_leve else ())
+                            + (("segments",) if devis.segments else ()))
+        if "id_lead" not in st.session_state:
+            st.session_state.id_lead = st.session_state.get("jeton_session") or nouveau_jeton()
+        signature = hash(tuple(lead.values()))
+        if st.session_state.get("lead_enregistre") != signature and enregistrer_lead(lead, st.session_state.id_lead):
+            st.session_state.lead_enregistre = signature
+        if not st.session_state.get("whatsapp_compte"):
+            # Lien WhatsApp affiché, compté une fois par session quelles que soient
+            # les corrections ensuite (le clic lui-même n'atteint pas le serveur)
+            st.session_state.whatsapp_compte = True
+            ENTONNOIR.inc(transition="etape3_whatsapp")
+            emettre_evenement("whatsapp")
         
         # Bouton WhatsApp
         st.markdown(f"""
@@ -574,67 +844,56 @@ Envoyé via l'outil d'estimation en ligne"""
         </p>
         """, unsafe_allow_html=True)
         
+        # Devis PDF : rendu au clic, hors de la boucle d'événements, puis servi depuis le cache
+        donnees_pdf = donnees_devis(devis.champs(CHAMPS_PDF))
+        st.download_button("📄 Télécharger le devis PDF",
+                           data=partial(cache_pdf().obtenir, donnees_pdf),
+                           file_name=f"devis-cloture-{cle_devis(donnees_pdf)[:10].lower()}.pdf",
+                           mime="application/pdf",
+                           key="btn_devis_pdf",
+                           on_click="ignore",
+                           use_container_width=True)
+        
+        # Envoi automatique par WhatsApp Business (WHATSAPP_API_URL)
+        if whatsapp.ACTIF:
+            id_envoi = st.session_state.get("envoi_whatsapp")
+            st.button("📨 M'envoyer l'estimation automatiquement",
+                      key="btn_envoi_whatsapp",
+                      use_container_width=True,
+                      disabled=id_envoi is not None,
+                      on_click=envoyer_whatsapp,
+                      args=(message,))
+            if "envoi_whatsapp_erreur" in st.session_state:
+                st.markdown(f"<div class='message-box message-warning'>{st.session_state.envoi_whatsapp_erreur}</div>", unsafe_allow_html=True)
+            elif id_envoi is not None:
+                statut = whatsapp.boite_envoi().statut(id_envoi)
+                if statut is not None and statut.statut in whatsapp.FINAUX:
+                    st.caption(LIBELLES_ENVOI[statut.statut])
+                else:
+                    suivre_envoi_whatsapp(id_envoi)
+        
         # Bouton pour recommencer
         st.divider()
         if st.button("🔄 Faire une nouvelle estimation", 
                      use_container_width=True,
                      type="secondary",
                      key="btn_restart"):
+            oublier_session()
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
-            st.rerun()
+            relancer()
     
     else:
         st.markdown("<div class='message-box message-warning'><strong>Veuillez remplir votre nom et numéro de téléphone pour recevoir votre estimation.</strong></div>", unsafe_allow_html=True)
     
     st.markdown("</div>", unsafe_allow_html=True)
+    sauver_session()
 
-st.markdown("</div>", unsafe_allow_html=True)  # Fermer main-container
+if st.session_state.devis.etape == 3:
+    etape_3()
 
-# -----------------------------
-# SCRIPT POUR SCROLL AUTOMATIQUE
-# -----------------------------
-st.markdown("""
-<script>
-// Fonction pour scroller vers le bas de la page
-function scrollToBottom() {
-    window.scrollTo({
-        top: document.body.scrollHeight,
-        behavior: 'smooth'
-    });
-}
-
-// Fonction pour scroller vers le contenu actif
-function scrollToActiveContent() {
-    const activeSections = document.querySelectorAll('.content-section');
-    if (activeSections.length > 0) {
-        const lastSection = activeSections[activeSections.length - 1];
-        lastSection.scrollIntoView({
-            behavior: 'smooth',
-            block: 'start'
-        });
-    }
-}
+st.markdown("</div>", unsafe_allow_html=True)  # Fermer main-container
+sauver_session()
 
-// Observer les changements du DOM
-const observer = new MutationObserver(function(mutations) {
-    for (let mutation of mutations) {
-        if (mutation.type === 'childList' && mutation.addedNodes.length > 0) {
-            // Attendre un peu que Streamlit termine le rendu
-            setTimeout(scrollToActiveContent, 500);
-            break;
-        }
-    }
-});
-
-// Démarrer l'observation
-observer.observe(document.body, {
-    childList: true,
-    subtree: true
-});
-
-// Scroll initial
-setTimeout(scrollToActiveContent, 1000);
-</script>
-
-""", unsafe_allow_html=True)
+# Le devis seul : sérialiser tout le session_state copierait les fichiers téléversés et les DataFrames
+TAILLE_SESSION.observer(len(st.session_state.devis.serialiser().encode()))
@@ -0,0 +1,44 @@
+// Défilement vers l'étape active, uniquement quand l'étape change : une
+// section .content-section par étape affichée, le défilement suit leur nombre.
+// Les autres mises à jour de la page (saisie, flèches de hauteur, fragments)
+// ne déplacent pas la vue.
+let sectionsAffichees = 0;
+let verificationPrevue = null;
+
+// Fonction pour scroller vers le contenu actif
+function scrollToActiveContent() {
+    const activeSections = document.querySelectorAll('.content-section');
+    if (activeSections.length > 0) {
+        const lastSection = activeSections[activeSections.length - 1];
+        lastSection.scrollIntoView({
+            behavior: 'smooth',
+            block: 'start'
+        });
+    }
+}
+
+// Défile si une nouvelle étape est apparue depuis la dernière vérification
+function verifierEtape() {
+    verificationPrevue = null;
+    const nombre = document.querySelectorAll('.content-section').length;
+    if (nombre > sectionsAffichees) {
+        scrollToActiveContent();
+    }
+    sectionsAffichees = nombre;
+}
+
+// Observer les changements du DOM, en attendant que Streamlit termine le rendu
+const observer = new MutationObserver(function() {
+    if (verificationPrevue === null) {
+        verificationPrevue = setTimeout(verifierEtape, 500);
+    }
+});
+
+// Démarrer l'observation
+observer.observe(document.body, {
+    childList: true,
+    subtree: true
+});
+
+// Étape affichée au chargement (session reprise)
+setTimeout(verifierEtape, 1000);
@@ -0,0 +1,107 @@
+"""Test de charge de l'API d'estimation (api.py).
+
+Ouvre `--connexions` connexions keep-alive vers une instance locale et
+envoie `--requetes` requêtes au total, puis affiche le débit, les
+percentiles de latence côté client et le temps de traitement côté serveur.
+
+    python api.py &
+    python benchmarks/charge_api.py --connexions 200 --requetes 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+HAUTEURS = ["1.8m", "2.0m (standard)", "2.5m", "3.0m"]
+LOCALITES = ["Abomey-Calavi", "Cotonou", "Porto-Novo", "Parakou"]
+TYPES = ["Angle", "Entre 3 parcelles"]
+
+
+def _corps_unitaire():
+    return {
+        "perimetre": random.randint(10, 500),
+        "hauteur": random.choice(HAUTEURS),
+        "localite": random.choice(LOCALITES),
+        "type_parcelle": random.choice(TYPES),
+    }
+
+
+def _requete(hote, chemin, corps):
+    donnees = json.dumps(corps).encode()
+    return (
+        f"POST {chemin} HTTP/1.1\r\nHost: {hote}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(donnees)}\r\n\r\n"
+    ).encode() + donnees
+
+
+async def _client(hote, port, requetes, lot, latences, serveur_us):
+    lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    try:
+        for _ in range(requetes):
+            if lot:
+                message = _requete(hote, "/estimations", {"devis": [_corps_unitaire() for _ in range(lot)]})
+            else:
+                message = _requete(hote, "/estimation", _corps_unitaire())
+            debut = time.perf_counter()
+            ecrivain.write(message)
+            await ecrivain.drain()
+
+            statut = await lecteur.readline()
+            longueur = 0
+            while True:
+                ligne = await lecteur.readline()
+                if ligne in (b"\r\n", b""):
+                    break
+                nom, _, valeur = ligne.decode().partition(":")
+                nom = nom.lower()
+                if nom == "content-length":
+                    longueur = int(valeur)
+                elif nom == "x-temps-traitement-us":
+                    serveur_us.append(int(valeur))
+            await lecteur.readexactly(longueur)
+            latences.append(time.perf_counter() - debut)
+            if b" 200 " not in statut:
+                raise RuntimeError(statut.decode().strip())
+    finally:
+        ecrivain.close()
+
+
+def _percentile(valeurs, p):
+    return valeurs[min(len(valeurs) - 1, int(p / 100 * len(valeurs)))]
+
+
+async def lancer(hote, port, connexions, requetes, lot):
+    latences, serveur_us = [], []
+    par_client = max(1, requetes // connexions)
+    debut = time.perf_counter()
+    await asyncio.gather(*(
+        _client(hote, port, par_client, lot, latences, serveur_us) for _ in range(connexions)
+    ))
+    duree = time.perf_counter() - debut
+
+    latences.sort()
+    serveur_us.sort()
+    total = len(latences)
+    print(f"{total:,} requêtes en {duree:.2f} s • {total / duree:,.0f} req/s ({connexions} connexions)")
+    print("latence client (ms) : " + " • ".join(
+        f"p{p} {_percentile(latences, p) * 1000:.2f}" for p in (50, 90, 99)
+    ))
+    print(f"traitement serveur (µs) : moyenne {statistics.mean(serveur_us):.0f} • "
+          f"p99 {_percentile(serveur_us, 99)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge de l'API d'estimation")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connexions", type=int, default=100)
+    parser.add_argument("--requetes", type=int, default=20_000)
+    parser.add_argument("--lot", type=int, default=0, help="devis par requête (/estimations), 0 = unitaire")
+    args = parser.parse_args(argv)
+    asyncio.run(lancer(args.hote, args.port, args.connexions, args.requetes, args.lot))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Test de charge de l'application Streamlit : sessions simultanées.
+
+Lance un serveur headless puis fait jouer le parcours complet de
+`reruns.PARCOURS` (boutons parcelle/topo, « Continuer », hauteur,
+périmètre, coordonnées) à `--sessions` navigateurs simulés en parallèle.
+Affiche les percentiles de latence par interaction, la mémoire de pointe
+du serveur rapportée à une session et le temps CPU total consommé.
+
+    python benchmarks/charge_app.py --sessions 200 --montee 5
+"""
+import argparse
+import asyncio
+import random
+import resource
+import time
+
+import websockets
+
+from reruns import PARCOURS, SessionNavigateur, _port_libre, demarrer_serveur, RACINE
+
+
+def _memoire_kio(pid, champ):
+    """VmRSS / VmHWM d'un processus en Kio (Linux), None ailleurs"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for ligne in f:
+                if ligne.startswith(champ + ":"):
+                    return int(ligne.split()[1])
+    except OSError:
+        return None
+
+
+async def _session(port, montee, mesures, erreurs):
+    await asyncio.sleep(random.uniform(0, montee))
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_size=None) as ws:
+            navigateur = SessionNavigateur(ws)
+            for libelle, cle, valeur in PARCOURS:
+                duree, _ = await navigateur.interagir(cle, valeur)
+                mesures[libelle].append(duree)
+    except Exception as exc:  # une session en échec ne doit pas arrêter le test
+        erreurs.append(repr(exc))
+
+
+async def lancer(port, sessions, montee):
+    mesures = {libelle: [] for libelle, _, _ in PARCOURS}
+    erreurs = []
+    await asyncio.gather(*(_session(port, montee, mesures, erreurs) for _ in range(sessions)))
+    return mesures, erreurs
+
+
+def _percentile(valeurs, p):
+    return valeurs[min(len(valeurs) - 1, int(p / 100 * len(valeurs)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sessions simultanées sur l'application Streamlit")
+    parser.add_argument("--app", default=str(RACINE / "app.py"))
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--montee", type=float, default=2.0, help="durée de montée en charge (s)")
+    args = parser.parse_args(argv)
+
+    port = _port_libre()
+    serveur = demarrer_serveur(args.app, port)
+    try:
+        # Session d'échauffement : imports, caches, grille des tarifs
+        asyncio.run(lancer(port, 1, 0))
+        rss_initial = _memoire_kio(serveur.pid, "VmRSS")
+        debut = time.perf_counter()
+        mesures, erreurs = asyncio.run(lancer(port, args.sessions, args.montee))
+        duree = time.perf_counter() - debut
+        rss_pointe = _memoire_kio(serveur.pid, "VmHWM")
+    finally:
+        serveur.terminate()
+        serveur.wait()
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    print(f"{args.sessions} sessions en {duree:.1f} s • {len(erreurs)} en échec")
+    print(f"{'interaction':<20} {'p50 (ms)':>9} {'p90 (ms)':>9} {'p99 (ms)':>9}")
+    for libelle, durees in mesures.items():
+        if durees:
+            durees.sort()
+            print(f"{libelle:<20} " + " ".join(
+                f"{_percentile(durees, p) * 1000:>9.1f}" for p in (50, 90, 99)
+            ))
+    print(f"CPU serveur : {usage.ru_utime + usage.ru_stime:.1f} s "
+          f"(utilisateur {usage.ru_utime:.1f} s, système {usage.ru_stime:.1f} s)")
+    if rss_initial and rss_pointe:
+        print(f"mémoire : {rss_initial / 1024:.0f} Mio au repos, pointe {rss_pointe / 1024:.0f} Mio, "
+              f"≈ {(rss_pointe - rss_initial) / args.sessions:.0f} Kio par session")
+    for erreur in erreurs[:5]:
+        print("échec :", erreur)
+
+
+if __name__ == "__main__":
+    main()
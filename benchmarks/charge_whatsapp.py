@@ -0,0 +1,178 @@
+"""Boîte d'envoi WhatsApp (whatsapp.py) face à un serveur simulé.
+
+Le serveur simulé répond comme l'API WhatsApp Cloud, avec une latence
+aléatoire et une part d'erreurs 429 (Retry-After) et 500. `--threads`
+producteurs (autant de sessions Streamlit) déposent `--messages` messages
+chacun ; le script mesure le temps passé dans `deposer()`, le débit et la
+concurrence vus par le serveur, et les statuts finaux.
+
+    python benchmarks/charge_whatsapp.py --threads 20 --messages 50 --debit 50
+
+Serveur simulé seul, pour l'application (WHATSAPP_API_URL=http://127.0.0.1:8090/messages) :
+
+    python benchmarks/charge_whatsapp.py --serveur-seul --port 8090
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from whatsapp import BoiteEnvoi  # noqa: E402
+
+TEXTE = "*ESTIMATION CLÔTURE - EXO PLANETE GROUPE*\n\nCoût estimé : 4,132,001 FCFA"
+
+
+class ServeurSimule:
+    """API WhatsApp simulée : latence, erreurs 429/500, débit et concurrence observés.
+
+    `scenario` fixe les statuts des premières réponses, dans l'ordre (les
+    suivantes sont tirées au hasard) ; `requetes` garde l'instant et les
+    en-têtes de chaque requête reçue.
+    """
+
+    def __init__(self, latence=0.05, taux_429=0.05, taux_500=0.05, scenario=(), retry_after=1):
+        self.latence = latence
+        self.taux_429 = taux_429
+        self.taux_500 = taux_500
+        self.scenario = list(scenario)
+        self.retry_after = retry_after
+        self.requetes = []  # (time.monotonic(), en-têtes)
+        self.recus = Counter()  # seconde -> requêtes
+        self.statuts = Counter()
+        self.en_cours = 0
+        self.max_en_cours = 0
+        self._numeros = itertools.count(1)
+
+    async def gerer(self, lecteur, ecrivain):
+        try:
+            entetes = {}
+            await lecteur.readline()
+            while (ligne := await lecteur.readline()) not in (b"\r\n", b""):
+                nom, _, valeur = ligne.decode("latin-1").partition(":")
+                entetes[nom.strip().lower()] = valeur.strip()
+            corps = json.loads(await lecteur.readexactly(int(entetes.get("content-length", 0))))
+            self.recus[int(time.monotonic())] += 1
+            self.requetes.append((time.monotonic(), entetes))
+            self.en_cours += 1
+            self.max_en_cours = max(self.max_en_cours, self.en_cours)
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.latence)
+            self.en_cours -= 1
+
+            if self.scenario:
+                impose = self.scenario.pop(0)
+            else:
+                tirage = random.random()
+                impose = 429 if tirage < self.taux_429 else 500 if tirage < self.taux_429 + self.taux_500 else 200
+            if impose == 429:
+                statut, reponse, extra = 429, {"error": {"code": 130429}}, f"Retry-After: {self.retry_after}\r\n"
+            elif impose >= 300:
+                statut, reponse, extra = impose, {"error": {"code": 1}}, ""
+            else:
+                statut, extra = 200, ""
+                reponse = {"messaging_product": "whatsapp", "contacts": [{"wa_id": corps["to"]}],
+                           "messages": [{"id": f"wamid.{next(self._numeros)}"}]}
+            self.statuts[statut] += 1
+            donnees = json.dumps(reponse).encode()
+            ecrivain.write(
+                f"HTTP/1.1 {statut} X\r\nContent-Type: application/json\r\n{extra}"
+                f"Content-Length: {len(donnees)}\r\nConnection: close\r\n\r\n".encode() + donnees
+            )
+            await ecrivain.drain()
+        finally:
+            ecrivain.close()
+
+
+def demarrer_serveur(simule, port=0):
+    """Lance le serveur simulé dans un thread ; retourne son port"""
+    pret = threading.Event()
+    ports = []
+
+    async def servir():
+        serveur = await asyncio.start_server(simule.gerer, "127.0.0.1", port)
+        ports.append(serveur.sockets[0].getsockname()[1])
+        pret.set()
+        async with serveur:
+            await serveur.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(servir(),), daemon=True).start()
+    pret.wait()
+    return ports[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Boîte d'envoi WhatsApp face à un serveur simulé")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50, help="messages par thread")
+    parser.add_argument("--debit", type=float, default=50.0, help="messages/s autorisés")
+    parser.add_argument("--concurrence", type=int, default=8)
+    parser.add_argument("--latence", type=float, default=0.05, help="latence moyenne du serveur (s)")
+    parser.add_argument("--taux-erreurs", type=float, default=0.1, help="part de réponses 429 et 500")
+    parser.add_argument("--serveur-seul", action="store_true")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    simule = ServeurSimule(args.latence, args.taux_erreurs / 2, args.taux_erreurs / 2)
+    port = demarrer_serveur(simule, args.port)
+    if args.serveur_seul:
+        print(f"API WhatsApp simulée sur http://127.0.0.1:{port}/messages (Ctrl+C pour arrêter)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    with tempfile.TemporaryDirectory() as dossier:
+        boite = BoiteEnvoi(f"http://127.0.0.1:{port}/messages", "jeton-test", os.path.join(dossier, "boite.sqlite3"),
+                           concurrence=args.concurrence, debit=args.debit, rafale=args.debit, backoff_base=0.2)
+        boite.demarrer()
+        durees = []
+        verrou = threading.Lock()
+
+        def producteur(numero):
+            locales = []
+            for i in range(args.messages):
+                debut = time.perf_counter()
+                boite.deposer(f"01 97 {numero:02d} {i:04d}", TEXTE)
+                locales.append(time.perf_counter() - debut)
+            with verrou:
+                durees.extend(locales)
+
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=producteur, args=(n,)) for n in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        depot = time.perf_counter() - debut
+
+        total = args.threads * args.messages
+        while sum(n for statut, n in boite.compter().items() if statut in ("envoye", "echec")) < total:
+            time.sleep(0.05)
+        duree = time.perf_counter() - debut
+        comptes = boite.compter()
+        boite.fermer()
+
+    durees.sort()
+    secondes = sorted(simule.recus)[1:-1] or sorted(simule.recus)
+    print(f"{total:,} messages déposés en {depot:.2f} s par {args.threads} threads")
+    print(f"deposer() (ms) : médiane {statistics.median(durees) * 1000:.2f} • "
+          f"p99 {durees[int(0.99 * (len(durees) - 1))] * 1000:.2f}")
+    print(f"tous traités en {duree:.2f} s • {total / duree:,.1f} messages/s (limite {args.debit:g}/s)")
+    print(f"serveur : {sum(simule.statuts.values()):,} requêtes {dict(simule.statuts)} • "
+          f"max {max(simule.recus[s] for s in secondes)}/s • concurrence max {simule.max_en_cours} "
+          f"(limite {args.concurrence})")
+    print(f"statuts finaux : {comptes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Démarrage à froid de l'application, avec un budget vérifiable par le build.
+
+Deux mesures, chacune dans des processus neufs :
+- imports : durée des imports de premier niveau de app.py (modules du
+  dépôt et dépendances), une fois Streamlit chargé, et liste des
+  dépendances lourdes qu'ils tirent (pandas, pyarrow...) ;
+- première estimation : `streamlit run` en mode headless, puis une
+  session websocket qui ouvre la page et va jusqu'à l'étape 2 ; la durée
+  court du lancement du serveur jusqu'à l'affichage de l'estimation
+  (imports, premier run du script, grille des tarifs).
+
+    python benchmarks/demarrage.py
+    python benchmarks/demarrage.py --budget-imports 150 --budget-estimation 2500
+
+Le script se termine avec le code 1 si une médiane dépasse son budget (ms),
+ou si les imports chargent une dépendance lourde : le build peut l'exécuter
+tel quel. Les budgets par défaut laissent de la marge pour un petit hôte.
+"""
+import argparse
+import ast
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import websockets
+
+from reruns import PARCOURS, SessionNavigateur, _port_libre, demarrer_serveur, RACINE
+
+BUDGET_IMPORTS = 250  # ms
+BUDGET_ESTIMATION = 4000
+
+# Modules que le parcours jusqu'à l'estimation ne doit pas charger
+LOURDS = ("pandas", "pyarrow", "scipy", "matplotlib", "dotenv")
+
+MESURE_IMPORTS = """
+import importlib, json, sys, time
+import streamlit
+avant = set(sys.modules)
+debut = time.perf_counter()
+for module in {modules!r}:
+    importlib.import_module(module)
+duree = time.perf_counter() - debut
+charges = sorted({{m.split(".")[0] for m in set(sys.modules) - avant}})
+print(json.dumps({{"duree": duree, "charges": charges}}))
+"""
+
+
+def imports_app(app):
+    """Modules importés au niveau supérieur de `app` (hors Streamlit)"""
+    modules = []
+    for noeud in ast.parse(app.read_text(encoding="utf-8")).body:
+        if isinstance(noeud, ast.Import):
+            modules.extend(alias.name for alias in noeud.names)
+        elif isinstance(noeud, ast.ImportFrom) and noeud.module:
+            modules.append(noeud.module)
+    return [m for m in dict.fromkeys(modules) if m.split(".")[0] != "streamlit"]
+
+
+def mesurer_imports(app):
+    code = MESURE_IMPORTS.format(modules=imports_app(app))
+    sortie = subprocess.run([sys.executable, "-c", code], cwd=app.parent, capture_output=True,
+                            text=True, check=True)
+    return json.loads(sortie.stdout)
+
+
+async def premiere_estimation(port):
+    """Ouvre une session et la mène jusqu'à l'affichage de l'estimation (étape 2)"""
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_size=None) as ws:
+        session = SessionNavigateur(ws)
+        for _, cle, valeur in PARCOURS:
+            await session.interagir(cle, valeur)
+            if cle == "btn_step1_continue":
+                return
+
+
+def mesurer_estimation(app):
+    port = _port_libre()
+    debut = time.perf_counter()
+    serveur = demarrer_serveur(app, port)
+    try:
+        pret = time.perf_counter() - debut
+        asyncio.run(premiere_estimation(port))
+        return pret, time.perf_counter() - debut
+    finally:
+        serveur.terminate()
+        serveur.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durée des imports et de la première estimation à froid")
+    parser.add_argument("--app", default=str(RACINE / "app.py"))
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--budget-imports", type=float, default=BUDGET_IMPORTS, help="ms, médiane")
+    parser.add_argument("--budget-estimation", type=float, default=BUDGET_ESTIMATION, help="ms, médiane")
+    args = parser.parse_args(argv)
+    app = RACINE / args.app
+
+    imports = [mesurer_imports(app) for _ in range(args.repetitions)]
+    estimations = [mesurer_estimation(app) for _ in range(args.repetitions)]
+
+    duree_imports = statistics.median(m["duree"] for m in imports) * 1000
+    lourds = sorted(set().union(*(m["charges"] for m in imports)) & set(LOURDS))
+    duree_pret = statistics.median(pret for pret, _ in estimations) * 1000
+    duree_estimation = statistics.median(total for _, total in estimations) * 1000
+    print(f"imports de {app.name} : {duree_imports:,.0f} ms • dépendances lourdes : {', '.join(lourds) or 'aucune'}")
+    print(f"serveur prêt : {duree_pret:,.0f} ms • première estimation : {duree_estimation:,.0f} ms "
+          f"(médianes sur {args.repetitions})")
+
+    depassements = [
+        f"{nom} {duree:,.0f} ms > budget {budget:,.0f} ms"
+        for nom, duree, budget in (("imports", duree_imports, args.budget_imports),
+                                   ("première estimation", duree_estimation, args.budget_estimation))
+        if duree > budget
+    ] + [f"{module} chargé à l'import de {app.name}" for module in lourds]
+    for depassement in depassements:
+        print(f"DÉPASSEMENT : {depassement}")
+    return 1 if depassements else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Analytique de l'entonnoir (entonnoir.py) sous charge.
+
+`--threads` producteurs (autant de sessions Streamlit) émettent
+`--evenements` événements chacun, avec `--localites` localités distinctes
+de popularité Zipf. Le script mesure le temps passé dans `emettre()`, le
+débit de bout en bout (les producteurs se partagent le GIL avec le thread
+d'agrégation) et celui de l'agrégation seule, la mémoire des agrégats
+(tracemalloc, constante quel que soit le nombre d'événements) et
+l'écriture Parquet ; il compare le top-k Space-Saving aux comptes exacts.
+
+    python benchmarks/entonnoir.py --threads 20 --evenements 20000 --localites 5000
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import entonnoir as module_entonnoir  # noqa: E402
+from entonnoir import EVENEMENTS, Entonnoir  # noqa: E402
+
+HAUTEURS = ("1.8m", "2.0m (standard)", "2.5m", "3.0m")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analytique de l'entonnoir sous charge")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--evenements", type=int, default=20_000, help="événements par thread")
+    parser.add_argument("--localites", type=int, default=100)
+    parser.add_argument("--k", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    poids = [1 / rang for rang in range(1, args.localites + 1)]
+    localites = [f"Localité {rang}" for rang in range(args.localites)]
+    exacts = Counter()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        tracemalloc.start()
+        entonnoir = Entonnoir(dossier, intervalle=3600, taille_file=100_000, k=args.k)
+        durees = []
+        verrou = threading.Lock()
+
+        def producteur(graine):
+            rng = random.Random(graine)
+            tirages = rng.choices(localites, poids, k=args.evenements)
+            locales = []
+            for localite in tirages:
+                debut = time.perf_counter()
+                while not entonnoir.emettre("etape3", localite, rng.choice(HAUTEURS), rng.randint(10, 500)):
+                    time.sleep(0.001)  # file pleine : on attend l'agrégation
+                locales.append(time.perf_counter() - debut)
+            with verrou:
+                durees.extend(locales)
+                exacts.update(tirages)
+
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=producteur, args=(n,)) for n in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total = args.threads * args.evenements
+        while entonnoir.recus < total:
+            time.sleep(0.01)
+        duree = time.perf_counter() - debut
+        # Mémoire allouée par entonnoir.py et encore en vie : file vide, restent les agrégats
+        traces = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, module_entonnoir.__file__)])
+        memoire = sum(stat.size for stat in traces.statistics("filename"))
+        tracemalloc.stop()
+
+        top = entonnoir.tops["etape3", "localite"].top(10)
+        debut = time.perf_counter()
+        entonnoir.fermer()
+        ecriture = time.perf_counter() - debut
+        octets = sum(f.stat().st_size for f in Path(dossier).rglob("*.parquet"))
+
+    # Agrégation seule, dans le thread courant
+    rng = random.Random(0)
+    seul = Entonnoir(None, intervalle=3600, k=args.k)
+    evenements = [(time.time(), "etape3", localite, rng.choice(HAUTEURS), rng.randint(10, 500))
+                  for localite in rng.choices(localites, poids, k=200_000)]
+    debut = time.perf_counter()
+    for evenement in evenements:
+        seul._agreger(*evenement)
+    agregation = len(evenements) / (time.perf_counter() - debut)
+    seul.fermer()
+
+    durees.sort()
+    print(f"{total:,} événements de {args.threads} threads en {duree:.2f} s • {total / duree:,.0f} événements/s "
+          f"(agrégation seule : {agregation:,.0f} événements/s)")
+    print(f"emettre() (µs) : médiane {statistics.median(durees) * 1e6:.1f} • "
+          f"p99 {durees[int(0.99 * (len(durees) - 1))] * 1e6:.1f}")
+    print(f"mémoire des agrégats : {memoire / 1024:,.0f} Kio ({len(EVENEMENTS)} événements, k={args.k})")
+    print(f"écriture Parquet : {ecriture * 1000:.1f} ms • {octets / 1024:,.1f} Kio")
+    print("top 10 des localités (Space-Saving / exact) :")
+    for valeur, nombre, erreur in top:
+        print(f"  {valeur:<16} {nombre:>8,} (± {erreur:,}) / {exacts[valeur]:>8,}")
+
+
+if __name__ == "__main__":
+    main()
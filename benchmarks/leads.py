@@ -0,0 +1,72 @@
+"""Débit de l'enregistrement des leads lors de pics (ex. spot radio).
+
+`--threads` producteurs (autant de sessions Streamlit) déposent chacun
+`--leads` leads aussi vite que possible. Le script mesure le temps passé
+dans `enregistrer()` (ce que paie le rerun) et le débit d'écriture SQLite
+jusqu'à ce que tout soit persisté.
+
+    python benchmarks/leads.py --threads 50 --leads 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from leads import EcrivainLeads  # noqa: E402
+
+LEAD = {
+    "nom": "Jean Dupont", "telephone": "01 23 45 67 89", "email": "", "projet": "Maison individuelle",
+    "parcelle": "possede", "topo": "oui", "localite": "Cotonou", "type_parcelle": "Angle",
+    "perimetre": 70, "hauteur": "2.0m (standard)", "estimation": 4132001.0, "version_tarifs": "bench",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Débit de la file d'écriture des leads")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--leads", type=int, default=1000, help="leads par thread")
+    parser.add_argument("--taille-lot", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        total = args.threads * args.leads
+        ecrivain = EcrivainLeads(os.path.join(dossier, "leads.sqlite3"),
+                                 taille_file=total, taille_lot=args.taille_lot)
+        durees = []
+        verrou = threading.Lock()
+
+        def producteur():
+            locales = []
+            for _ in range(args.leads):
+                debut = time.perf_counter()
+                ecrivain.enregistrer(LEAD)
+                locales.append(time.perf_counter() - debut)
+            with verrou:
+                durees.extend(locales)
+
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=producteur) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        depot = time.perf_counter() - debut
+        ecrivain.fermer(delai=600)
+        ecriture = time.perf_counter() - debut
+
+    durees.sort()
+    print(f"{total:,} leads déposés par {args.threads} threads en {depot:.2f} s")
+    print(f"enregistrer() : médiane {statistics.median(durees) * 1e6:.1f} µs • "
+          f"p99 {durees[int(0.99 * len(durees))] * 1e6:.1f} µs")
+    print(f"{ecrivain.ecrits:,} leads persistés en {ecriture:.2f} s • "
+          f"{ecrivain.ecrits / ecriture:,.0f} leads/s • {ecrivain.rejetes} rejetés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Temps de lecture et de mesure des levés topographiques volumineux.
+
+Génère une parcelle rectangulaire de 30 × 20 m relevée avec `--points`
+points (plus un pan coupé), l'écrit en CSV, GeoJSON, DXF LWPOLYLINE et
+DXF POLYLINE, puis mesure `leve_topo.mesurer_fichier()` sur chacun.
+
+    python benchmarks/leve_topo.py --points 50000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import leve_topo  # noqa: E402
+
+ORIGINE = (432_100.0, 712_300.0)  # UTM 31N, Cotonou
+SOMMETS = np.array([(0, 0), (30, 0), (30, 17), (27, 20), (0, 20)], dtype=float)
+
+
+def contour(points):
+    """Points régulièrement espacés sur le contour de SOMMETS (non fermé)"""
+    fermes = np.vstack([SOMMETS, SOMMETS[:1]])
+    longueurs = np.hypot(*np.diff(fermes, axis=0).T)
+    abscisses = np.linspace(0, longueurs.sum(), points, endpoint=False)
+    cumul = np.concatenate([[0], np.cumsum(longueurs)])
+    cote = np.searchsorted(cumul, abscisses, side="right") - 1
+    t = ((abscisses - cumul[cote]) / longueurs[cote])[:, None]
+    return fermes[cote] + t * (fermes[cote + 1] - fermes[cote])
+
+
+def fichiers(points):
+    xy = contour(points) + ORIGINE
+    lignes = "\n".join(f"{i},{x:.3f},{y:.3f},12.5" for i, (x, y) in enumerate(xy, 1))
+    yield "leve.csv", "point,x,y,z\n" + lignes
+
+    lat0 = np.radians(6.37)
+    lon = 2.38 + np.degrees((xy[:, 0] - ORIGINE[0]) / (leve_topo.RAYON_TERRE * np.cos(lat0)))
+    lat = 6.37 + np.degrees((xy[:, 1] - ORIGINE[1]) / leve_topo.RAYON_TERRE)
+    anneau = np.column_stack([lon, lat]).round(8).tolist()
+    yield "leve.geojson", json.dumps({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [anneau + anneau[:1]]}})
+
+    sommets = "".join(f"10\n{x:.3f}\n20\n{y:.3f}\n" for x, y in xy)
+    yield "lwpolyline.dxf", f"0\nSECTION\n2\nENTITIES\n0\nLWPOLYLINE\n90\n{len(xy)}\n70\n1\n{sommets}0\nENDSEC\n0\nEOF\n"
+
+    vertex = "".join(f"0\nVERTEX\n8\n0\n10\n{x:.3f}\n20\n{y:.3f}\n30\n0.0\n" for x, y in xy)
+    yield "polyline.dxf", f"0\nSECTION\n2\nENTITIES\n0\nPOLYLINE\n8\n0\n66\n1\n10\n0.0\n20\n0.0\n30\n0.0\n70\n1\n{vertex}0\nSEQEND\n0\nENDSEC\n0\nEOF\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lecture de levés topographiques volumineux")
+    parser.add_argument("--points", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    attendu = np.hypot(*np.diff(np.vstack([SOMMETS, SOMMETS[:1]]), axis=0).T).sum()
+    print(f"{args.points:,} points • périmètre attendu {attendu:.2f} ml, 5 coins")
+    for nom, texte in fichiers(args.points):
+        contenu = texte.encode()
+        durees = []
+        for _ in range(5):
+            debut = time.perf_counter()
+            leve = leve_topo.mesurer_fichier(contenu, nom)
+            durees.append(time.perf_counter() - debut)
+        print(f"{nom:<16} {len(contenu) / 1e6:>6.1f} Mo {min(durees) * 1000:>8.1f} ms • "
+              f"{leve.perimetre:.2f} ml, {leve.coins} coins, côtés {np.round(leve.cotes, 2).tolist()}")
+
+
+if __name__ == "__main__":
+    main()
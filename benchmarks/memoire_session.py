@@ -0,0 +1,100 @@
+"""Mémoire et coût de sérialisation de l'état d'une session.
+
+Compare, pour `--sessions` sessions Streamlit (`SessionState` réel) :
+- avant : une clé de session_state par valeur (étape, choix, coordonnées,
+  estimation), comme le dict `defaults` d'origine ;
+- après : un seul `Devis` (devis.py) à slots.
+
+Les valeurs des widgets, stockées par Streamlit dans les deux cas, ne sont
+pas comptées.
+
+    python benchmarks/memoire_session.py --sessions 10000
+"""
+import argparse
+import gc
+import json
+import pickle
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+from streamlit.runtime.state.session_state import SessionState
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from devis import Devis  # noqa: E402
+
+# Valeurs distinctes par session, comme après un parcours complet
+def _valeurs(i):
+    return {
+        "current_step": 3, "parcelle": "possede", "topo": "oui", "localite": "Cotonou",
+        "type_parcelle": "Angle", "perimetre": 10 + i % 491, "hauteur": "2.5m", "nom": f"Client {i}",
+        "telephone": f"01 {i:08d}", "email": "", "projet": "Maison individuelle",
+        "estimation": 4751801.0925 + i, "version_tarifs": "68926a9c105b",
+    }
+
+
+def etat_avant(i):
+    etat = SessionState()
+    for cle, valeur in _valeurs(i).items():
+        etat[cle] = valeur
+    return etat
+
+
+def etat_apres(i):
+    valeurs = _valeurs(i)
+    valeurs["etape"] = valeurs.pop("current_step")
+    etat = SessionState()
+    etat["devis"] = Devis(**valeurs)
+    return etat
+
+
+def _memoire(fabrique, n):
+    gc.collect()
+    tracemalloc.start()
+    etats = [fabrique(i) for i in range(n)]
+    taille, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return etats, taille / n
+
+
+def _duree(fonction):
+    minuteur = timeit.Timer(fonction)
+    nombre, _ = minuteur.autorange()
+    return min(minuteur.repeat(repeat=5, number=nombre)) / nombre
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mémoire de l'état de session avant/après Devis")
+    parser.add_argument("--sessions", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    _, octets_vide = _memoire(lambda i: SessionState(), args.sessions)
+    _, octets_avant = _memoire(etat_avant, args.sessions)
+    _, octets_apres = _memoire(etat_apres, args.sessions)
+
+    dict_avant = _valeurs(1)
+    devis = etat_apres(1)["devis"]
+    pickle_avant = pickle.dumps(dict_avant)
+    pickle_apres = pickle.dumps({"devis": devis})
+    json_avant = json.dumps(dict_avant, ensure_ascii=False, separators=(",", ":"))
+    json_apres = devis.serialiser()
+
+    print(f"{'':<34} {'avant':>12} {'après':>12}")
+    print(f"{'mémoire par session (octets)':<34} {octets_avant:>12,.0f} {octets_apres:>12,.0f}")
+    print(f"{'  dont état du devis (octets)':<34} {octets_avant - octets_vide:>12,.0f} "
+          f"{octets_apres - octets_vide:>12,.0f}")
+    print(f"{'pickle session_state (octets)':<34} {len(pickle_avant):>12,} {len(pickle_apres):>12,}")
+    print(f"{'pickle session_state (µs)':<34} {_duree(lambda: pickle.dumps(dict_avant)) * 1e6:>12.2f} "
+          f"{_duree(lambda: pickle.dumps({'devis': devis})) * 1e6:>12.2f}")
+    print(f"{'magasin de sessions (octets)':<34} {len(json_avant.encode()):>12,} {len(json_apres.encode()):>12,}")
+    print(f"{'magasin de sessions (µs)':<34} "
+          f"{_duree(lambda: json.dumps(dict_avant, ensure_ascii=False, separators=(',', ':'))) * 1e6:>12.2f} "
+          f"{_duree(devis.serialiser) * 1e6:>12.2f}")
+    print(f"{'restauration (µs)':<34} {_duree(lambda: json.loads(json_avant)) * 1e6:>12.2f} "
+          f"{_duree(lambda: Devis.deserialiser(json_apres)) * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Micro-benchmarks du chemin de tarification (hors Streamlit).
+
+    python benchmarks/micro_tarification.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import dqe  # noqa: E402
+import fourchette  # noqa: E402
+import tarification  # noqa: E402
+from cache_lru import CacheLRU  # noqa: E402
+from localites import index_localites  # noqa: E402
+
+N = 100_000
+
+
+def mesurer(libelle, fonction, repetitions=None, lignes=1):
+    """Affiche le temps moyen d'un appel (et par ligne pour les lots)"""
+    minuteur = timeit.Timer(fonction)
+    if repetitions is None:
+        repetitions, _ = minuteur.autorange()
+    duree = min(minuteur.repeat(repeat=5, number=repetitions)) / repetitions
+    detail = f" • {duree / lignes * 1e9:,.0f} ns/ligne" if lignes > 1 else ""
+    print(f"{libelle:<45} {duree * 1e6:>12,.2f} µs{detail}")
+
+
+def main():
+    config = tarification.config_tarifs()
+    grille = tarification.GrilleTarifs(config)
+    hasard = np.random.default_rng(0)
+    perimetres = hasard.integers(10, 501, N)
+    hauteurs = hasard.choice(list(config.coeff_hauteur), N).astype(object)
+    localites = hasard.choice(list(config.localites), N).astype(object)
+    types = hasard.choice(list(config.types_parcelle), N).astype(object)
+    lot = pd.DataFrame({"perimetre": perimetres, "hauteur": hauteurs, "localite": localites, "type_parcelle": types})
+    cache = CacheLRU()
+    cache.obtenir("cle", lambda: 1)
+
+    mesurer("config_tarifs() (fichier inchangé)", tarification.config_tarifs)
+    mesurer("estimer_devis()", lambda: tarification.estimer_devis(70, "2.5m", "Cotonou", "Angle", config))
+    mesurer("GrilleTarifs.estimer()", lambda: grille.estimer(70, "2.5m", "Cotonou", "Angle"))
+    mesurer("GrilleTarifs() (construction)", lambda: tarification.GrilleTarifs(config))
+    mesurer("CacheLRU.obtenir() (succès)", lambda: cache.obtenir("cle", int))
+    index = index_localites(config.localites)
+    mesurer(f"IndexLocalites.chercher() ({len(index.noms)} localités)", lambda: index.chercher("abomey ca"))
+    mesurer("IndexLocalites.resoudre() (saisie inconnue)",
+            lambda: (index._resolus.clear(), index.resoudre("Kotonou")))
+    mesurer(f"estimer() sur {N:,} devis", lambda: tarification.estimer(perimetres, hauteurs, localites, types, config),
+            lignes=N)
+    mesurer(f"estimer_lot() sur {N:,} lignes", lambda: tarification.estimer_lot(lot, config), lignes=N)
+    mesurer("calculer_dqe() 500 ml (cache vidé)",
+            lambda: (dqe._dqe.cache_clear(), dqe.calculer_dqe(500, "2.5m", "Angle")))
+    mesurer("calculer_dqe() 500 ml (en cache)", lambda: dqe.calculer_dqe(500, "2.5m", "Angle"))
+    mesurer(f"fourchette() {fourchette.TIRAGES:,} tirages (cache vidé)",
+            lambda: (fourchette._quantiles.vider(), fourchette.fourchette(70, "2.5m", "Cotonou", "Angle", "non", config)))
+    mesurer("fourchette() 3 tronçons (cache vidé)",
+            lambda: (fourchette._quantiles.vider(),
+                     fourchette.fourchette([30, 25, 15], ["2.0m (standard)", "2.5m", "3.0m"], "Cotonou",
+                                           ["Angle", "Entre 3 parcelles", "Angle"], "non", config)))
+    mesurer("fourchette() (en cache, autre périmètre)",
+            lambda: fourchette.fourchette(71, "2.5m", "Cotonou", "Angle", "non", config))
+
+
+if __name__ == "__main__":
+    main()
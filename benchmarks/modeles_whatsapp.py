@@ -0,0 +1,125 @@
+"""Messages WhatsApp : modèles précompilés et liens de relance en masse.
+
+Compare, pour le message de l'étape 3, la construction d'origine (f-string
+puis `quote()` du message complet) au modèle précompilé et au contrôle de
+signature qui évite tout recalcul quand la saisie n'a pas changé, puis mesure le
+débit de `liens_lot()` sur `--leads` leads tirés au hasard face à une
+boucle ligne par ligne (`str.format` puis `quote()`). Les liens produits
+sont vérifiés identiques.
+
+    python benchmarks/modeles_whatsapp.py --leads 50000
+"""
+import argparse
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import modeles_whatsapp  # noqa: E402
+from devis import OPTIONS_PROJET, Devis  # noqa: E402
+from tarification import config_tarifs  # noqa: E402
+from whatsapp import numero_international  # noqa: E402
+
+VALEURS = {
+    "nom": "Jean Dupont", "telephone": "01 23 45 67 89", "email": "Non fourni",
+    "parcelle": "Terrain disponible", "topo": "Levé disponible", "localite": "Abomey-Calavi",
+    "criteres": "Type parcelle : Angle\nPérimètre : 120 ml\nHauteur : 2.0m (standard)",
+    "projet": "Maison individuelle", "demande": "Intéressé par devis détaillé des matériaux", "estimation": 6745123.4, "p10": 6100000.0, "p90": 7600000.0,
+    "version_tarifs": "a9af2d0e684d",
+}
+
+
+def message_origine(v):
+    """Construction de l'étape 3 avant les modèles"""
+    message = f"""*ESTIMATION CLÔTURE - EXO PLANETE GROUPE*
+
+*Informations client*
+Nom : {v['nom']}
+Téléphone : {v['telephone']}
+Email : {v['email']}
+
+*Critères du projet*
+Parcelle : {v['parcelle']}
+Levé topo : {v['topo']}
+Localité : {v['localite']}
+{v['criteres']}
+Projet futur : {v['projet']}
+
+*Estimation*
+Coût estimé : {v['estimation']:,.0f} FCFA
+Fourchette probable : {v['p10']:,.0f} – {v['p90']:,.0f} FCFA
+Tarifs : v{v['version_tarifs']}
+
+*Demande*
+{'Intéressé par devis détaillé des matériaux' if v['projet'] != 'Pas de projet immédiat' else 'Information seulement'}
+
+--- 
+Envoyé via l'outil d'estimation en ligne"""
+    return "https://wa.me/2290166815278?text=" + quote(message)
+
+
+def leads_aleatoires(nombre, graine=0):
+    rng = random.Random(graine)
+    localites = config_tarifs().localites
+    prenoms = ("Jean", "Aïcha", "Koffi", "Mariam", "Sèna", "Rodrigue", "Fifamè", "Ismaël")
+    return pd.DataFrame({
+        "id": range(nombre),
+        "nom": [f"{rng.choice(prenoms)} {rng.randrange(10_000)}" for _ in range(nombre)],
+        "telephone": [f"01 {rng.randrange(10**8):08d}" for _ in range(nombre)],
+        "localite": [rng.choice(localites) for _ in range(nombre)],
+        "estimation": [round(rng.uniform(5e5, 2e7), -3) for _ in range(nombre)],
+        "version_tarifs": "a9af2d0e684d",
+    })
+
+
+def mesurer(fonction, repetitions):
+    return min(timeit.repeat(fonction, number=repetitions, repeat=5)) / repetitions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Débit des messages et liens WhatsApp")
+    parser.add_argument("--leads", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    # Message identique à la construction d'origine pour chaque type de projet
+    for projet in OPTIONS_PROJET:
+        valeurs = {**VALEURS, "projet": projet, "demande": Devis(projet=projet).libelle_demande}
+        encode = modeles_whatsapp.modele(projet=projet).encoder(valeurs)
+        assert modeles_whatsapp.lien(modeles_whatsapp.NUMERO_SOCIETE, encode) == message_origine(valeurs)
+
+    modele = modeles_whatsapp.modele(projet=VALEURS["projet"])
+    precompile = lambda: modeles_whatsapp.lien(modeles_whatsapp.NUMERO_SOCIETE, modele.encoder(VALEURS))  # noqa: E731
+    assert precompile() == message_origine(VALEURS)
+    print("message de l'étape 3 (µs) : "
+          f"f-string + quote {mesurer(lambda: message_origine(VALEURS), 2000) * 1e6:.1f} • "
+          f"modèle précompilé {mesurer(precompile, 2000) * 1e6:.1f} • "
+          f"saisie inchangée (signature) {mesurer(lambda: hash(tuple(VALEURS.values())), 2000) * 1e6:.1f} • "
+          f"compilation du modèle {mesurer(lambda: modeles_whatsapp.Modele(modele.source), 200) * 1e6:.1f}")
+
+    leads = leads_aleatoires(args.leads)
+    relance = modeles_whatsapp.modele("relance")
+
+    debut = time.perf_counter()
+    attendus = [
+        modeles_whatsapp.lien(numero_international(ligne.telephone), quote(relance.source.format(**ligne._asdict())))
+        for ligne in leads.itertuples(index=False)
+    ]
+    boucle = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    resultat = modeles_whatsapp.liens_lot(leads)
+    lot = time.perf_counter() - debut
+    assert resultat["lien"].tolist() == attendus
+
+    print(f"{args.leads:,} liens de relance : boucle format + quote {boucle:.2f} s "
+          f"({args.leads / boucle:,.0f} liens/s) • liens_lot {lot:.2f} s ({args.leads / lot:,.0f} liens/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Mesure du coût de chaque interaction sur un vrai serveur Streamlit.
+
+Lance `streamlit run <app>` en mode headless puis joue le parcours complet
+(étape 1 → 2 → 3) via le websocket du navigateur, comme le ferait le
+frontend : les clics sur un widget situé dans un fragment ne relancent que
+ce fragment. Pour chaque interaction, le script affiche la durée d'exécution
+côté serveur (envoi du BackMsg → `script_finished`) et la taille des
+ForwardMsg reçus.
+
+    python benchmarks/reruns.py                  # app.py courant
+    python benchmarks/reruns.py --app /tmp/app_avant.py --sessions 20
+
+Pour comparer avec une version antérieure :
+    git show <commit>:app.py > app_avant.py && python benchmarks/reruns.py --app app_avant.py
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+RACINE = Path(__file__).resolve().parent.parent
+
+# (libellé, clé du widget, valeur) — None pour un clic de bouton
+PARCOURS = [
+    ("chargement", None, None),
+    ("parcelle", "parcelle_0", None),
+    ("topo", "topo_0", None),
+    ("continuer étape 1", "btn_step1_continue", None),
+    ("hauteur +", "hauteur_plus", None),
+    ("hauteur -", "hauteur_minus", None),
+    ("périmètre", "perimetre_input", 120),
+    ("continuer étape 2", "btn_step2_continue", None),
+    ("nom", "nom_input", "Jean Dupont"),
+    ("téléphone", "telephone_input", "01 23 45 67 89"),
+]
+
+
+class SessionNavigateur:
+    """Client websocket minimal imitant le frontend Streamlit"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}   # clé utilisateur -> (id, fragment_id)
+        self.valeurs = {}   # id -> WidgetState persistant
+
+    def _memoriser(self, msg):
+        if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element":
+            return
+        element = msg.delta.new_element
+        proto = getattr(element, element.WhichOneof("type"), None)
+        widget_id = getattr(proto, "id", "")
+        if widget_id.startswith("$$ID"):
+            cle = widget_id.rsplit("-", 1)[-1]
+            self.widgets[cle] = (widget_id, msg.delta.fragment_id)
+
+    async def interagir(self, cle=None, valeur=None):
+        back = BackMsg()
+        rerun = back.rerun_script
+        rerun.query_string = ""
+        rerun.page_script_hash = ""
+        declencheur = None
+        if cle is not None:
+            widget_id, fragment_id = self.widgets[cle]
+            etat = rerun.widget_states.widgets.add()
+            etat.id = widget_id
+            if valeur is None:
+                etat.trigger_value = True
+                declencheur = widget_id
+            elif isinstance(valeur, int):
+                etat.int_value = valeur
+            else:
+                etat.string_value = valeur
+            if fragment_id:
+                rerun.fragment_id = fragment_id
+        # Le frontend renvoie aussi la valeur courante des autres widgets
+        for widget_id, etat in self.valeurs.items():
+            if widget_id != (cle and self.widgets[cle][0]):
+                rerun.widget_states.widgets.add().CopyFrom(etat)
+        if cle is not None and declencheur is None:
+            self.valeurs[self.widgets[cle][0]] = rerun.widget_states.widgets[0]
+
+        debut = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+        octets = 0
+        while True:
+            brut = await self.ws.recv()
+            octets += len(brut)
+            msg = ForwardMsg()
+            msg.ParseFromString(brut)
+            self._memoriser(msg)
+            # Un st.rerun() termine le run courant puis en enchaîne un autre
+            if (msg.WhichOneof("type") == "script_finished"
+                    and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN):
+                return time.perf_counter() - debut, octets
+
+
+def _port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demarrer_serveur(app, port):
+    processus = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(app),
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        cwd=RACINE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONPATH": str(RACINE)},
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return processus
+        except OSError:
+            time.sleep(0.2)
+    processus.kill()
+    raise RuntimeError("Le serveur Streamlit n'a pas démarré")
+
+
+async def jouer_parcours(port):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_size=None) as ws:
+        session = SessionNavigateur(ws)
+        mesures = []
+        for libelle, cle, valeur in PARCOURS:
+            mesures.append((libelle, *await session.interagir(cle, valeur)))
+        return mesures
+
+
+async def mesurer(port, sessions):
+    resultats = {libelle: ([], []) for libelle, _, _ in PARCOURS}
+    for _ in range(sessions):
+        for libelle, duree, octets in await jouer_parcours(port):
+            resultats[libelle][0].append(duree)
+            resultats[libelle][1].append(octets)
+    return resultats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durée et taille des reruns par interaction")
+    parser.add_argument("--app", default=str(RACINE / "app.py"))
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    port = _port_libre()
+    serveur = demarrer_serveur(args.app, port)
+    try:
+        resultats = asyncio.run(mesurer(port, args.sessions))
+    finally:
+        serveur.terminate()
+        serveur.wait()
+
+    print(f"{'interaction':<20} {'durée (ms)':>12} {'websocket (o)':>14}")
+    for libelle, (durees, octets) in resultats.items():
+        print(f"{libelle:<20} {statistics.median(durees) * 1000:>12.1f} {statistics.median(octets):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Tempête de reruns : des robots face à un vrai client, avec et sans limitation.
+
+Lance `streamlit run` en mode headless (comme reruns.py). `--robots`
+sessions venues d'une même adresse IP vont à l'étape 2 puis cliquent en
+boucle sur les flèches de hauteur, chaque clic envoyé dès la fin de
+l'exécution précédente (des clics envoyés sans attendre seraient fusionnés
+par Streamlit en une seule exécution). Pendant ce temps, un client venu
+d'une autre IP joue le parcours à un rythme humain (`--pause` entre deux
+interactions). Le script affiche la latence des interactions du client,
+le débit d'exécutions obtenu par les robots et les métriques de
+limitation, une fois sans limitation (LIMITE_* à 0) et une fois avec les
+réglages par défaut de limitation.py.
+
+Les IP sont annoncées par l'en-tête X-Client-Test (LIMITE_IP_ENTETE), comme
+derrière un proxy.
+
+    python benchmarks/tempete_reruns.py --robots 8 --duree 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import urllib.request
+
+import websockets
+
+from reruns import PARCOURS, RACINE, SessionNavigateur, _port_libre, demarrer_serveur
+
+SANS_LIMITE = {"LIMITE_SESSION": "0", "LIMITE_IP": "0", "LIMITE_FUSION": "0"}
+URL = "ws://127.0.0.1:{}/_stcore/stream"
+
+
+def connecter(port, ip):
+    return websockets.connect(URL.format(port), max_size=None, additional_headers={"X-Client-Test": ip})
+
+
+async def robot(port, fin):
+    """Exécutions obtenues par une session qui clique sans relâche"""
+    async with connecter(port, "10.0.0.1") as ws:
+        session = SessionNavigateur(ws)
+        for _, cle, valeur in PARCOURS[:4]:
+            await session.interagir(cle, valeur)
+        executions = 0
+        while time.monotonic() < fin:
+            await session.interagir("hauteur_plus" if executions % 2 else "hauteur_minus")
+            executions += 1
+        return executions
+
+
+async def client(port, fin, pause):
+    """Durées des interactions d'un visiteur au rythme humain"""
+    durees = []
+    async with connecter(port, "10.0.0.2") as ws:
+        while time.monotonic() < fin:
+            session = SessionNavigateur(ws)
+            for _, cle, valeur in PARCOURS[:8]:
+                durees.append((await session.interagir(cle, valeur))[0])
+                await asyncio.sleep(pause)
+    return durees
+
+
+async def scenario(port, robots, duree, pause):
+    fin = time.monotonic() + duree
+    *executions, durees = await asyncio.gather(*(robot(port, fin) for _ in range(robots)), client(port, fin, pause))
+    return durees, sum(executions)
+
+
+def metriques(port):
+    texte = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    return [ligne for ligne in texte.splitlines() if ligne.startswith("cloture_limitation_total")]
+
+
+def mesurer(env, robots, duree, pause):
+    port, port_metriques = _port_libre(), _port_libre()
+    anciens = {cle: os.environ.get(cle) for cle in [*env, "METRIQUES_PORT", "LIMITE_IP_ENTETE"]}
+    os.environ.update(env, METRIQUES_PORT=str(port_metriques), LIMITE_IP_ENTETE="X-Client-Test")
+    serveur = demarrer_serveur(RACINE / "app.py", port)
+    try:
+        durees, executions = asyncio.run(scenario(port, robots, duree, pause))
+        return durees, executions, metriques(port_metriques)
+    finally:
+        serveur.terminate()
+        serveur.wait()
+        for cle, valeur in anciens.items():
+            if valeur is None:
+                os.environ.pop(cle, None)
+            else:
+                os.environ[cle] = valeur
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latence d'un client pendant une tempête de reruns")
+    parser.add_argument("--robots", type=int, default=8, help="sessions qui cliquent sans relâche")
+    parser.add_argument("--duree", type=float, default=10.0, help="secondes de mesure")
+    parser.add_argument("--pause", type=float, default=0.5, help="secondes entre deux interactions du client")
+    args = parser.parse_args(argv)
+
+    for libelle, env in (("sans limitation", SANS_LIMITE), ("avec limitation", {})):
+        durees, executions, lignes = mesurer(env, args.robots, args.duree, args.pause)
+        durees.sort()
+        print(f"{libelle} : client {len(durees)} interactions, médiane {statistics.median(durees) * 1000:.0f} ms, "
+              f"p95 {durees[int(0.95 * (len(durees) - 1))] * 1000:.0f} ms • robots {executions / args.duree:.1f} "
+              f"exécutions/s")
+        for ligne in lignes:
+            print(f"    {ligne}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Cache LRU borné, partagé entre threads (sessions Streamlit, API)."""
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache clé -> valeur à éviction LRU avec compteurs de succès/échecs"""
+
+    def __init__(self, taille_max=1024):
+        self.taille_max = taille_max
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self._donnees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, calcul):
+        """Valeur associée à `cle`, calculée par `calcul()` en cas d'absence"""
+        with self._verrou:
+            try:
+                valeur = self._donnees[cle]
+            except KeyError:
+                self.echecs += 1
+            else:
+                self._donnees.move_to_end(cle)
+                self.succes += 1
+                return valeur
+
+        # Calcul hors verrou : deux sessions peuvent calculer la même entrée,
+        # le résultat est identique
+        valeur = calcul()
+        with self._verrou:
+            self._donnees[cle] = valeur
+            self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.taille_max:
+                self._donnees.popitem(last=False)
+                self.evictions += 1
+        return valeur
+
+    def vider(self):
+        with self._verrou:
+            self._donnees.clear()
+
+    def __len__(self):
+        return len(self._donnees)
+
+    def statistiques(self):
+        """Taille, succès, échecs, évictions et taux de succès"""
+        total = self.succes + self.echecs
+        return {
+            "taille": len(self._donnees),
+            "taille_max": self.taille_max,
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "evictions": self.evictions,
+            "taux_succes": self.succes / total if total else 0.0,
+        }
@@ -0,0 +1,112 @@
+"""Devis en cours d'une session : un seul objet typé et compact.
+
+`Devis` remplace les clés éparses de `st.session_state` (étape, choix,
+coordonnées, estimation). Les libellés des choix de l'étape 1 sont
+définis ici une seule fois pour les boutons, les récapitulatifs et le
+message WhatsApp.
+"""
+import json
+from dataclasses import dataclass, fields
+from operator import attrgetter
+
+from tarification import PERIMETRE_MAX, PERIMETRE_MIN
+
+# valeur -> (titre du bouton, description, libellé des récapitulatifs)
+OPTIONS_PARCELLE = {
+    "possede": ("Terrain disponible", "Je possède le terrain", "Terrain disponible"),
+    "recherche": ("En recherche", "Je cherche un terrain", "En recherche de terrain"),
+    "futur": ("Projet futur", "Planification à venir", "Projet futur"),
+}
+OPTIONS_TOPO = {
+    "oui": ("Disponible", "J'ai le document", "Levé disponible"),
+    "a_faire": ("À réaliser", "Je souhaite le faire", "À réaliser"),
+    "non": ("Non", "Je n'ai pas", "Non disponible"),
+}
+OPTIONS_PROJET = ("Maison individuelle", "Immeuble", "Commerce", "Autre projet", "Pas de projet immédiat")
+
+
+@dataclass(slots=True)
+class Devis:
+    """État canonique du devis d'une session"""
+    etape: int = 1
+    parcelle: str | None = None
+    topo: str | None = None
+    localite: str = "Abomey-Calavi"
+    type_parcelle: str = "Angle"
+    perimetre: int = 70
+    hauteur: str = "2.0m (standard)"
+    nom: str = ""
+    telephone: str = ""
+    email: str = ""
+    projet: str = OPTIONS_PROJET[0]
+    estimation: float | None = None
+    version_tarifs: str | None = None
+    cotes_leve: tuple = ()  # longueurs des côtés du levé importé (leve_topo.py), en m
+    segments: tuple = ()  # tronçons (longueur, hauteur, type_parcelle) ; vide : clôture uniforme
+
+    def valider(self):
+        """Vérifie l'étape, les choix fermés et le périmètre ; lève ValueError"""
+        if self.etape not in (1, 2, 3):
+            raise ValueError(f"Étape inconnue : {self.etape!r}")
+        if self.parcelle is not None and self.parcelle not in OPTIONS_PARCELLE:
+            raise ValueError(f"Situation de parcelle inconnue : {self.parcelle!r}")
+        if self.topo is not None and self.topo not in OPTIONS_TOPO:
+            raise ValueError(f"Réponse levé topo inconnue : {self.topo!r}")
+        if not isinstance(self.perimetre, int) or not PERIMETRE_MIN <= self.perimetre <= PERIMETRE_MAX:
+            raise ValueError(f"Périmètre hors bornes : {self.perimetre!r}")
+        if any(len(segment) != 3 or not segment[0] > 0 for segment in self.segments):
+            raise ValueError("Tronçon invalide : (longueur > 0, hauteur, type) attendu")
+        return self
+
+    @property
+    def libelle_parcelle(self):
+        option = OPTIONS_PARCELLE.get(self.parcelle)
+        return option[2] if option else "Non spécifié"
+
+    @property
+    def libelle_topo(self):
+        option = OPTIONS_TOPO.get(self.topo)
+        return option[2] if option else "Non spécifié"
+
+    @property
+    def libelle_demande(self):
+        """Demande du message WhatsApp de l'étape 3, selon le projet"""
+        if self.projet == OPTIONS_PROJET[-1]:  # pas de projet immédiat
+            return "Information seulement"
+        return "Intéressé par devis détaillé des matériaux"
+
+    @property
+    def perimetre_leve(self):
+        return sum(self.cotes_leve)
+
+    @property
+    def longueur_totale(self):
+        """Longueur clôturée : somme des tronçons, ou le périmètre"""
+        return sum(segment[0] for segment in self.segments) if self.segments else self.perimetre
+
+    def champs(self, noms):
+        """Dict des champs demandés (ex. `leads.CHAMPS`)"""
+        return {nom: getattr(self, nom) for nom in noms}
+
+    def __reduce__(self):
+        # Pickle compact (session_state) : les valeurs seules, par position
+        return (Devis, _valeurs(self))
+
+    def serialiser(self):
+        """Tableau JSON des valeurs dans l'ordre des champs, sans les noms"""
+        return json.dumps(_valeurs(self), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def deserialiser(cls, texte):
+        """Devis validé depuis `serialiser()` ; ValueError si le format ne correspond pas"""
+        valeurs = json.loads(texte)
+        if not isinstance(valeurs, list) or len(valeurs) != len(_NOMS):
+            raise ValueError("Format de devis sérialisé inattendu")
+        devis = cls(*valeurs)
+        devis.cotes_leve = tuple(devis.cotes_leve)
+        devis.segments = tuple(map(tuple, devis.segments))
+        return devis.valider()
+
+
+_NOMS = tuple(champ.name for champ in fields(Devis))
+_valeurs = attrgetter(*_NOMS)
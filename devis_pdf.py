@@ -0,0 +1,385 @@
+"""Devis PDF d'une estimation, générés côté serveur et mis en cache sur disque.
+
+Le PDF ne contient que le récapitulatif du devis (situation, levé,
+localité, type, périmètre ou tronçons, hauteur, estimation, matériaux du
+DQE), sans données personnelles : il est adressé par l'empreinte SHA-256
+de ce contenu et deux configurations identiques partagent le même fichier.
+Le cache est un dossier (PDF_CLOTURE, par défaut `pdf/` à côté de
+l'application) borné à PDF_CACHE_MO mégaoctets ; les fichiers les moins
+récemment servis sont supprimés au-delà.
+
+Le PDF est écrit directement (PDF 1.4, polices standard Helvetica en
+WinAnsi, flux compressé) : aucune dépendance. Dans l'application, un devis
+se rend en quelques millisecondes dans le thread du bouton de
+téléchargement, jamais dans la boucle d'événements ; les lots passent par
+un pool de processus.
+
+Lot pour une liste de leads (un PDF par configuration distincte) :
+    python devis_pdf.py leads.sqlite3 --sortie devis/ --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from devis import OPTIONS_PARCELLE, OPTIONS_TOPO
+from dqe import calculer_dqe
+
+DOSSIER_PDF = Path(os.environ.get("PDF_CLOTURE", Path(__file__).resolve().parent / "pdf"))
+TAILLE_MAX = int(float(os.environ.get("PDF_CACHE_MO", 200)) * 1024 * 1024)
+FORMAT = 1  # à incrémenter quand la mise en page change : invalide le cache
+
+CHAMPS = ("parcelle", "topo", "localite", "type_parcelle", "perimetre", "hauteur", "estimation",
+          "version_tarifs", "segments")
+MAX_TRONCONS = 12  # tronçons détaillés dans le PDF, les suivants sont regroupés
+CONTACT = "WhatsApp +229 01 66 81 52 78"
+
+MATERIAUX = (
+    ("ciment_sacs", "Ciment (sacs de 50 kg)", "sacs"),
+    ("fer_ha10_kg", "Fer HA10", "kg"),
+    ("fer_ha6_kg", "Fer HA6", "kg"),
+    ("sable_m3", "Sable", "m³"),
+    ("gravier_m3", "Gravier", "m³"),
+    ("agglos_creux_15", "Agglos creux de 15", "u"),
+    ("agglos_pleins_15", "Agglos pleins de 15", "u"),
+)
+
+
+# -----------------------------
+# CONTENU DU DEVIS
+# -----------------------------
+def donnees_devis(source):
+    """Récapitulatif normalisé (dict JSON) depuis un devis ou un lead.
+
+    `source` est un mapping des champs de `CHAMPS` (ex. `Devis.champs()`,
+    une ligne de la base des leads) ; les valeurs sont arrondies pour que
+    des devis équivalents aient la même empreinte.
+    """
+    segments = source.get("segments") or ()
+    if isinstance(segments, str):
+        segments = json.loads(segments)
+    return {
+        "parcelle": OPTIONS_PARCELLE[source["parcelle"]][2] if source.get("parcelle") in OPTIONS_PARCELLE else "Non spécifié",
+        "topo": OPTIONS_TOPO[source["topo"]][2] if source.get("topo") in OPTIONS_TOPO else "Non spécifié",
+        "localite": source["localite"],
+        "type_parcelle": source["type_parcelle"],
+        "perimetre": int(source["perimetre"]),
+        "hauteur": source["hauteur"],
+        "estimation": round(float(source["estimation"])),
+        "version_tarifs": source.get("version_tarifs") or "",
+        "segments": [[round(float(longueur), 2), hauteur, type_parcelle] for longueur, hauteur, type_parcelle in segments],
+    }
+
+
+def cle_devis(donnees):
+    """Empreinte du contenu du PDF (et du format de mise en page)"""
+    canonique = json.dumps([FORMAT, donnees], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonique.encode()).hexdigest()
+
+
+def _materiaux(donnees):
+    """Matériaux du DQE, additionnés sur les tronçons"""
+    troncons = donnees["segments"] or [[donnees["perimetre"], donnees["hauteur"], donnees["type_parcelle"]]]
+    totaux = {}
+    for longueur, hauteur, type_parcelle in troncons:
+        for nom, quantite in calculer_dqe(longueur, hauteur, type_parcelle).materiaux.items():
+            totaux[nom] = totaux.get(nom, 0) + quantite
+    return totaux
+
+
+# -----------------------------
+# ÉCRITURE PDF
+# -----------------------------
+def _nombre(valeur, decimales=0):
+    return f"{valeur:,.{decimales}f}".replace(",", " ")
+
+
+def _texte_pdf(texte):
+    """Chaîne littérale PDF en WinAnsi (cp1252)"""
+    octets = str(texte).encode("cp1252", errors="replace")
+    return b"(" + octets.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+# Chasses Helvetica (millièmes de corps) des chiffres et séparateurs ; 520 en moyenne sinon
+CHASSES = {**dict.fromkeys("0123456789", 556), " ": 278, ".": 278, ",": 278, "°": 400}
+
+
+def _largeur(texte, taille):
+    return sum(CHASSES.get(c, 520) for c in str(texte)) * taille / 1000
+
+
+class _Page:
+    """Opérateurs de dessin d'une page A4 (origine en haut à gauche)"""
+    LARGEUR, HAUTEUR = 595, 842
+
+    def __init__(self):
+        self.operations = []
+
+    def texte(self, x, y, texte, taille=10, gras=False, couleur=(0, 0, 0), droite=False):
+        if droite:
+            x -= _largeur(texte, taille)
+        self.operations.append(
+            b"BT %.3f %.3f %.3f rg /%s %d Tf %.1f %.1f Td %s Tj ET"
+            % (*couleur, b"F2" if gras else b"F1", taille, x, self.HAUTEUR - y, _texte_pdf(texte))
+        )
+
+    def rectangle(self, x, y, largeur, hauteur, couleur):
+        self.operations.append(b"%.3f %.3f %.3f rg %.1f %.1f %.1f %.1f re f"
+                               % (*couleur, x, self.HAUTEUR - y - hauteur, largeur, hauteur))
+
+    def ligne(self, x1, y, x2, couleur=(0.85, 0.85, 0.85)):
+        self.operations.append(b"%.3f %.3f %.3f RG 0.5 w %.1f %.1f m %.1f %.1f l S"
+                               % (*couleur, x1, self.HAUTEUR - y, x2, self.HAUTEUR - y))
+
+    def flux(self):
+        return zlib.compress(b"\n".join(self.operations), 6)
+
+
+def _assembler(pages):
+    """Document PDF complet depuis des flux de pages compressés"""
+    objets = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % (5 + 2 * i) for i in range(len(pages))), len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, flux in enumerate(pages):
+        objets.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                      b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (_Page.LARGEUR, _Page.HAUTEUR, 6 + 2 * i))
+        objets.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(flux), flux))
+
+    sortie = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    positions = []
+    for numero, objet in enumerate(objets, 1):
+        positions.append(len(sortie))
+        sortie += b"%d 0 obj\n%s\nendobj\n" % (numero, objet)
+    debut_xref = len(sortie)
+    sortie += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objets) + 1)
+    sortie += b"".join(b"%010d 00000 n \n" % position for position in positions)
+    sortie += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objets) + 1, debut_xref)
+    return bytes(sortie)
+
+
+BLEU = (0.102, 0.451, 0.910)
+GRIS = (0.4, 0.4, 0.4)
+BLANC = (1, 1, 1)
+
+
+def rendre_pdf(donnees):
+    """PDF (bytes) du devis décrit par `donnees_devis()`"""
+    page = _Page()
+    page.rectangle(0, 0, _Page.LARGEUR, 90, BLEU)
+    page.texte(40, 42, "EXO PLANETE GROUPE", 20, gras=True, couleur=BLANC)
+    page.texte(40, 66, "Devis estimatif de clôture", 12, couleur=BLANC)
+    page.texte(555, 66, f"Devis n° {cle_devis(donnees)[:10].upper()}", 9, couleur=BLANC, droite=True)
+
+    y = 130
+    page.texte(40, y, "Votre projet", 13, gras=True, couleur=BLEU)
+    lignes = [
+        ("Situation de la parcelle", donnees["parcelle"]),
+        ("Levé topographique", donnees["topo"]),
+        ("Localité", donnees["localite"]),
+    ]
+    segments = donnees["segments"]
+    if segments:
+        longueur = sum(segment[0] for segment in segments)
+        lignes.append(("Clôture", f"{_nombre(longueur, 2)} ml en {len(segments)} tronçons"))
+    else:
+        lignes += [
+            ("Type de parcelle", donnees["type_parcelle"]),
+            ("Périmètre", f"{donnees['perimetre']} ml"),
+            ("Hauteur", donnees["hauteur"]),
+        ]
+    for libelle, valeur in lignes:
+        y += 22
+        page.texte(40, y, libelle, 10, couleur=GRIS)
+        page.texte(220, y, valeur, 10, gras=True)
+        page.ligne(40, y + 8, 555)
+
+    if segments:
+        y += 34
+        page.texte(40, y, "Tronçons", 11, gras=True, couleur=BLEU)
+        for numero, (longueur, hauteur, type_parcelle) in enumerate(segments[:MAX_TRONCONS], 1):
+            y += 16
+            page.texte(40, y, f"{numero}.", 9, couleur=GRIS)
+            page.texte(70, y, f"{_nombre(longueur, 2)} ml", 9)
+            page.texte(170, y, hauteur, 9)
+            page.texte(300, y, type_parcelle, 9)
+        if len(segments) > MAX_TRONCONS:
+            reste = segments[MAX_TRONCONS:]
+            y += 16
+            page.texte(70, y, f"… et {len(reste)} autres tronçons ({_nombre(sum(s[0] for s in reste), 2)} ml)",
+                       9, couleur=GRIS)
+
+    y += 40
+    page.rectangle(40, y, 515, 70, (0.941, 0.969, 1.0))
+    page.texte(60, y + 28, "ESTIMATION", 11, gras=True, couleur=BLEU)
+    page.texte(60, y + 52, f"{_nombre(donnees['estimation'])} FCFA TTC", 20, gras=True, couleur=BLEU)
+    page.texte(540, y + 52, "Fondations, murs, chaînage, enduit", 9, couleur=GRIS, droite=True)
+
+    y += 110
+    page.texte(40, y, "Matériaux estimés (pertes comprises)", 13, gras=True, couleur=BLEU)
+    materiaux = _materiaux(donnees)
+    for nom, libelle, unite in MATERIAUX:
+        y += 20
+        page.texte(40, y, libelle, 10)
+        page.texte(480, y, _nombre(materiaux[nom], 0 if unite in ("sacs", "u") else 2), 10, droite=True)
+        page.texte(486, y, unite, 10, couleur=GRIS)
+        page.ligne(40, y + 7, 555)
+
+    page.texte(40, 780, "Estimation indicative établie à partir du devis quantitatif estimatif (DQE) standard, "
+                        "à confirmer après visite.", 8, couleur=GRIS)
+    page.texte(40, 794, f"Tarifs v{donnees['version_tarifs']} • {CONTACT}", 8, couleur=GRIS)
+    return _assembler([page.flux()])
+
+
+# -----------------------------
+# CACHE SUR DISQUE
+# -----------------------------
+class CachePDF:
+    """PDF adressés par contenu dans un dossier borné en taille (éviction LRU par date d'accès)"""
+
+    def __init__(self, dossier=DOSSIER_PDF, taille_max=TAILLE_MAX, pool=None):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.taille_max = taille_max
+        self.pool = pool
+        self.succes = 0
+        self.rendus = 0
+        self._verrou = threading.Lock()
+        self._proteges = Counter()  # clés des lots en cours, jamais évincées
+        self._taille = sum(entree.stat().st_size for entree in self._fichiers())
+
+    def _fichiers(self):
+        for sous_dossier in os.scandir(self.dossier):
+            if sous_dossier.is_dir():
+                yield from (entree for entree in os.scandir(sous_dossier) if entree.name.endswith(".pdf"))
+
+    def chemin(self, cle):
+        return self.dossier / cle[:2] / f"{cle}.pdf"
+
+    def lire(self, cle):
+        """Contenu en cache (None s'il est absent) ; marque le fichier comme récemment servi"""
+        chemin = self.chemin(cle)
+        try:
+            contenu = chemin.read_bytes()
+            os.utime(chemin)
+        except FileNotFoundError:
+            return None
+        self.succes += 1
+        return contenu
+
+    def stocker(self, cle, contenu):
+        """Écrit le PDF (atomiquement) puis évince si le dossier dépasse sa taille maximale"""
+        chemin = self.chemin(cle)
+        chemin.parent.mkdir(exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=chemin.parent, suffix=".tmp")
+        with os.fdopen(descripteur, "wb") as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+        with self._verrou:
+            self.rendus += 1
+            self._taille += len(contenu)
+            if self._taille > self.taille_max:
+                self._evincer()
+        return chemin
+
+    def _evincer(self):
+        # Taille recalculée sur le disque : d'autres processus partagent le dossier
+        entrees = sorted(((e.stat().st_atime_ns, e.stat().st_mtime_ns, e.path, e.stat().st_size)
+                          for e in self._fichiers()), key=lambda e: max(e[0], e[1]))
+        self._taille = sum(entree[3] for entree in entrees)
+        cible = self.taille_max * 0.9
+        for _, _, chemin, taille in entrees:
+            if self._taille <= cible:
+                break
+            if os.path.basename(chemin).removesuffix(".pdf") in self._proteges:
+                continue
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+            self._taille -= taille
+
+    def obtenir(self, donnees):
+        """PDF (bytes) de `donnees`, rendu (dans le pool s'il y en a un) seulement au premier appel"""
+        cle = cle_devis(donnees)
+        contenu = self.lire(cle)
+        if contenu is None:
+            contenu = self.pool.submit(rendre_pdf, donnees).result() if self.pool else rendre_pdf(donnees)
+            self.stocker(cle, contenu)
+        return contenu
+
+    def generer_lot(self, liste, workers=None):
+        """Chemins des PDF d'une liste de `donnees` ; les PDF absents sont rendus dans un pool de processus.
+
+        Les PDF du lot ne sont pas évincés pendant sa génération, même si le
+        lot dépasse la taille du cache : tous les chemins retournés existent.
+        Le dossier revient sous sa taille maximale au stockage suivant.
+        """
+        cles = [cle_devis(donnees) for donnees in liste]
+        with self._verrou:
+            self._proteges.update(set(cles))
+        try:
+            a_rendre = {}
+            for cle, donnees in zip(cles, liste):
+                if cle in a_rendre:
+                    continue
+                try:
+                    os.utime(self.chemin(cle))  # déjà en cache : récemment servi
+                except FileNotFoundError:
+                    a_rendre[cle] = donnees
+            if a_rendre:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    taille_lot = max(1, len(a_rendre) // (4 * (workers or os.cpu_count() or 1)))
+                    for cle, contenu in zip(a_rendre, pool.map(rendre_pdf, a_rendre.values(), chunksize=taille_lot)):
+                        self.stocker(cle, contenu)
+            return [self.chemin(cle) for cle in cles]
+        finally:
+            with self._verrou:
+                self._proteges.subtract(set(cles))
+                self._proteges += Counter()  # retire les clés à zéro
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Devis PDF pour les leads enregistrés")
+    parser.add_argument("leads", help="base SQLite des leads (leads.py)")
+    parser.add_argument("--sortie", help="dossier où copier un PDF par lead (lead_<id>.pdf)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache", default=str(DOSSIER_PDF))
+    args = parser.parse_args(argv)
+
+    connexion = sqlite3.connect(args.leads)
+    connexion.row_factory = sqlite3.Row
+    leads = []
+    for ligne in connexion.execute("SELECT * FROM leads WHERE estimation IS NOT NULL ORDER BY id"):
+        lead = dict(ligne)
+        lead.update(json.loads(lead.pop("extra") or "{}"))
+        leads.append(lead)
+    connexion.close()
+
+    debut = time.perf_counter()
+    cache = CachePDF(args.cache)
+    chemins = cache.generer_lot([donnees_devis(lead) for lead in leads], args.workers)
+    duree = time.perf_counter() - debut
+    if args.sortie:
+        sortie = Path(args.sortie)
+        sortie.mkdir(parents=True, exist_ok=True)
+        for lead, chemin in zip(leads, chemins):
+            (sortie / f"lead_{lead['id']}.pdf").write_bytes(chemin.read_bytes())
+    print(f"{len(leads):,} leads • {len(set(chemins)):,} PDF distincts • {cache.rendus:,} rendus "
+          f"en {duree:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
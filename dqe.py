@@ -0,0 +1,149 @@
+"""Devis quantitatif estimatif (DQE) d'une clôture en agglos.
+
+Un devis (périmètre, hauteur, type de parcelle) est décomposé en postes
+(fondations, murs, chaînage, enduit) puis en matériaux (ciment, fer, sable,
+gravier, agglos). Les quantités sont linéaires en quatre grandeurs de base
+— longueur, surface de mur, hauteur cumulée des poteaux, nombre de
+poteaux — ce qui ramène tout le calcul à deux produits matriciels.
+
+Exemple :
+    python dqe.py 120 "2.5m" "Angle"
+"""
+import math
+import sys
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+# -----------------------------
+# DONNÉES
+# -----------------------------
+ESPACEMENT_POTEAUX = 3.0  # m
+PERTES = 1.05             # 5 % de pertes sur les matériaux
+SAC_CIMENT_KG = 50
+
+# Poteaux supplémentaires : angle de parcelle, jonctions avec les murs voisins
+POTEAUX_TYPE_PARCELLE = {
+    "Angle": 1,
+    "Entre 3 parcelles": 2
+}
+
+MATERIAUX = ("ciment_kg", "fer_ha10_kg", "fer_ha6_kg", "sable_m3", "gravier_m3", "agglos_creux_15", "agglos_pleins_15")
+
+# Consommation par unité d'ouvrage
+BETON_150 = {"ciment_kg": 150, "sable_m3": 0.4, "gravier_m3": 0.8}
+BETON_350 = {"ciment_kg": 350, "sable_m3": 0.4, "gravier_m3": 0.8}
+HA10_ML = {"fer_ha10_kg": 0.617}
+HA6_ML = {"fer_ha6_kg": 0.222}
+MORTIER_POSE_AGGLO = {"ciment_kg": 0.3, "sable_m3": 0.0013}   # 1,2 l de mortier à 250 kg/m³
+ENDUIT_M2 = {"ciment_kg": 7.0, "sable_m3": 0.022}             # 2 cm de mortier à 350 kg/m³
+
+# (ouvrage, désignation, unité,
+#  quantité par [ml de clôture, m² de mur, m de poteau, poteau], matériaux par unité)
+POSTES = [
+    ("Fondations", "Fouilles en rigole 40×60", "m³", (0.24, 0, 0, 0), {}),
+    ("Fondations", "Béton de propreté dosé à 150 kg/m³", "m³", (0.02, 0, 0, 0), BETON_150),
+    ("Fondations", "Semelle filante BA 40×20 dosée à 350 kg/m³", "m³", (0.08, 0, 0, 0), BETON_350),
+    ("Fondations", "Armatures semelle 4 HA10", "ml", (4.4, 0, 0, 0), HA10_ML),
+    ("Fondations", "Cadres semelle HA6 e=20 cm", "ml", (5.5, 0, 0, 0), HA6_ML),
+    ("Fondations", "Soubassement agglos pleins de 15 (h 60 cm)", "u", (7.5, 0, 0, 0),
+     {"agglos_pleins_15": 1, **MORTIER_POSE_AGGLO}),
+    ("Murs", "Maçonnerie agglos creux de 15", "u", (0, 12.5, 0, 0),
+     {"agglos_creux_15": 1, **MORTIER_POSE_AGGLO}),
+    ("Chaînage", "Chaînage bas BA 15×20", "m³", (0.03, 0, 0, 0), BETON_350),
+    ("Chaînage", "Chaînage haut BA 15×15", "m³", (0.0225, 0, 0, 0), BETON_350),
+    ("Chaînage", "Poteaux BA 15×15", "m³", (0, 0, 0.0225, 0), BETON_350),
+    ("Chaînage", "Armatures 4 HA10 (chaînages et poteaux)", "ml", (8.8, 0, 4, 2), HA10_ML),
+    ("Chaînage", "Cadres HA6 e=25 cm", "ml", (5.6, 0, 2.8, 0), HA6_ML),
+    ("Enduit", "Enduit 2 faces ép. 2 cm dosé à 350 kg/m³", "m²", (0, 2, 0, 0), ENDUIT_M2),
+]
+
+# Matrices postes × grandeurs de base et postes × matériaux
+_QUANTITES = np.array([poste[3] for poste in POSTES], dtype=np.float64)
+_CONSOMMATIONS = np.array(
+    [[poste[4].get(m, 0.0) for m in MATERIAUX] for poste in POSTES], dtype=np.float64
+)
+
+LigneDQE = namedtuple("LigneDQE", "ouvrage designation unite quantite")
+DQE = namedtuple("DQE", "perimetre hauteur type_parcelle poteaux lignes materiaux")
+
+
+# -----------------------------
+# FONCTIONS
+# -----------------------------
+def hauteur_metres(hauteur):
+    """Convertit un libellé de hauteur ("2.0m (standard)") en mètres"""
+    if isinstance(hauteur, str):
+        return float(hauteur.split("m", 1)[0])
+    return float(hauteur)
+
+
+def _grandeurs(perimetre, hauteur, type_parcelle):
+    """Grandeurs de base (4 × n) : ml, m² de mur, m de poteaux, poteaux"""
+    perimetre = np.asarray(perimetre, dtype=np.float64)
+    hauteur = np.asarray(hauteur, dtype=np.float64)
+    types = np.asarray(type_parcelle, dtype=object)
+    supplement = np.zeros(types.shape, dtype=np.float64)
+    for libelle, nombre in POTEAUX_TYPE_PARCELLE.items():
+        supplement[types == libelle] = nombre
+    poteaux = np.ceil(perimetre / ESPACEMENT_POTEAUX) + 1 + supplement
+    return np.stack(np.broadcast_arrays(perimetre, perimetre * hauteur, poteaux * hauteur, poteaux)), poteaux
+
+
+def materiaux_lot(perimetre, hauteur, type_parcelle):
+    """Matériaux (pertes comprises) pour des tableaux de devis.
+
+    `hauteur` est en mètres. Retourne un dict nom -> tableau de quantités.
+    """
+    grandeurs, _ = _grandeurs(perimetre, hauteur, type_parcelle)
+    totaux = (_CONSOMMATIONS.T @ (_QUANTITES @ grandeurs.reshape(4, -1))) * PERTES
+    forme = grandeurs.shape[1:]
+    return {m: totaux[i].reshape(forme) for i, m in enumerate(MATERIAUX)}
+
+
+@lru_cache(maxsize=4096)
+def _dqe(perimetre, hauteur, type_parcelle):
+    grandeurs, poteaux = _grandeurs(perimetre, hauteur, type_parcelle)
+    quantites = _QUANTITES @ grandeurs
+    totaux = _CONSOMMATIONS.T @ quantites * PERTES
+
+    lignes = tuple(
+        LigneDQE(ouvrage, designation, unite, round(float(q), 3))
+        for (ouvrage, designation, unite, _, _), q in zip(POSTES, quantites)
+    )
+    materiaux = dict(zip(MATERIAUX, (round(float(t), 2) for t in totaux)))
+    materiaux["ciment_sacs"] = math.ceil(materiaux["ciment_kg"] / SAC_CIMENT_KG)
+    materiaux["agglos_creux_15"] = math.ceil(materiaux["agglos_creux_15"])
+    materiaux["agglos_pleins_15"] = math.ceil(materiaux["agglos_pleins_15"])
+    return DQE(perimetre, hauteur, type_parcelle, int(poteaux), lignes, MappingProxyType(materiaux))
+
+
+def calculer_dqe(perimetre, hauteur, type_parcelle):
+    """DQE d'un devis, mémorisé par entrées normalisées (périmètre arrondi
+    au cm, hauteur en mètres)"""
+    return _dqe(round(float(perimetre), 2), hauteur_metres(hauteur), type_parcelle)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3:
+        print('Usage : python dqe.py <perimetre> <hauteur> <type_parcelle>', file=sys.stderr)
+        return 2
+    dqe = calculer_dqe(float(argv[0]), argv[1], argv[2])
+    print(f"DQE clôture {dqe.perimetre} ml • {dqe.hauteur} m • {dqe.type_parcelle} • {dqe.poteaux} poteaux\n")
+    ouvrage = None
+    for ligne in dqe.lignes:
+        if ligne.ouvrage != ouvrage:
+            ouvrage = ligne.ouvrage
+            print(ouvrage.upper())
+        print(f"  {ligne.designation:<50} {ligne.quantite:>12,.2f} {ligne.unite}")
+    print("\nMATÉRIAUX (pertes comprises)")
+    for nom, quantite in dqe.materiaux.items():
+        print(f"  {nom:<50} {quantite:>12,.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
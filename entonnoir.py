@@ -0,0 +1,326 @@
+"""Analytique de l'entonnoir en flux, en mémoire bornée.
+
+app.py émet un événement à chaque passage d'étape (`emettre()`) : dépôt
+dans une file bornée, sans attendre. Un thread unique agrège le flux :
+
+- compteurs glissants par minute sur 24 h, par événement (anneau de
+  1 440 cases) : passages et conversions sur 5 min, 1 h et 24 h, exportés
+  en jauges Prometheus (metriques.py) ;
+- top-k approximatif (Space-Saving, `k` compteurs) des localités, hauteurs
+  et tranches de périmètre, par événement.
+
+La mémoire ne dépend pas du trafic. Toutes les ENTONNOIR_INTERVALLE
+secondes, les minutes écoulées et le top-k de la période sont écrits en
+Parquet sous ENTONNOIR_DOSSIER (par défaut `analytique/` à côté de
+l'application), un fichier par table et par écriture :
+
+    compteurs/  minute, evenement, nombre
+    top/        debut, fin, evenement, dimension, valeur, nombre, erreur
+
+    pd.read_parquet("analytique/compteurs")
+    python entonnoir.py analytique/ --jours 7
+"""
+import argparse
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from heapq import heappop, heappush, heapreplace
+from datetime import datetime, timezone
+from pathlib import Path
+
+from metriques import REGISTRE
+
+logger = logging.getLogger(__name__)
+
+DOSSIER = Path(os.environ.get("ENTONNOIR_DOSSIER", Path(__file__).resolve().parent / "analytique"))
+INTERVALLE = float(os.environ.get("ENTONNOIR_INTERVALLE", 300))
+
+# Dans l'ordre de l'entonnoir : arrivée sur la page, étape 2, étape 3, lien WhatsApp
+EVENEMENTS = ("arrivee", "etape2", "etape3", "whatsapp")
+DIMENSIONS = ("localite", "hauteur", "perimetre")
+BORNES_PERIMETRE = (25, 50, 75, 100, 150, 200, 300, 500)
+FENETRES = {"5m": 5, "1h": 60, "24h": 1440}  # minutes
+
+TAILLE_FILE = 10_000
+TAILLE_LOT = 500  # événements agrégés sous un même verrou
+MINUTES = 1440
+TOP_K = 32
+
+_ARRET = object()
+
+GLISSANT = REGISTRE.jauge(
+    "cloture_entonnoir_glissant", "Événements de l'entonnoir sur une fenêtre glissante", ("evenement", "fenetre"))
+
+
+def tranche_perimetre(perimetre):
+    """Tranche « 50-75 » (ml, bornes supérieures incluses) d'un périmètre"""
+    i = min(bisect_left(BORNES_PERIMETRE, perimetre), len(BORNES_PERIMETRE) - 1)
+    return f"{BORNES_PERIMETRE[i - 1] if i else 0}-{BORNES_PERIMETRE[i]}"
+
+
+class CompteurGlissant:
+    """Nombre d'événements par minute sur les `minutes` dernières minutes"""
+
+    def __init__(self, evenements=EVENEMENTS, minutes=MINUTES):
+        self.evenements = tuple(evenements)
+        self.minutes = minutes
+        self._rangs = {evenement: rang for rang, evenement in enumerate(self.evenements)}
+        self._comptes = [[0] * minutes for _ in self.evenements]
+        self._dates = [-1] * minutes  # minute (depuis l'epoch) comptée dans chaque case
+
+    def ajouter(self, evenement, minute, nombre=1):
+        case = minute % self.minutes
+        if self._dates[case] != minute:
+            if self._dates[case] > minute:
+                return  # plus ancien que la fenêtre
+            for comptes in self._comptes:
+                comptes[case] = 0
+            self._dates[case] = minute
+        self._comptes[self._rangs[evenement]][case] += nombre
+
+    def total(self, evenement, minutes, maintenant):
+        """Événements des `minutes` dernières minutes, minute `maintenant` comprise"""
+        comptes = self._comptes[self._rangs[evenement]]
+        return sum(comptes[m % self.minutes] for m in range(maintenant - min(minutes, self.minutes) + 1, maintenant + 1)
+                   if self._dates[m % self.minutes] == m)
+
+    def lignes(self, debut, fin):
+        """(minute, evenement, nombre) non nuls des minutes de [debut, fin["""
+        for minute in range(max(debut, fin - self.minutes), fin):
+            case = minute % self.minutes
+            if self._dates[case] == minute:
+                for evenement, comptes in zip(self.evenements, self._comptes):
+                    if comptes[case]:
+                        yield minute, evenement, comptes[case]
+
+
+class SpaceSaving:
+    """Top-k approximatif en `k` compteurs (Metwally, Agrawal, El Abbadi).
+
+    Tout élément de fréquence supérieure à total / k est présent ; son
+    nombre est surestimé d'au plus `erreur`. Le tas des minimums n'est mis
+    à jour qu'au remplacement : un élément déjà suivi coûte une addition.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.total = 0
+        self._comptes = {}  # valeur -> [nombre, erreur]
+        self._tas = []  # (nombre, valeur), nombre éventuellement périmé
+
+    def ajouter(self, valeur, nombre=1):
+        self.total += nombre
+        entree = self._comptes.get(valeur)
+        if entree is not None:
+            entree[0] += nombre
+            return
+        if len(self._comptes) < self.k:
+            self._comptes[valeur] = [nombre, 0]
+            heappush(self._tas, (nombre, valeur))
+            return
+        # La valeur la moins comptée cède sa place et son nombre
+        while True:
+            compte, minimum = self._tas[0]
+            actuel = self._comptes[minimum][0]
+            if actuel == compte:
+                break
+            heapreplace(self._tas, (actuel, minimum))
+        heappop(self._tas)
+        del self._comptes[minimum]
+        self._comptes[valeur] = [compte + nombre, compte]
+        heappush(self._tas, (compte + nombre, valeur))
+
+    def top(self, n=None):
+        """(valeur, nombre, erreur) par nombre décroissant"""
+        lignes = sorted(((v, c, e) for v, (c, e) in self._comptes.items()), key=lambda l: -l[1])
+        return lignes[:n] if n else lignes
+
+
+class Entonnoir:
+    """File d'événements de l'entonnoir et agrégats en mémoire bornée"""
+
+    def __init__(self, dossier=DOSSIER, intervalle=INTERVALLE, taille_file=TAILLE_FILE, k=TOP_K):
+        self.dossier = Path(dossier) if dossier else None
+        self.intervalle = intervalle
+        self.k = k
+        self.file = queue.Queue(maxsize=taille_file)
+        self.recus = 0
+        self.rejetes = 0
+        self.compteur = CompteurGlissant()
+        self._verrou = threading.Lock()
+        self._nouveaux_tops()
+        self._ecrite = int(time.time() // 60)  # première minute pas encore écrite
+        self._thread = threading.Thread(target=self._boucle, name="entonnoir", daemon=True)
+        self._thread.start()
+
+    def _nouveaux_tops(self):
+        self._debut_periode = time.time()
+        self.tops = {(e, d): SpaceSaving(self.k) for e in EVENEMENTS for d in DIMENSIONS}
+
+    def emettre(self, evenement, localite=None, hauteur=None, perimetre=None):
+        """Dépose un événement sans attendre ; False si la file est pleine"""
+        if evenement not in EVENEMENTS:
+            raise ValueError(f"Événement inconnu : {evenement}")
+        try:
+            self.file.put_nowait((time.time(), evenement, localite, hauteur, perimetre))
+            return True
+        except queue.Full:
+            self.rejetes += 1
+            return False
+
+    def fermer(self, delai=10.0):
+        """Agrège ce qui reste en file, écrit les agrégats puis arrête le thread"""
+        if self._thread.is_alive():
+            self.file.put(_ARRET)
+            self._thread.join(delai)
+
+    def glissant(self, maintenant=None):
+        """{(evenement, fenetre): nombre} sur chacune des FENETRES"""
+        minute = int((maintenant or time.time()) // 60)
+        with self._verrou:
+            return {(e, nom): self.compteur.total(e, minutes, minute)
+                    for e in EVENEMENTS for nom, minutes in FENETRES.items()}
+
+    def _agreger(self, instant, evenement, localite, hauteur, perimetre):
+        self.recus += 1
+        self.compteur.ajouter(evenement, int(instant // 60))
+        valeurs = (localite, hauteur, None if perimetre is None else tranche_perimetre(perimetre))
+        for dimension, valeur in zip(DIMENSIONS, valeurs):
+            if valeur is not None:
+                self.tops[evenement, dimension].ajouter(valeur)
+
+    def _boucle(self):
+        prochaine = time.monotonic() + self.intervalle
+        arret = False
+        while not arret:
+            lot = []
+            try:
+                lot.append(self.file.get(timeout=max(0.0, prochaine - time.monotonic())))
+            except queue.Empty:
+                pass
+            # Avant une écriture, tout ce qui est en file appartient aux minutes à écrire
+            ecrire = time.monotonic() >= prochaine
+            while ecrire or len(lot) < TAILLE_LOT:
+                try:
+                    lot.append(self.file.get_nowait())
+                except queue.Empty:
+                    break
+            if any(element is _ARRET for element in lot):
+                arret = True
+                lot = [element for element in lot if element is not _ARRET]
+            with self._verrou:
+                for element in lot:
+                    self._agreger(*element)
+            if ecrire or arret:
+                self.ecrire(final=arret)
+                prochaine = time.monotonic() + self.intervalle
+
+    def ecrire(self, final=False):
+        """Écrit en Parquet les minutes terminées et le top-k de la période écoulée.
+
+        Avec `final`, la minute en cours est écrite aussi (arrêt du processus).
+        """
+        maintenant = time.time()
+        fin = int(maintenant // 60) + (1 if final else 0)
+        with self._verrou:
+            compteurs = list(self.compteur.lignes(self._ecrite, fin))
+            debut, tops = self._debut_periode, self.tops
+            self._ecrite = fin
+            self._nouveaux_tops()
+        top = [(debut, maintenant, e, d, str(v), c, err)
+               for (e, d), sketch in tops.items() for v, c, err in sketch.top()]
+        if self.dossier is None or not (compteurs or top):
+            return
+        try:
+            import pandas as pd  # pandas et pyarrow, au premier enregistrement seulement
+
+            nom = f"{datetime.fromtimestamp(maintenant, timezone.utc):%Y%m%d-%H%M%S}-{os.getpid()}.parquet"
+            tables = {
+                "compteurs": pd.DataFrame(compteurs, columns=["minute", "evenement", "nombre"])
+                .assign(minute=lambda t: pd.to_datetime(t["minute"] * 60, unit="s", utc=True)),
+                "top": pd.DataFrame(top, columns=["debut", "fin", "evenement", "dimension", "valeur", "nombre", "erreur"])
+                .assign(debut=lambda t: pd.to_datetime(t["debut"], unit="s", utc=True),
+                        fin=lambda t: pd.to_datetime(t["fin"], unit="s", utc=True)),
+            }
+            for table, donnees in tables.items():
+                if donnees.empty:
+                    continue
+                chemin = self.dossier / table / nom
+                chemin.parent.mkdir(parents=True, exist_ok=True)
+                temporaire = chemin.with_name(f".{chemin.name}.tmp")
+                donnees.to_parquet(temporaire, index=False)
+                temporaire.replace(chemin)
+        except Exception:
+            logger.exception("Échec d'écriture des agrégats de l'entonnoir dans %s", self.dossier)
+
+
+_entonnoir = None
+_verrou = threading.Lock()
+
+
+def entonnoir():
+    """Entonnoir partagé par tout le processus, créé à la première utilisation"""
+    global _entonnoir
+    if _entonnoir is None:
+        with _verrou:
+            if _entonnoir is None:
+                _entonnoir = Entonnoir()
+                atexit.register(_entonnoir.fermer)
+
+                def collecter():
+                    for (evenement, fenetre), nombre in _entonnoir.glissant().items():
+                        GLISSANT.fixer(nombre, evenement=evenement, fenetre=fenetre)
+
+                REGISTRE.collecteur(collecter)
+    return _entonnoir
+
+
+def emettre(evenement, localite=None, hauteur=None, perimetre=None):
+    """Émet un événement de l'entonnoir de manière asynchrone"""
+    return entonnoir().emettre(evenement, localite, hauteur, perimetre)
+
+
+def charger(dossier=DOSSIER, jours=None):
+    """Tables `compteurs` et `top` écrites sous `dossier` (pandas), des `jours` derniers jours"""
+    import pandas as pd
+
+    tables = []
+    for table, colonne in (("compteurs", "minute"), ("top", "fin")):
+        chemin = Path(dossier) / table
+        donnees = pd.read_parquet(chemin) if chemin.is_dir() and any(chemin.glob("*.parquet")) else pd.DataFrame()
+        if jours and not donnees.empty:
+            donnees = donnees[donnees[colonne] >= pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=jours)]
+        tables.append(donnees)
+    return tuple(tables)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entonnoir et demandes les plus fréquentes, depuis les fichiers Parquet")
+    parser.add_argument("dossier", nargs="?", default=str(DOSSIER))
+    parser.add_argument("--jours", type=float, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    compteurs, top = charger(args.dossier, args.jours)
+    if compteurs.empty:
+        print(f"Aucun agrégat sous {args.dossier}")
+        return
+    totaux = compteurs.groupby("evenement")["nombre"].sum().reindex(EVENEMENTS, fill_value=0)
+    precedent = None
+    for evenement, nombre in totaux.items():
+        taux = f" ({nombre / precedent:.0%} de l'étape précédente)" if precedent else ""
+        print(f"{evenement:<10} {nombre:>8,}{taux}")
+        precedent = nombre
+    # Sommes des périodes : bornes supérieures, chaque période ajoutant son erreur
+    for dimension in DIMENSIONS:
+        lignes = top[(top["evenement"] == "etape3") & (top["dimension"] == dimension)]
+        meilleurs = lignes.groupby("valeur")["nombre"].sum().nlargest(args.top)
+        print(f"\n{dimension} (étape 3) : " + " • ".join(f"{v} {n:,}" for v, n in meilleurs.items()))
+
+
+if __name__ == "__main__":
+    main()
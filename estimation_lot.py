@@ -0,0 +1,179 @@
+"""Estimation en masse de fichiers de parcelles (CSV ou Parquet).
+
+Le fichier d'entrée est lu par blocs, chaque bloc est tarifé avec le même
+moteur que l'application (`tarification.estimer_lot`) et le résultat est
+écrit au fil de l'eau : la mémoire reste constante quelle que soit la taille
+du fichier.
+
+Les colonnes d'un CSV sont lues comme du texte (sauf le périmètre) : les types
+ne dépendent pas du contenu de chaque bloc, et les numéros de téléphone
+gardent leur zéro initial. Une sortie Parquet a un schéma fixé dès le départ
+(colonnes d'entrée, puis colonnes tarifées typées explicitement) auquel
+chaque bloc est converti.
+
+Exemple :
+    python estimation_lot.py prospects.csv estimations.parquet --workers 4
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from tarification import config_tarifs, estimer_lot
+
+TAILLE_BLOC = 100_000
+
+# Types Arrow des colonnes tarifées (`estimer_lot`) dans une sortie Parquet
+TYPES_SORTIE = {
+    "perimetre": "float64",
+    "hauteur": "string",
+    "localite": "string",
+    "type_parcelle": "string",
+    "coeff_localite": "float64",
+    "coeff_hauteur": "float64",
+    "coeff_type": "float64",
+    "estimation": "float64",
+    "version_tarifs": "string",
+}
+
+
+# -----------------------------
+# LECTURE / ÉCRITURE PAR BLOCS
+# -----------------------------
+def _est_parquet(chemin):
+    return Path(chemin).suffix.lower() in (".parquet", ".pq")
+
+
+def lire_blocs(chemin, taille_bloc=TAILLE_BLOC):
+    """Itère sur les blocs (DataFrame) d'un fichier CSV ou Parquet"""
+    if _est_parquet(chemin):
+        import pyarrow.parquet as pq
+
+        fichier = pq.ParquetFile(chemin)
+        for lot in fichier.iter_batches(batch_size=taille_bloc):
+            yield lot.to_pandas()
+    else:
+        yield from pd.read_csv(chemin, chunksize=taille_bloc, dtype=defaultdict(lambda: str, perimetre="float64"))
+
+
+def schema_sortie(entree):
+    """Schéma Arrow de la sortie : colonnes d'entrée (types du fichier Parquet, texte
+    pour un CSV), complétées et typées par TYPES_SORTIE"""
+    import pyarrow as pa
+
+    if _est_parquet(entree):
+        import pyarrow.parquet as pq
+
+        types = {champ.name: champ.type for champ in pq.ParquetFile(entree).schema_arrow}
+    else:
+        types = {nom: pa.string() for nom in pd.read_csv(entree, nrows=0).columns}
+    types.update({nom: pa.type_for_alias(alias) for nom, alias in TYPES_SORTIE.items()})
+    return pa.schema(list(types.items()))
+
+
+class EcrivainBlocs:
+    """Écrit des blocs successifs dans un fichier CSV ou Parquet.
+
+    En Parquet, chaque bloc est converti au `schema` donné (par défaut celui
+    du premier bloc) : un bloc aux types inférés différemment ne fait pas
+    échouer l'écriture.
+    """
+
+    def __init__(self, chemin, schema=None):
+        self.chemin = chemin
+        self.parquet = _est_parquet(chemin)
+        self.schema = schema
+        self._writer = None
+        self._entete = True
+
+    def ecrire(self, bloc):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(bloc, schema=self.schema, preserve_index=False)
+            if self._writer is None:
+                self.schema = table.schema
+                self._writer = pq.ParquetWriter(self.chemin, self.schema)
+            self._writer.write_table(table)
+        else:
+            bloc.to_csv(self.chemin, mode="w" if self._entete else "a", header=self._entete, index=False)
+            self._entete = False
+
+    def fermer(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+# -----------------------------
+# TRAITEMENT
+# -----------------------------
+def estimer_fichier(entree, sortie, taille_bloc=TAILLE_BLOC, workers=1, progression=None):
+    """Tarifie `entree` vers `sortie` et retourne le nombre de lignes traitées.
+
+    Avec `workers` > 1, les blocs sont répartis sur un pool de processus ;
+    au plus `2 * workers` blocs sont en vol pour garder la mémoire bornée
+    et l'ordre des lignes est conservé. Tout le fichier est tarifé avec la
+    même version des tarifs, lue au démarrage.
+    """
+    config = config_tarifs()
+    lignes = 0
+    blocs = lire_blocs(entree, taille_bloc)
+
+    with EcrivainBlocs(sortie, schema_sortie(entree) if _est_parquet(sortie) else None) as ecrivain:
+        def ecrire(resultat):
+            nonlocal lignes
+            ecrivain.ecrire(resultat)
+            lignes += len(resultat)
+            if progression:
+                progression(lignes)
+
+        if workers <= 1:
+            for bloc in blocs:
+                ecrire(estimer_lot(bloc, config))
+            return lignes
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            en_vol = deque()
+            for bloc in blocs:
+                en_vol.append(pool.submit(estimer_lot, bloc, config))
+                if len(en_vol) >= 2 * workers:
+                    ecrire(en_vol.popleft().result())
+            while en_vol:
+                ecrire(en_vol.popleft().result())
+    return lignes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimation en masse de clôtures (CSV/Parquet)")
+    parser.add_argument("entree", help="fichier CSV ou Parquet des parcelles")
+    parser.add_argument("sortie", help="fichier CSV ou Parquet des estimations")
+    parser.add_argument("--taille-bloc", type=int, default=TAILLE_BLOC, help="lignes par bloc")
+    parser.add_argument("--workers", type=int, default=1, help="processus de tarification")
+    args = parser.parse_args(argv)
+
+    debut = time.perf_counter()
+
+    def progression(lignes):
+        ecoule = time.perf_counter() - debut
+        print(f"\r{lignes:,} lignes • {lignes / ecoule:,.0f} lignes/s", end="", file=sys.stderr)
+
+    lignes = estimer_fichier(args.entree, args.sortie, args.taille_bloc, args.workers, progression)
+    ecoule = time.perf_counter() - debut
+    debit = lignes / ecoule if ecoule else 0.0
+    print(f"\n{lignes:,} lignes tarifées en {ecoule:.2f} s ({debit:,.0f} lignes/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
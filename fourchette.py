@@ -0,0 +1,117 @@
+"""Fourchette de prix (P10/P50/P90) par simulation de Monte Carlo.
+
+L'estimation du moteur (tarification.py) est un point unique. La fourchette
+tire `TIRAGES` scénarios en une passe NumPy :
+- prix de base : part matériaux volatile, part main-d'œuvre plus stable ;
+- coefficients de localité, hauteur et type : majoration (coeff - 1)
+  incertaine de ± INCERTITUDE_COEFFS ;
+- longueur clôturée : erreur relative selon le levé topo (mesurée, à
+  réaliser, ou estimée sans levé).
+
+Le coût simulé divisé par l'estimation ne dépend que des coefficients, des
+proportions de longueur par (hauteur, type) et du levé : ses quantiles sont
+mis en cache et une fourchette se déduit de l'estimation par simple
+produit, quel que soit le périmètre. Les tirages utilisent une graine fixe
+pour que tous les workers affichent la même fourchette.
+
+    python fourchette.py 70 "2.0m (standard)" Cotonou Angle --topo non
+"""
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from cache_lru import CacheLRU
+from tarification import config_tarifs, estimer
+
+TIRAGES = 131_072
+GRAINE = 20240601
+QUANTILES = (0.10, 0.50, 0.90)
+
+PART_MATERIAUX = 0.65
+VOLATILITE_MATERIAUX = 0.12  # écart-type log du prix des matériaux
+VOLATILITE_MAIN_OEUVRE = 0.04
+INCERTITUDE_COEFFS = 0.25  # majoration des coefficients à ± 25 %
+# Écart-type log de la longueur réelle selon le levé topo (None : non renseigné)
+INCERTITUDE_PERIMETRE = {"oui": 0.01, "a_faire": 0.05, "non": 0.12, None: 0.12}
+
+Fourchette = namedtuple("Fourchette", "p10 p50 p90")
+
+_quantiles = CacheLRU(taille_max=4096)
+
+
+def _lognormal(rng, sigma, n):
+    """Facteurs multiplicatifs de moyenne 1"""
+    return np.exp(rng.standard_normal(n) * sigma - sigma * sigma / 2)
+
+
+def _majoration(rng, coeffs, n):
+    """Coefficients tirés autour de leur valeur : 1 + (coeff - 1) × U(1 ± a)"""
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    return 1 + (coeffs - 1) * rng.uniform(1 - INCERTITUDE_COEFFS, 1 + INCERTITUDE_COEFFS, (n, coeffs.size))
+
+
+def simuler_relatif(poids, coeff_localite, topo, tirages=TIRAGES, graine=GRAINE):
+    """Tirages du coût simulé / estimation.
+
+    `poids` : tuples (part de la longueur, coeff hauteur, coeff type) par
+    couple (hauteur, type) distinct de la clôture.
+    """
+    rng = np.random.default_rng(graine)
+    parts, coeff_hauteur, coeff_type = (np.asarray(c, dtype=np.float64) for c in zip(*poids))
+
+    prix_base = (PART_MATERIAUX * _lognormal(rng, VOLATILITE_MATERIAUX, tirages)
+                 + (1 - PART_MATERIAUX) * _lognormal(rng, VOLATILITE_MAIN_OEUVRE, tirages))
+    longueur = _lognormal(rng, INCERTITUDE_PERIMETRE.get(topo, INCERTITUDE_PERIMETRE[None]), tirages)
+    localite = _majoration(rng, [coeff_localite], tirages)[:, 0] / coeff_localite
+
+    # Un même coefficient est tiré une fois par scénario, pour tous les tronçons qui l'utilisent
+    valeurs_h, index_h = np.unique(coeff_hauteur, return_inverse=True)
+    valeurs_t, index_t = np.unique(coeff_type, return_inverse=True)
+    hauteurs = _majoration(rng, valeurs_h, tirages)[:, index_h]
+    types = _majoration(rng, valeurs_t, tirages)[:, index_t]
+    troncons = (hauteurs * types) @ parts / (parts @ (coeff_hauteur * coeff_type))
+    return prix_base * longueur * localite * troncons
+
+
+def quantiles_relatifs(poids, coeff_localite, topo, tirages=TIRAGES, graine=GRAINE):
+    """P10/P50/P90 du coût simulé / estimation, mis en cache par configuration"""
+    cle = (poids, coeff_localite, topo, tirages, graine)
+    return _quantiles.obtenir(cle, lambda: tuple(
+        np.quantile(simuler_relatif(poids, coeff_localite, topo, tirages, graine), QUANTILES).tolist()
+    ))
+
+
+def fourchette(longueurs, hauteurs, localite, types_parcelle, topo=None, config=None):
+    """Fourchette P10/P50/P90 (FCFA) d'une clôture d'un ou plusieurs tronçons"""
+    config = config or config_tarifs()
+    longueurs = np.atleast_1d(np.asarray(longueurs, dtype=np.float64))
+    hauteurs = np.broadcast_to(np.asarray(hauteurs, dtype=object), longueurs.shape)
+    types_parcelle = np.broadcast_to(np.asarray(types_parcelle, dtype=object), longueurs.shape)
+    estimation = float(estimer(longueurs, hauteurs, localite, types_parcelle, config).sum())
+
+    total = longueurs.sum()
+    cumuls = {}
+    for longueur, hauteur, type_parcelle in zip(longueurs.tolist(), hauteurs, types_parcelle):
+        cle = (config.coeff_hauteur.get(hauteur, 1.0), config.types_parcelle.get(type_parcelle, 1.0))
+        cumuls[cle] = cumuls.get(cle, 0.0) + longueur / total
+    # Parts arrondies : des proportions voisines partagent la même entrée du cache
+    poids = tuple(sorted((round(part, 3), *cle) for cle, part in cumuls.items()))
+    quantiles = quantiles_relatifs(poids, config.coeff_localite.get(localite, 1.0), topo)
+    return Fourchette(*(estimation * q for q in quantiles))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fourchette de prix P10/P50/P90 d'une clôture")
+    parser.add_argument("perimetre", type=float)
+    parser.add_argument("hauteur")
+    parser.add_argument("localite")
+    parser.add_argument("type_parcelle")
+    parser.add_argument("--topo", choices=[t for t in INCERTITUDE_PERIMETRE if t], default=None)
+    args = parser.parse_args(argv)
+    resultat = fourchette(args.perimetre, args.hauteur, args.localite, args.type_parcelle, args.topo)
+    print(f"P10 {resultat.p10:,.0f} • P50 {resultat.p50:,.0f} • P90 {resultat.p90:,.0f} FCFA")
+
+
+if __name__ == "__main__":
+    main()
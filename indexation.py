@@ -0,0 +1,194 @@
+"""Projection du coût d'une clôture à date future, par indice des prix des matériaux.
+
+Les clients « Projet futur » et « En recherche » construiront dans
+plusieurs mois : l'estimation du jour est projetée sur `HORIZON_MOIS` mois.
+La part matériaux suit l'indice mensuel du fichier d'indices
+(`indices_prix.json`, ou le chemin de la variable d'environnement
+INDICES_CLOTURE), interpolé entre deux mois et prolongé au-delà du dernier
+mois par sa croissance des 12 derniers mois ; la part main-d'œuvre suit
+`inflation_main_oeuvre` par an.
+
+Sans fichier d'indices, la projection n'est pas proposée. Le dépôt ne
+fournit que `indices_prix.exemple.json`, valeurs fictives illustrant le
+format, que l'application ne charge pas.
+
+Tout l'horizon est calculé en une passe NumPy. Les facteurs ne dépendent
+que de la version des indices (empreinte du contenu) et du mois de départ :
+ils sont mis en cache, et la projection d'une estimation n'est qu'un
+produit. Comme les tarifs, le fichier n'est relu que lorsque sa date de
+modification ou sa taille change.
+
+    python indexation.py 4525524 --horizon 24 --indices indices_prix.exemple.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from cache_lru import CacheLRU
+from fourchette import PART_MATERIAUX
+
+logger = logging.getLogger(__name__)
+
+CHEMIN_INDICES = Path(os.environ.get("INDICES_CLOTURE", Path(__file__).resolve().parent / "indices_prix.json"))
+
+HORIZON_MOIS = 36
+JALONS = (6, 12, 24, 36)  # mois affichés sous la courbe
+NOMS_MOIS = ("janv.", "févr.", "mars", "avr.", "mai", "juin", "juil.", "août", "sept.", "oct.", "nov.", "déc.")
+
+_facteurs = CacheLRU(taille_max=64)
+
+
+def numero_mois(jour):
+    """Numéro absolu du mois d'une date (année × 12 + mois - 1)"""
+    return jour.year * 12 + jour.month - 1
+
+
+def mois_courant():
+    return numero_mois(date.today())
+
+
+def libelle_mois(numero):
+    return f"{NOMS_MOIS[numero % 12]} {numero // 12}"
+
+
+def _numero(cle):
+    """Numéro du mois d'une clé "AAAA-MM" du fichier"""
+    annee, mois = cle.split("-")
+    return int(annee) * 12 + int(mois) - 1
+
+
+@dataclass(frozen=True, eq=False)
+class SerieIndices:
+    """Indice mensuel des prix des matériaux issu du fichier d'indices"""
+    mois: np.ndarray  # numéros de mois croissants
+    valeurs: np.ndarray
+    part_materiaux: float
+    inflation_main_oeuvre: float
+    dernier_releve: int  # dernier mois observé, les suivants sont des prévisions
+    version: str
+
+    @classmethod
+    def depuis_json(cls, contenu):
+        """Construit la série à partir du contenu brut du fichier"""
+        try:
+            donnees = json.loads(contenu)
+            points = sorted((_numero(cle), float(valeur)) for cle, valeur in donnees["indices"].items())
+            mois, valeurs = (np.array(colonne) for colonne in zip(*points))
+            serie = cls(
+                mois=mois,
+                valeurs=valeurs,
+                part_materiaux=float(donnees.get("part_materiaux", PART_MATERIAUX)),
+                inflation_main_oeuvre=float(donnees.get("inflation_main_oeuvre", 0.0)),
+                dernier_releve=_numero(donnees["dernier_releve"]) if "dernier_releve" in donnees else int(mois[-1]),
+                version=hashlib.sha256(contenu).hexdigest()[:12],
+            )
+        except (KeyError, AttributeError, TypeError, ValueError) as exc:
+            raise ValueError(f"Fichier d'indices invalide : {exc!r}") from exc
+        if len(serie.mois) < 2 or np.any(serie.valeurs <= 0) or not 0 <= serie.part_materiaux <= 1:
+            raise ValueError("Fichier d'indices invalide : au moins deux indices positifs requis")
+        serie.mois.setflags(write=False)
+        serie.valeurs.setflags(write=False)
+        return serie
+
+    def croissance_annuelle(self):
+        """Croissance de l'indice sur les 12 derniers mois de la série"""
+        mois_debut = max(self.mois[-1] - 12, self.mois[0])
+        debut = np.interp(mois_debut, self.mois, self.valeurs)
+        return (self.valeurs[-1] / debut) ** (12 / (self.mois[-1] - mois_debut)) - 1
+
+
+_series = {}  # chemin -> (mtime_ns, taille, SerieIndices)
+_verrou = threading.Lock()
+
+
+def config_indices(chemin=None):
+    """Série d'indices courante, None si le fichier n'existe pas.
+
+    Même politique que `tarification.config_tarifs` : relecture sur
+    changement de mtime ou de taille, dernière série valide conservée si
+    le fichier devient invalide.
+    """
+    chemin = chemin or CHEMIN_INDICES
+    try:
+        stat = os.stat(chemin)
+    except FileNotFoundError:
+        return None
+    cache = _series.get(chemin)
+    if cache and cache[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cache[2]
+
+    with _verrou:
+        cache = _series.get(chemin)
+        if cache and cache[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cache[2]
+        contenu = Path(chemin).read_bytes()
+        if cache and cache[2].version == hashlib.sha256(contenu).hexdigest()[:12]:
+            serie = cache[2]
+        else:
+            try:
+                serie = SerieIndices.depuis_json(contenu)
+            except ValueError:
+                if cache is None:
+                    raise
+                logger.exception("Indices %s invalides, version %s conservée", chemin, cache[2].version)
+                serie = cache[2]
+        _series[chemin] = (stat.st_mtime_ns, stat.st_size, serie)
+        return serie
+
+
+def calculer_facteurs(serie, depart, horizon=HORIZON_MOIS):
+    """Coût au mois depart + i / coût au mois `depart`, pour i de 0 à `horizon`"""
+    ecarts = np.arange(horizon + 1)
+    mois = depart + ecarts
+    dernier = serie.mois[-1]
+    indices = np.where(
+        mois <= dernier,
+        np.interp(mois, serie.mois, serie.valeurs),
+        serie.valeurs[-1] * (1 + serie.croissance_annuelle()) ** ((mois - dernier) / 12),
+    )
+    materiaux = indices / indices[0]
+    main_oeuvre = (1 + serie.inflation_main_oeuvre) ** (ecarts / 12)
+    facteurs = serie.part_materiaux * materiaux + (1 - serie.part_materiaux) * main_oeuvre
+    facteurs.setflags(write=False)
+    return facteurs
+
+
+def facteurs(serie, depart=None, horizon=HORIZON_MOIS):
+    """Facteurs de projection en cache par version des indices et mois de départ"""
+    depart = mois_courant() if depart is None else depart
+    return _facteurs.obtenir((serie.version, depart, horizon), lambda: calculer_facteurs(serie, depart, horizon))
+
+
+def projeter(estimation, serie=None, depart=None, horizon=HORIZON_MOIS):
+    """Coûts projetés de chaque mois de l'horizon (une ligne par estimation si tableau)"""
+    serie = serie or config_indices()
+    return np.multiply.outer(estimation, facteurs(serie, depart, horizon))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Projection d'une estimation par l'indice des prix des matériaux")
+    parser.add_argument("estimation", type=float, help="estimation du jour en FCFA")
+    parser.add_argument("--horizon", type=int, default=HORIZON_MOIS, help="mois")
+    parser.add_argument("--indices", type=Path, default=None, help="fichier d'indices")
+    args = parser.parse_args(argv)
+
+    serie = config_indices(args.indices)
+    if serie is None:
+        parser.error(f"fichier d'indices introuvable : {args.indices or CHEMIN_INDICES}")
+    depart = mois_courant()
+    couts = projeter(args.estimation, serie, depart, args.horizon)
+    for ecart, cout in enumerate(couts):
+        prevision = " (prévision)" if depart + ecart > serie.dernier_releve else ""
+        print(f"{libelle_mois(depart + ecart):<12} {cout:>14,.0f} FCFA {cout / args.estimation - 1:+7.1%}{prevision}")
+
+
+if __name__ == "__main__":
+    main()
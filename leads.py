@@ -0,0 +1,169 @@
+"""Enregistrement des prospects (leads) dans SQLite, sans bloquer l'interface.
+
+`enregistrer()` dépose le lead dans une file bornée et rend la main
+immédiatement ; un thread d'écriture unique vide la file par lots et valide
+une transaction par lot. La file est vidée à l'arrêt du processus.
+
+Un lead rattaché à une session (identifiant de session de l'application)
+n'occupe qu'une ligne : chaque nouvel enregistrement de la session met
+cette ligne à jour au lieu d'en ajouter une.
+
+Le chemin de la base vient de la variable d'environnement LEADS_CLOTURE
+(par défaut `leads.sqlite3` à côté de l'application).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CHEMIN_LEADS = Path(os.environ.get("LEADS_CLOTURE", Path(__file__).resolve().parent / "leads.sqlite3"))
+
+TAILLE_FILE = 10_000
+TAILLE_LOT = 500
+DELAI_LOT = 0.2  # secondes d'attente maximale avant de valider un lot incomplet
+
+CHAMPS = (
+    "nom", "telephone", "email", "projet", "parcelle", "topo", "localite",
+    "type_parcelle", "perimetre", "hauteur", "estimation", "version_tarifs",
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    cree_le REAL NOT NULL,
+    {", ".join(CHAMPS)},
+    extra TEXT,
+    session TEXT
+)
+"""
+INDEX_SESSION = "CREATE UNIQUE INDEX IF NOT EXISTS leads_session ON leads (session)"
+
+REQUETE = (
+    f"INSERT INTO leads (cree_le, {', '.join(CHAMPS)}, extra, session) VALUES ({', '.join('?' * (len(CHAMPS) + 3))}) "
+    f"ON CONFLICT (session) DO UPDATE SET {', '.join(f'{champ} = excluded.{champ}' for champ in (*CHAMPS, 'extra'))}"
+)
+
+_ARRET = object()
+
+
+class EcrivainLeads:
+    """File d'écriture différée des leads vers SQLite"""
+
+    def __init__(self, chemin=CHEMIN_LEADS, taille_file=TAILLE_FILE, taille_lot=TAILLE_LOT, delai_lot=DELAI_LOT):
+        self.chemin = str(chemin)
+        self.taille_lot = taille_lot
+        self.delai_lot = delai_lot
+        self.file = queue.Queue(maxsize=taille_file)
+        self.ecrits = 0
+        self.rejetes = 0
+        self.erreur = None  # exception fatale du thread d'écriture
+        self._thread = threading.Thread(target=self._boucle, name="ecrivain-leads", daemon=True)
+        self._thread.start()
+
+    def enregistrer(self, lead, session=None):
+        """Dépose un lead (dict) sans attendre ; False si la file est pleine
+        ou si le thread d'écriture est arrêté.
+
+        Avec `session`, remplace le lead déjà enregistré pour cette session.
+        """
+        if not self._thread.is_alive():
+            self.rejetes += 1
+            logger.error("Écrivain des leads arrêté (%r), lead rejeté", self.erreur)
+            return False
+        extra = {k: v for k, v in lead.items() if k not in CHAMPS}
+        ligne = (time.time(), *(lead.get(champ) for champ in CHAMPS),
+                 json.dumps(extra, ensure_ascii=False) if extra else None, session)
+        try:
+            self.file.put_nowait(ligne)
+            return True
+        except queue.Full:
+            self.rejetes += 1
+            logger.warning("File des leads pleine, lead rejeté")
+            return False
+
+    def fermer(self, delai=10.0):
+        """Vide la file puis arrête le thread d'écriture"""
+        if self._thread.is_alive():
+            self.file.put(_ARRET)
+            self._thread.join(delai)
+
+    def _connecter(self):
+        connexion = sqlite3.connect(self.chemin)
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("PRAGMA synchronous=NORMAL")
+        connexion.execute(SCHEMA)
+        colonnes = {ligne[1] for ligne in connexion.execute("PRAGMA table_info(leads)")}
+        if "session" not in colonnes:  # base créée avant la colonne
+            connexion.execute("ALTER TABLE leads ADD COLUMN session TEXT")
+        connexion.execute(INDEX_SESSION)
+        return connexion
+
+    def _boucle(self):
+        try:
+            connexion = self._connecter()
+        except Exception as exc:
+            # Sans base, enregistrer() refuse les leads au lieu de remplir la file
+            self.erreur = exc
+            logger.exception("Base des leads %s inutilisable, enregistrement désactivé", self.chemin)
+            return
+
+        arret = False
+        while not arret:
+            lot = []
+            element = self.file.get()
+            limite = time.monotonic() + self.delai_lot
+            while True:
+                if element is _ARRET:
+                    arret = True
+                    break
+                lot.append(element)
+                if len(lot) >= self.taille_lot:
+                    break
+                try:
+                    element = self.file.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+            if arret:
+                # Récupère ce qui reste en file avant de s'arrêter
+                while True:
+                    try:
+                        element = self.file.get_nowait()
+                    except queue.Empty:
+                        break
+                    if element is not _ARRET:
+                        lot.append(element)
+            if lot:
+                try:
+                    with connexion:
+                        connexion.executemany(REQUETE, lot)
+                    self.ecrits += len(lot)
+                except sqlite3.Error:
+                    logger.exception("Échec d'écriture de %d leads", len(lot))
+        connexion.close()
+
+
+_ecrivain = None
+_verrou = threading.Lock()
+
+
+def ecrivain_leads():
+    """Écrivain partagé par tout le processus, créé à la première utilisation"""
+    global _ecrivain
+    if _ecrivain is None:
+        with _verrou:
+            if _ecrivain is None:
+                _ecrivain = EcrivainLeads()
+                atexit.register(_ecrivain.fermer)
+    return _ecrivain
+
+
+def enregistrer(lead, session=None):
+    """Enregistre un lead de manière asynchrone (un seul par `session`)"""
+    return ecrivain_leads().enregistrer(lead, session)
@@ -0,0 +1,242 @@
+"""Périmètre d'une parcelle à partir d'un levé topographique.
+
+Formats acceptés :
+- CSV : colonnes x/y (ou est/nord, lon/lat), ou à défaut les deux premières
+  colonnes numériques (une colonne de numéros de points 1, 2, 3… est
+  ignorée) ; séparateur `,`, `;` (décimale `,`) ou tabulation ;
+- GeoJSON : Polygon, MultiPolygon, LineString (ou Feature/FeatureCollection
+  qui en contient), en longitude/latitude WGS 84 ;
+- DXF : première polyligne (LWPOLYLINE ou POLYLINE/VERTEX).
+
+Les coordonnées géographiques sont projetées localement en mètres. Le
+contour est fermé, les points dupliqués retirés, et les coins sont les
+sommets où la direction change de plus de `seuil_angle` degrés : un côté
+relevé avec de nombreux points intermédiaires reste un seul côté. Un levé
+dense est ramené à un point tous les `PAS_COINS` mètres avant toute mesure,
+pour que le bruit GPS n'allonge pas le périmètre facturé.
+
+    python leve_topo.py leve.csv
+"""
+import argparse
+import io
+import json
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAYON_TERRE = 6_371_008.8
+SEUIL_ANGLE = 15.0  # degrés
+PAS_COINS = 0.5  # mètres entre points retenus pour détecter les coins des levés denses
+
+NOMS_COLONNES = (("x", "y"), ("est", "nord"), ("e", "n"), ("easting", "northing"))
+NOMS_GEOGRAPHIQUES = (("lon", "lat"), ("longitude", "latitude"), ("lng", "lat"))
+
+Leve = namedtuple("Leve", "perimetre cotes coins nb_points")
+
+
+# -----------------------------
+# LECTURE DES FORMATS
+# -----------------------------
+def _projeter(lon, lat):
+    """Longitude/latitude (degrés) -> mètres, projection locale équirectangulaire"""
+    lat0 = np.radians(lat.mean())
+    x = np.radians(lon - lon.mean()) * RAYON_TERRE * np.cos(lat0)
+    y = np.radians(lat - lat.mean()) * RAYON_TERRE
+    return np.column_stack([x, y])
+
+
+def _nombre(champ):
+    try:
+        float(champ.replace(",", "."))
+    except ValueError:
+        return False
+    return True
+
+
+def lire_csv(texte):
+    premiere, deuxieme = (texte.lstrip().split("\n", 2) + ["", ""])[:2]
+    sep = ";" if ";" in premiere else "\t" if "\t" in premiere else ","
+    # En-tête : un champ non numérique au-dessus d'une valeur numérique
+    entete = any(not _nombre(a) and _nombre(b) for a, b in zip(premiere.split(sep), deuxieme.split(sep)))
+    table = pd.read_csv(io.StringIO(texte), sep=sep, decimal="," if sep == ";" else ".",
+                        header=0 if entete else None, skipinitialspace=True)
+    colonnes = {str(c).strip().lower(): c for c in table.columns}
+
+    for noms, geographique in [(n, False) for n in NOMS_COLONNES] + [(n, True) for n in NOMS_GEOGRAPHIQUES]:
+        if all(nom in colonnes for nom in noms):
+            x, y = (pd.to_numeric(table[colonnes[nom]], errors="coerce").to_numpy(float) for nom in noms)
+            break
+    else:
+        numeriques = [c for c in table.columns if pd.api.types.is_numeric_dtype(table[c])]
+        premiere_col = table[numeriques[0]].to_numpy() if numeriques else None
+        if len(numeriques) >= 3 and np.array_equal(premiere_col, np.arange(premiere_col[0], premiere_col[0] + len(table))):
+            numeriques = numeriques[1:]  # numéros de points
+        if len(numeriques) < 2:
+            raise ValueError("Le CSV doit contenir deux colonnes de coordonnées (x, y)")
+        x, y = (table[c].to_numpy(float) for c in numeriques[:2])
+        geographique = False
+
+    valides = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valides], y[valides]
+    return _projeter(x, y) if geographique else np.column_stack([x, y])
+
+
+def _geometrie(objet):
+    if objet.get("type") == "FeatureCollection":
+        for feature in objet.get("features", []):
+            if feature.get("geometry"):
+                return _geometrie(feature["geometry"])
+        raise ValueError("Le GeoJSON ne contient aucune géométrie")
+    if objet.get("type") == "Feature":
+        return _geometrie(objet.get("geometry") or {})
+    return objet
+
+
+def lire_geojson(texte):
+    donnees = json.loads(texte)
+    if not isinstance(donnees, dict):
+        raise ValueError("Le GeoJSON doit être un objet (Feature, FeatureCollection ou géométrie)")
+    geometrie = _geometrie(donnees)
+    type_geo, coordonnees = geometrie.get("type"), geometrie.get("coordinates")
+    if type_geo == "MultiPolygon":
+        coordonnees = coordonnees[0][0]
+    elif type_geo == "Polygon":
+        coordonnees = coordonnees[0]  # contour extérieur
+    elif type_geo != "LineString":
+        raise ValueError(f"Géométrie GeoJSON non prise en charge : {type_geo}")
+    points = np.asarray(coordonnees, dtype=float)[:, :2]
+    return _projeter(points[:, 0], points[:, 1])
+
+
+def lire_dxf(texte):
+    lignes = np.array(texte.splitlines(), dtype=object)
+    codes = np.char.strip(lignes[0::2].astype(str))
+    valeurs = np.char.strip(lignes[1::2].astype(str))
+    n = min(len(codes), len(valeurs))
+    codes, valeurs = codes[:n], valeurs[:n]
+
+    entites = np.flatnonzero(codes == "0")
+    debuts = entites[np.isin(valeurs[entites], ("LWPOLYLINE", "POLYLINE"))]
+    if debuts.size == 0:
+        raise ValueError("Le DXF ne contient aucune polyligne")
+    debut = debuts[0]
+    if valeurs[debut] == "LWPOLYLINE":
+        suivantes = entites[entites > debut]
+        fin = suivantes[0] if suivantes.size else n
+        bloc_codes, bloc_valeurs = codes[debut:fin], valeurs[debut:fin]
+        x = bloc_valeurs[bloc_codes == "10"].astype(float)
+        y = bloc_valeurs[bloc_codes == "20"].astype(float)
+    else:
+        # POLYLINE : un sommet par entité VERTEX, jusqu'à SEQEND
+        fins = entites[(entites > debut) & (valeurs[entites] == "SEQEND")]
+        fin = fins[0] if fins.size else n
+        sommets = entites[(entites > debut) & (entites < fin)]
+        numero = np.searchsorted(sommets, np.arange(debut, fin), side="right") - 1
+        bloc_codes, bloc_valeurs = codes[debut:fin], valeurs[debut:fin]
+        dans_sommet = numero >= 0
+        x = bloc_valeurs[dans_sommet & (bloc_codes == "10")].astype(float)
+        y = bloc_valeurs[dans_sommet & (bloc_codes == "20")].astype(float)
+    if len(x) != len(y):
+        raise ValueError("Polyligne DXF incomplète")
+    return np.column_stack([x, y])
+
+
+LECTEURS = {".csv": lire_csv, ".txt": lire_csv, ".geojson": lire_geojson, ".json": lire_geojson, ".dxf": lire_dxf}
+
+
+def lire_points(contenu, nom):
+    """Points (n, 2) en mètres depuis le contenu d'un fichier de levé"""
+    lecteur = LECTEURS.get(Path(nom).suffix.lower())
+    if lecteur is None:
+        raise ValueError(f"Format non pris en charge : {Path(nom).suffix or nom}")
+    texte = contenu.decode("utf-8-sig", errors="replace") if isinstance(contenu, bytes) else contenu
+    try:
+        return lecteur(texte)
+    except (KeyError, IndexError, TypeError, AttributeError, json.JSONDecodeError, pd.errors.ParserError) as exc:
+        raise ValueError(f"Fichier de levé illisible ({exc.__class__.__name__})") from exc
+
+
+# -----------------------------
+# MESURE DU CONTOUR
+# -----------------------------
+def mesurer_contour(points, seuil_angle=SEUIL_ANGLE, pas=PAS_COINS):
+    """Périmètre, longueurs des côtés et nombre de coins d'un contour fermé"""
+    points = np.asarray(points, dtype=float)
+    if points.ndim != 2 or points.shape[1] < 2:
+        raise ValueError("Coordonnées invalides")
+    points = points[:, :2]
+    garder = np.ones(len(points), dtype=bool)
+    garder[1:] = np.any(np.diff(points, axis=0) != 0, axis=1)
+    points = points[garder]
+    if len(points) > 1 and np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    if len(points) < 3:
+        raise ValueError("Le levé doit contenir au moins 3 points distincts")
+
+    nb_points = len(points)
+    longueurs = np.hypot(*(np.roll(points, -1, axis=0) - points).T)  # contour fermé
+    abscisses = np.concatenate([[0.0], np.cumsum(longueurs[:-1])])
+
+    # Levé dense : un point tous les `pas` mètres. Le bruit de mesure entre
+    # points très rapprochés allongerait le périmètre (chaque écart de
+    # quelques centimètres compte) et créerait de faux coins
+    if np.median(longueurs) < pas:
+        garder = np.flatnonzero(np.diff(np.floor(abscisses / pas), prepend=-1) > 0)
+        if len(garder) >= 3:
+            points = points[garder]
+            longueurs = np.hypot(*(np.roll(points, -1, axis=0) - points).T)
+            abscisses = np.concatenate([[0.0], np.cumsum(longueurs[:-1])])
+    perimetre = float(longueurs.sum())
+
+    segments = np.roll(points, -1, axis=0) - points
+    caps = np.arctan2(segments[:, 1], segments[:, 0])
+    virages = np.angle(np.exp(1j * (caps - np.roll(caps, 1))))  # au sommet de départ de chaque segment
+    seuil = np.radians(seuil_angle)
+    candidats = np.flatnonzero(np.abs(virages) > seuil / 2)
+    if candidats.size == 0:
+        return Leve(perimetre, np.array([perimetre]), 0, nb_points)
+
+    # Un coin tombé entre deux points se répartit sur des sommets voisins :
+    # on regroupe les virages séparés de moins de 2 × `pas`
+    ecarts = np.mod(abscisses[candidats] - abscisses[np.roll(candidats, 1)], perimetre)
+    voisins = np.mod(candidats - np.roll(candidats, 1), len(points)) == 1
+    debuts = ~(voisins & (ecarts < 2 * pas))
+    if not debuts.any():
+        debuts[0] = True
+    decalage = int(np.argmax(debuts))
+    candidats, debuts = np.roll(candidats, -decalage), np.roll(debuts, -decalage)
+    groupes = np.flatnonzero(debuts)
+
+    poids = np.abs(virages[candidats])
+    origine = np.repeat(abscisses[candidats[groupes]], np.diff(np.append(groupes, len(candidats))))
+    decalages = np.mod(abscisses[candidats] - origine, perimetre)
+    totaux = np.add.reduceat(virages[candidats], groupes)
+    positions = abscisses[candidats[groupes]] + np.add.reduceat(poids * decalages, groupes) / np.add.reduceat(poids, groupes)
+
+    positions = np.sort(np.mod(positions[np.abs(totaux) > seuil], perimetre))
+    if positions.size == 0:
+        return Leve(perimetre, np.array([perimetre]), 0, nb_points)
+    cotes = np.diff(np.append(positions, positions[0] + perimetre))
+    return Leve(perimetre, cotes, int(positions.size), nb_points)
+
+
+def mesurer_fichier(contenu, nom, seuil_angle=SEUIL_ANGLE):
+    """Lecture et mesure d'un fichier de levé"""
+    return mesurer_contour(lire_points(contenu, nom), seuil_angle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Périmètre d'une parcelle depuis un levé topographique")
+    parser.add_argument("fichier")
+    parser.add_argument("--seuil-angle", type=float, default=SEUIL_ANGLE)
+    args = parser.parse_args(argv)
+    leve = mesurer_fichier(Path(args.fichier).read_bytes(), args.fichier, args.seuil_angle)
+    print(f"{leve.nb_points} points • périmètre {leve.perimetre:.2f} ml • {leve.coins} coins")
+    for i, cote in enumerate(leve.cotes, 1):
+        print(f"  côté {i} : {cote:.2f} m")
+
+
+if __name__ == "__main__":
+    main()
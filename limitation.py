@@ -0,0 +1,127 @@
+"""Limitation du débit des exécutions du script, par session et par adresse IP.
+
+Chaque exécution de la page (ou d'un fragment relancé seul) consomme un
+jeton du seau de sa session et, derrière un proxy de confiance, de celui de
+son adresse IP. Seau vide : l'exécution est refusée tout de suite avec un
+message, sans bloquer le thread du script à attendre un jeton.
+
+La portée IP n'est active que si LIMITE_IP_ENTETE est défini : sans proxy
+qui annonce l'IP du client, l'adresse vue est souvent partagée (NAT,
+répartiteur de charge) et tous les clients seraient limités ensemble.
+
+Les modifications de hauteur ou de périmètre arrivées moins de
+LIMITE_FUSION secondes après la précédente forment une rafale : le
+recalcul de l'estimation est reporté jusqu'à LIMITE_FUSION secondes sans
+nouvelle modification, ce qui donne un recalcul par rafale au lieu d'un
+par clic.
+
+Réglages (variables d'environnement, 0 désactive une portée) :
+    LIMITE_SESSION, LIMITE_SESSION_RAFALE   exécutions/s et rafale par session (4, 20)
+    LIMITE_IP, LIMITE_IP_RAFALE             exécutions/s et rafale par adresse IP (10, 60)
+    LIMITE_FUSION                           fenêtre de fusion des rafales en secondes (0.3)
+    LIMITE_IP_ENTETE                        en-tête donnant l'IP du client derrière un
+                                            proxy de confiance, ex. X-Forwarded-For ;
+                                            active la portée IP
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metriques import REGISTRE
+
+MAX_CLES = 10_000  # seaux suivis par portée ; les moins récents sont oubliés
+
+LIMITEES = REGISTRE.compteur(
+    "cloture_limitation_total", "Exécutions refusées et recalculs différés par la limitation de débit",
+    ("portee", "decision"))
+
+
+class SeauJetons:
+    """Seau à jetons : `debit` jetons/s, au plus `capacite` d'avance"""
+
+    __slots__ = ("debit", "capacite", "jetons", "maj")
+
+    def __init__(self, debit, capacite, maintenant):
+        self.debit = debit
+        self.capacite = capacite
+        self.jetons = float(capacite)
+        self.maj = maintenant
+
+    def prendre(self, maintenant):
+        """Consomme un jeton s'il y en a un ; faux, sans rien consommer, si le seau est vide"""
+        self.jetons = min(self.capacite, self.jetons + (maintenant - self.maj) * self.debit)
+        self.maj = maintenant
+        if self.jetons < 1:
+            return False
+        self.jetons -= 1
+        return True
+
+
+class Limiteur:
+    """Seaux à jetons d'une portée (session ou IP), en nombre borné"""
+
+    def __init__(self, debit, rafale, max_cles=MAX_CLES):
+        self.debit = debit
+        self.rafale = max(rafale, 1)
+        self.max_cles = max_cles
+        self._seaux = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def admettre(self, cle, maintenant):
+        """Vrai si `cle` a un jeton (consommé) ; toujours vrai sans débit ni clé"""
+        if not self.debit or cle is None:
+            return True
+        with self._verrou:
+            seau = self._seaux.get(cle)
+            if seau is None:
+                seau = self._seaux[cle] = SeauJetons(self.debit, self.rafale, maintenant)
+                if len(self._seaux) > self.max_cles:
+                    self._seaux.popitem(last=False)
+            else:
+                self._seaux.move_to_end(cle)
+            return seau.prendre(maintenant)
+
+    def rendre(self, cle):
+        """Rend un jeton consommé (l'autre portée a refusé l'exécution)"""
+        with self._verrou:
+            seau = self._seaux.get(cle)
+            if seau is not None:
+                seau.jetons += 1
+
+
+class LimiteurReruns:
+    """Admission des exécutions par session puis par adresse IP"""
+
+    def __init__(self, debit_session=4.0, rafale_session=20, debit_ip=10.0, rafale_ip=60, fusion=0.3):
+        self.sessions = Limiteur(debit_session, rafale_session)
+        self.ips = Limiteur(debit_ip, rafale_ip)
+        self.fusion = fusion
+
+    @classmethod
+    def depuis_environnement(cls):
+        return cls(
+            float(os.environ.get("LIMITE_SESSION", 4)), int(os.environ.get("LIMITE_SESSION_RAFALE", 20)),
+            float(os.environ.get("LIMITE_IP", 10)), int(os.environ.get("LIMITE_IP_RAFALE", 60)),
+            float(os.environ.get("LIMITE_FUSION", 0.3)),
+        )
+
+    def controler(self, session_id, ip=None):
+        """Portée qui refuse l'exécution ("session" ou "ip"), None si elle est admise"""
+        maintenant = time.monotonic()
+        if not self.sessions.admettre(session_id, maintenant):
+            LIMITEES.inc(portee="session", decision="refusee")
+            return "session"
+        if not self.ips.admettre(ip, maintenant):
+            self.sessions.rendre(session_id)
+            LIMITEES.inc(portee="ip", decision="refusee")
+            return "ip"
+        return None
+
+    def en_rafale(self, precedente, maintenant):
+        """Vrai si une modification reçue à `maintenant` suit la précédente, datant
+        de `precedente` (time.monotonic()), de moins de la fenêtre de fusion"""
+        if not self.fusion or maintenant - precedente >= self.fusion:
+            return False
+        LIMITEES.inc(portee="rafale", decision="differee")
+        return True
@@ -0,0 +1,106 @@
+"""Recherche des localités (communes, arrondissements) par saisie partielle.
+
+L'index trie les noms normalisés (minuscules, sans accents ni tirets) et
+chacun de leurs suffixes de mots : « calavi », « abomey cal » ou
+« Abomey-Calavi » trouvent tous Abomey-Calavi par recherche dichotomique,
+en temps logarithmique quel que soit le nombre de localités. Une saisie
+inconnue se résout vers la localité au nom le plus proche, sauf en
+résolution stricte (API) : un nom étranger proche d'une localité connue
+(« Lagos » et Lalo) ne doit pas être tarifé comme elle.
+
+    python localites.py seme
+"""
+import argparse
+import difflib
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+
+SEPARATEURS = str.maketrans({"-": " ", "'": " ", "’": " ", ".": " "})
+
+
+def normaliser(texte):
+    """Minuscules sans accents, tirets ni apostrophes : « Sèmè-Podji » -> « seme podji »"""
+    decompose = unicodedata.normalize("NFKD", str(texte).translate(SEPARATEURS))
+    return " ".join("".join(c for c in decompose if not unicodedata.combining(c)).lower().split())
+
+
+class IndexLocalites:
+    """Index de préfixes sur les noms de localités, dans leur ordre d'origine"""
+
+    def __init__(self, noms):
+        self.noms = tuple(noms)
+        self._exacts = {}
+        entrees = set()
+        for rang, nom in enumerate(self.noms):
+            cle = normaliser(nom)
+            self._exacts.setdefault(cle, nom)
+            mots = cle.split()
+            entrees.update((" ".join(mots[i:]), i > 0, rang) for i in range(len(mots)))
+        entrees = sorted(entrees)
+        self._cles = [cle for cle, _, _ in entrees]
+        self._entrees = [(suffixe, rang) for _, suffixe, rang in entrees]
+        self._resolus = {}
+
+    def chercher(self, saisie, limite=10):
+        """Localités dont le nom, ou un de ses mots, commence par `saisie`.
+
+        Les noms qui commencent par la saisie viennent en premier, puis
+        l'ordre d'origine.
+        """
+        requete = normaliser(saisie)
+        if not requete:
+            return list(self.noms[:limite])
+        debut = bisect_left(self._cles, requete)
+        fin = bisect_left(self._cles, requete + "\uffff", debut)
+        rangs = {}
+        for suffixe, rang in self._entrees[debut:fin]:
+            rangs[rang] = min(rangs.get(rang, True), suffixe)
+        return [self.noms[rang] for rang in sorted(rangs, key=lambda r: (rangs[r], r))[:limite]]
+
+    def resoudre(self, nom, defaut=None, approchant=True):
+        """Localité connue la plus proche de `nom` (`defaut` si aucune ne ressemble).
+
+        Nom exact, puis nom ou mot d'un nom qui commence par `nom`, puis, si
+        `approchant`, le nom le plus semblable (difflib).
+        """
+        cle_cache = (nom, approchant)
+        try:
+            return self._resolus[cle_cache] or defaut
+        except KeyError:
+            pass
+        cle = normaliser(nom)
+        localite = self._exacts.get(cle)
+        if localite is None:
+            prefixes = self.chercher(cle, limite=1) if cle else []
+            if prefixes:
+                localite = prefixes[0]
+            elif approchant:
+                proches = difflib.get_close_matches(cle, self._exacts, n=1, cutoff=0.6)
+                localite = self._exacts[proches[0]] if proches else None
+        if len(self._resolus) < 4096:
+            self._resolus[cle_cache] = localite
+        return localite or defaut
+
+
+@lru_cache(maxsize=4)
+def index_localites(noms):
+    """Index partagé d'une liste de localités (tuple), ex. `ConfigTarifs.localites`"""
+    return IndexLocalites(noms)
+
+
+def main(argv=None):
+    from tarification import config_tarifs
+
+    parser = argparse.ArgumentParser(description="Recherche d'une localité du fichier de tarifs")
+    parser.add_argument("saisie")
+    parser.add_argument("--limite", type=int, default=10)
+    args = parser.parse_args(argv)
+    index = index_localites(config_tarifs().localites)
+    for nom in index.chercher(args.saisie, args.limite):
+        print(nom)
+    print(f"-> {index.resoudre(args.saisie)}")
+
+
+if __name__ == "__main__":
+    main()
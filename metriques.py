@@ -0,0 +1,239 @@
+"""Métriques de l'application au format texte Prometheus.
+
+Compteurs, jauges et histogrammes à étiquettes, enregistrés dans un
+registre global (`REGISTRE`). L'enregistrement coûte un verrou et une
+addition ; l'export est fait à la demande :
+
+- serveur HTTP `/metrics` dans un thread, si METRIQUES_PORT est défini ;
+- fichier réécrit périodiquement, si METRIQUES_FICHIER est défini
+  (compatible avec le collecteur « textfile » de node_exporter).
+"""
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BALISES_DUREE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _echapper(valeur):
+    """Échappe une valeur d'étiquette (barre oblique inverse, guillemet, saut de ligne)"""
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(noms, valeurs):
+    if not noms:
+        return ""
+    return "{" + ",".join(f'{n}="{_echapper(v)}"' for n, v in zip(noms, valeurs)) + "}"
+
+
+class _Metrique:
+    type = ""
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self._valeurs = {}
+        self._verrou = threading.Lock()
+
+    def _cle(self, etiquettes):
+        return tuple(str(etiquettes.get(n, "")) for n in self.etiquettes)
+
+    def exporter(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} {self.type}"]
+        with self._verrou:
+            valeurs = list(self._valeurs.items())
+        for cle, valeur in valeurs:
+            lignes.append(f"{self.nom}{_etiquettes(self.etiquettes, cle)} {valeur}")
+        return lignes
+
+
+class Compteur(_Metrique):
+    type = "counter"
+
+    def inc(self, valeur=1, **etiquettes):
+        cle = self._cle(etiquettes)
+        with self._verrou:
+            self._valeurs[cle] = self._valeurs.get(cle, 0) + valeur
+
+
+class Jauge(_Metrique):
+    type = "gauge"
+
+    def fixer(self, valeur, **etiquettes):
+        cle = self._cle(etiquettes)
+        with self._verrou:
+            self._valeurs[cle] = valeur
+
+
+class Histogramme(_Metrique):
+    type = "histogram"
+
+    def __init__(self, nom, aide, etiquettes=(), balises=BALISES_DUREE):
+        super().__init__(nom, aide, etiquettes)
+        self.balises = tuple(balises)
+
+    def observer(self, valeur, **etiquettes):
+        cle = self._cle(etiquettes)
+        i = bisect.bisect_left(self.balises, valeur)
+        with self._verrou:
+            serie = self._valeurs.get(cle)
+            if serie is None:
+                serie = self._valeurs[cle] = [[0] * (len(self.balises) + 1), 0.0, 0]
+            serie[0][i] += 1
+            serie[1] += valeur
+            serie[2] += 1
+
+    @contextmanager
+    def mesurer(self, **etiquettes):
+        """Observe la durée du bloc `with`"""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observer(time.perf_counter() - debut, **etiquettes)
+
+    def chronometrer(self, **etiquettes):
+        """Décorateur : observe la durée de chaque appel (même interrompu)"""
+        def decorateur(fonction):
+            @functools.wraps(fonction)
+            def enveloppe(*args, **kwargs):
+                debut = time.perf_counter()
+                try:
+                    return fonction(*args, **kwargs)
+                finally:
+                    self.observer(time.perf_counter() - debut, **etiquettes)
+            return enveloppe
+        return decorateur
+
+    def exporter(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} {self.type}"]
+        with self._verrou:
+            series = [(cle, list(s[0]), s[1], s[2]) for cle, s in self._valeurs.items()]
+        noms = self.etiquettes + ("le",)
+        for cle, comptes, somme, total in series:
+            cumul = 0
+            for balise, compte in zip(self.balises + ("+Inf",), comptes):
+                cumul += compte
+                lignes.append(f"{self.nom}_bucket{_etiquettes(noms, cle + (balise,))} {cumul}")
+            lignes.append(f"{self.nom}_sum{_etiquettes(self.etiquettes, cle)} {somme}")
+            lignes.append(f"{self.nom}_count{_etiquettes(self.etiquettes, cle)} {total}")
+        return lignes
+
+
+class SessionsActives:
+    """Sessions vues récemment, comptées à l'export"""
+
+    def __init__(self, fenetre=300.0):
+        self.fenetre = fenetre
+        self._vues = {}
+        self._verrou = threading.Lock()
+
+    def vue(self, session_id):
+        with self._verrou:
+            self._vues[session_id] = time.monotonic()
+
+    def nombre(self):
+        limite = time.monotonic() - self.fenetre
+        with self._verrou:
+            for session_id, instant in list(self._vues.items()):
+                if instant < limite:
+                    del self._vues[session_id]
+            return len(self._vues)
+
+
+class Registre:
+    """Ensemble des métriques du processus"""
+
+    def __init__(self):
+        self._metriques = {}
+        self._collecteurs = []
+        self._verrou = threading.Lock()
+
+    def _obtenir(self, classe, nom, *args, **kwargs):
+        # Idempotent : app.py est réexécuté à chaque rerun
+        with self._verrou:
+            metrique = self._metriques.get(nom)
+            if metrique is None:
+                metrique = self._metriques[nom] = classe(nom, *args, **kwargs)
+            return metrique
+
+    def compteur(self, nom, aide, etiquettes=()):
+        return self._obtenir(Compteur, nom, aide, etiquettes)
+
+    def jauge(self, nom, aide, etiquettes=()):
+        return self._obtenir(Jauge, nom, aide, etiquettes)
+
+    def histogramme(self, nom, aide, etiquettes=(), balises=BALISES_DUREE):
+        return self._obtenir(Histogramme, nom, aide, etiquettes, balises)
+
+    def collecteur(self, fonction):
+        """Ajoute une fonction appelée avant chaque export (une seule fois)"""
+        with self._verrou:
+            if fonction not in self._collecteurs:
+                self._collecteurs.append(fonction)
+
+    def exporter(self):
+        """Toutes les métriques au format texte Prometheus"""
+        for fonction in list(self._collecteurs):
+            fonction()
+        lignes = []
+        for metrique in list(self._metriques.values()):
+            lignes.extend(metrique.exporter())
+        return "\n".join(lignes) + "\n"
+
+
+REGISTRE = Registre()
+
+
+# -----------------------------
+# EXPORT
+# -----------------------------
+class _GestionnaireHTTP(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        corps = REGISTRE.exporter().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, *args):
+        pass
+
+
+def _ecrire_fichier(chemin, intervalle):
+    chemin = Path(chemin)
+    temporaire = chemin.with_name(chemin.name + ".tmp")
+    while True:
+        try:
+            temporaire.write_text(REGISTRE.exporter(), encoding="utf-8")
+            temporaire.replace(chemin)
+        except Exception:  # disque plein, collecteur en échec… : réessayé à l'intervalle suivant
+            logger.exception("Export des métriques vers %s impossible", chemin)
+        time.sleep(intervalle)
+
+
+def demarrer_export(port=None, fichier=None, intervalle=15.0):
+    """Démarre l'export HTTP et/ou fichier (par défaut depuis
+    METRIQUES_PORT et METRIQUES_FICHIER) ; à n'appeler qu'une fois"""
+    port = port or os.environ.get("METRIQUES_PORT")
+    fichier = fichier or os.environ.get("METRIQUES_FICHIER")
+    serveur = None
+    if port:
+        serveur = ThreadingHTTPServer(("0.0.0.0", int(port)), _GestionnaireHTTP)
+        threading.Thread(target=serveur.serve_forever, name="metriques-http", daemon=True).start()
+    if fichier:
+        threading.Thread(target=_ecrire_fichier, args=(fichier, intervalle), name="metriques-fichier", daemon=True).start()
+    return serveur
@@ -0,0 +1,194 @@
+"""Modèles de messages WhatsApp précompilés et liens wa.me en masse.
+
+Les modèles sont des fichiers texte `modeles/<langue>/<nom>.txt` (ou sous
+le répertoire de la variable d'environnement MODELES_WHATSAPP), au format
+de `str.format` : `{nom}`, `{estimation:,.0f}`. Chaque modèle est compilé
+une fois (et de nouveau si le fichier change) : les parties fixes sont
+encodées pour l'URL à la compilation, seuls les champs sont formatés et
+encodés à chaque message. `quote()` encodant caractère par caractère, le
+lien obtenu est identique à `quote()` du message complet.
+
+Un modèle peut se décliner par type de projet : `<nom>.<projet>.txt` s'il
+existe (ex. `relance.pas-de-projet-immediat.txt`), sinon `<nom>.txt`. Une
+simple phrase qui dépend du projet passe plutôt par un champ, comme
+`{demande}` dans le message de l'étape 3. Une langue sans le modèle
+demandé retombe sur le français.
+
+`liens_lot()` produit les liens de relance d'un DataFrame de leads colonne
+par colonne : chaque valeur distincte d'une colonne n'est formatée et
+encodée qu'une fois.
+
+    python modeles_whatsapp.py leads.sqlite3 --modele relance > liens.csv
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from string import Formatter
+from urllib.parse import quote
+
+from localites import normaliser
+from whatsapp import numero_international
+
+DOSSIER_MODELES = Path(os.environ.get("MODELES_WHATSAPP", Path(__file__).resolve().parent / "modeles"))
+LANGUE_DEFAUT = "fr"
+NUMERO_SOCIETE = "2290166815278"  # destinataire des demandes de l'étape 3
+
+CONVERSIONS = {None: None, "s": str, "r": repr, "a": ascii}
+
+
+def lien(numero, texte_encode):
+    """Lien wa.me vers `numero` avec un texte déjà encodé"""
+    return f"https://wa.me/{numero}?text={texte_encode}"
+
+
+class Modele:
+    """Modèle compilé : parties fixes encodées d'avance, champs à formater"""
+
+    def __init__(self, source):
+        self.source = source
+        self.litteraux = []  # parties fixes, une de plus que de champs
+        self.champs = []     # (nom, spécification, conversion)
+        fixe = ""
+        for litteral, nom, specification, conversion in Formatter().parse(source):
+            fixe += litteral
+            if nom is None:
+                continue
+            if not nom.isidentifier() or "{" in specification or conversion not in CONVERSIONS:
+                raise ValueError(f"Champ de modèle invalide : {{{nom}}}")
+            self.litteraux.append(fixe)
+            self.champs.append((nom, specification, CONVERSIONS[conversion]))
+            fixe = ""
+        self.litteraux.append(fixe)
+        self.litteraux_url = [quote(litteral) for litteral in self.litteraux]
+        self.noms = tuple(dict.fromkeys(nom for nom, _, _ in self.champs))
+
+    @staticmethod
+    def _formater(valeur, specification, conversion):
+        return format(conversion(valeur) if conversion else valeur, specification)
+
+    def rendre(self, valeurs):
+        """Message en clair"""
+        morceaux = [self.litteraux[0]]
+        for (nom, specification, conversion), litteral in zip(self.champs, self.litteraux[1:]):
+            morceaux += (self._formater(valeurs[nom], specification, conversion), litteral)
+        return "".join(morceaux)
+
+    def encoder(self, valeurs):
+        """Message encodé pour le paramètre `text` d'un lien wa.me"""
+        morceaux = [self.litteraux_url[0]]
+        for (nom, specification, conversion), litteral in zip(self.champs, self.litteraux_url[1:]):
+            morceaux += (quote(self._formater(valeurs[nom], specification, conversion)), litteral)
+        return "".join(morceaux)
+
+    def encoder_colonnes(self, colonnes, lignes):
+        """Messages encodés de `lignes` lignes données colonne par colonne ({nom: liste})"""
+        encodees = [self.litteraux_url[0]]
+        for (nom, specification, conversion), litteral in zip(self.champs, self.litteraux_url[1:]):
+            memo = {}
+            colonne = []
+            for valeur in colonnes[nom]:
+                try:
+                    colonne.append(memo[valeur])
+                except KeyError:
+                    colonne.append(memo.setdefault(valeur, quote(self._formater(valeur, specification, conversion))))
+                except TypeError:  # valeur non hachable
+                    colonne.append(quote(self._formater(valeur, specification, conversion)))
+            encodees += (colonne, litteral)
+        # Une partie fixe se répète sur toutes les lignes
+        return ["".join(morceaux) for morceaux in zip(*(
+            partie if isinstance(partie, list) else [partie] * lignes for partie in encodees))]
+
+
+_modeles = {}  # chemin -> (mtime_ns, Modele)
+
+
+def charger(chemin):
+    """Modèle compilé d'un fichier, recompilé si sa date de modification change"""
+    mtime = os.stat(chemin).st_mtime_ns
+    cache = _modeles.get(chemin)
+    if cache and cache[0] == mtime:
+        return cache[1]
+    source = Path(chemin).read_text(encoding="utf-8").replace("\r\n", "\n").removesuffix("\n")
+    modele_compile = Modele(source)
+    _modeles[chemin] = (mtime, modele_compile)
+    return modele_compile
+
+
+def nom_projet(projet):
+    """Nom de fichier d'un type de projet : « Pas de projet immédiat » -> pas-de-projet-immediat"""
+    return normaliser(projet).replace(" ", "-")
+
+
+def modele(nom="defaut", langue=LANGUE_DEFAUT, projet=None, dossier=None):
+    """Modèle `<nom>.<projet>.txt` ou `<nom>.txt` de la langue, à défaut du français"""
+    dossier = Path(dossier or DOSSIER_MODELES)
+    noms = (f"{nom}.{nom_projet(projet)}", nom) if projet else (nom,)
+    for langue_modele in dict.fromkeys((langue or LANGUE_DEFAUT, LANGUE_DEFAUT)):
+        for nom_modele in noms:
+            try:
+                return charger(dossier / langue_modele / f"{nom_modele}.txt")
+            except FileNotFoundError:
+                pass
+    raise FileNotFoundError(f"Modèle WhatsApp introuvable : {langue}/{nom}.txt dans {dossier}")
+
+
+def _numero_ou_none(telephone):
+    try:
+        return numero_international(telephone)
+    except ValueError:
+        return None
+
+
+def liens_lot(donnees, nom="relance", langue=LANGUE_DEFAUT, dossier=None):
+    """Liens wa.me de relance vers chaque lead d'un DataFrame.
+
+    `donnees` doit contenir `telephone` et les champs du modèle. Les
+    colonnes facultatives `langue` et `projet` choisissent le modèle de
+    chaque ligne. Retourne une copie enrichie du numéro international et du
+    lien (valeur manquante pour un numéro invalide).
+    """
+    cles = [colonne for colonne in ("langue", "projet") if colonne in donnees]
+    groupes = donnees.groupby(cles, sort=False, dropna=False).indices if cles else {(): range(len(donnees))}
+    colonnes = {}
+    liens = [None] * len(donnees)
+    numeros = [_numero_ou_none(telephone) for telephone in donnees["telephone"].tolist()]
+    for cle, positions in groupes.items():
+        cle = {colonne: valeur for colonne, valeur in zip(cles, cle if isinstance(cle, tuple) else (cle,))
+               if isinstance(valeur, str)}
+        modele_groupe = modele(nom, cle.get("langue") or langue, cle.get("projet"), dossier)
+        manquantes = [champ for champ in modele_groupe.noms if champ not in donnees]
+        if manquantes:
+            raise KeyError(f"Colonnes manquantes : {', '.join(manquantes)}")
+        for champ in modele_groupe.noms:
+            if champ not in colonnes:
+                colonnes[champ] = donnees[champ].tolist()
+        textes = modele_groupe.encoder_colonnes({
+            champ: [colonnes[champ][position] for position in positions] for champ in modele_groupe.noms}, len(positions))
+        for position, texte in zip(positions, textes):
+            if numeros[position]:
+                liens[position] = lien(numeros[position], texte)
+    resultat = donnees.copy()
+    resultat["numero"] = numeros
+    resultat["lien"] = liens
+    return resultat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Liens WhatsApp de relance des leads (CSV sur la sortie standard)")
+    parser.add_argument("base", type=Path, help="base SQLite des leads (leads.py)")
+    parser.add_argument("--modele", default="relance")
+    parser.add_argument("--langue", default=LANGUE_DEFAUT)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    with sqlite3.connect(args.base) as connexion:
+        leads = pd.read_sql_query("SELECT * FROM leads", connexion)
+    resultat = liens_lot(leads, args.modele, args.langue)
+    resultat[["id", "nom", "numero", "lien"]].dropna(subset=["lien"]).to_csv(sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Ressources partagées par toutes les sessions de l'application.
+
+Streamlit réexécute app.py à chaque interaction : un `@st.cache_resource`
+défini dans le script recalcule à chaque rerun la clé de la fonction
+(lecture et tokenisation de son code source), et une namedtuple y serait
+recréée à chaque fois. Définis ici, dans un module importé une seule fois
+par processus, métriques, caches et grille ne coûtent plus rien au rerun.
+"""
+from collections import namedtuple
+
+import streamlit as st
+
+from cache_lru import CacheLRU
+from devis_pdf import CachePDF
+from limitation import LimiteurReruns
+from metriques import REGISTRE, SessionsActives, demarrer_export
+from sessions import CHEMIN_SESSIONS, MagasinSessions
+from tarification import GrilleTarifs, config_tarifs
+
+# -----------------------------
+# MÉTRIQUES - EXPORT PROMETHEUS (METRIQUES_PORT / METRIQUES_FICHIER)
+# -----------------------------
+DUREE_SECTION = REGISTRE.histogramme(
+    "cloture_section_duree_secondes", "Durée d'exécution des sections de la page", ("section",))
+RERUNS = REGISTRE.compteur(
+    "cloture_reruns_total", "Exécutions de la page complète (app) et de chaque étape", ("etape",))
+ENTONNOIR = REGISTRE.compteur(
+    "cloture_entonnoir_total", "Passages d'une étape à la suivante", ("transition",))
+TAILLE_SESSION = REGISTRE.histogramme(
+    "cloture_session_state_octets", "Taille sérialisée du devis de la session à chaque rerun complet",
+    balises=(512, 1024, 2048, 4096, 8192, 16384, 65536))
+
+RenduEstimation = namedtuple("RenduEstimation", "estimation fourchette carte_etape2 carte_etape3 prix_segments", defaults=((),))
+
+
+@st.cache_resource
+def sessions_actives():
+    """Suivi des sessions et export des métriques, une fois par processus"""
+    sessions = SessionsActives()
+    jauge_sessions = REGISTRE.jauge("cloture_sessions_actives", "Sessions actives dans les 5 dernières minutes")
+    jauge_cache = REGISTRE.jauge("cloture_cache_rendus", "Statistiques du cache des rendus d'estimation", ("mesure",))
+    rendus = cache_rendus()
+
+    def collecter():
+        jauge_sessions.fixer(sessions.nombre())
+        for mesure, valeur in rendus.statistiques().items():
+            jauge_cache.fixer(valeur, mesure=mesure)
+
+    REGISTRE.collecteur(collecter)
+    demarrer_export()
+    return sessions
+
+
+@st.cache_resource(max_entries=2)
+def charger_grille(version, _config):
+    """Grille précalculée d'une version des tarifs, partagée par toutes les sessions"""
+    return GrilleTarifs(_config)
+
+
+def grille_courante():
+    """Grille de la version des tarifs en vigueur (tarifs.json)"""
+    config = config_tarifs()
+    return charger_grille(config.version, config)
+
+
+@st.cache_resource
+def cache_rendus():
+    """Cache LRU des estimations et des cartes HTML, partagé par toutes les sessions"""
+    return CacheLRU(taille_max=2048)
+
+
+@st.cache_resource
+def cache_pdf():
+    """Devis PDF en cache disque, partagé par toutes les sessions"""
+    return CachePDF()
+
+
+@st.cache_resource
+def magasin_sessions():
+    """Sessions partagées entre workers (SQLite), None si SESSIONS_CLOTURE n'est pas défini"""
+    return MagasinSessions(CHEMIN_SESSIONS) if CHEMIN_SESSIONS else None
+
+
+@st.cache_resource
+def limiteur_reruns():
+    """Limitation du débit des exécutions, par session et par adresse IP (LIMITE_*)"""
+    return LimiteurReruns.depuis_environnement()
@@ -0,0 +1,83 @@
+"""Sessions partagées entre processus Streamlit (optionnel).
+
+L'avancement d'un devis est enregistré dans SQLite sous un jeton client
+(paramètre d'URL `?session=`), pour qu'un utilisateur puisse reprendre sur
+n'importe quel worker derrière un répartiteur de charge. Chaque session est
+une ligne de texte compacte (`Devis.serialiser()`) qui expire après `ttl`
+secondes sans mise à jour.
+
+Activé si la variable d'environnement SESSIONS_CLOTURE donne le chemin de
+la base (partagée par tous les workers de la machine) ; SESSIONS_TTL règle
+l'expiration (7 jours par défaut).
+"""
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CHEMIN_SESSIONS = os.environ.get("SESSIONS_CLOTURE")
+TTL = float(os.environ.get("SESSIONS_TTL", 7 * 24 * 3600))
+INTERVALLE_PURGE = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    jeton TEXT PRIMARY KEY,
+    donnees TEXT NOT NULL,
+    expire REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def nouveau_jeton():
+    """Jeton client aléatoire, utilisable dans une URL"""
+    return secrets.token_urlsafe(12)
+
+
+class MagasinSessions:
+    """Sessions sérialisées dans une base SQLite partagée, avec expiration"""
+
+    def __init__(self, chemin, ttl=TTL):
+        self.chemin = str(chemin)
+        self.ttl = ttl
+        self._verrou = threading.Lock()
+        self._derniere_purge = 0.0
+        self._connexion = sqlite3.connect(self.chemin, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute("PRAGMA synchronous=NORMAL")
+        self._connexion.execute(SCHEMA)
+
+    def charger(self, jeton):
+        """Données enregistrées sous `jeton`, None si elles sont absentes ou expirées"""
+        with self._verrou:
+            ligne = self._connexion.execute(
+                "SELECT donnees FROM sessions WHERE jeton = ? AND expire > ?", (jeton, time.time())
+            ).fetchone()
+        return ligne[0] if ligne else None
+
+    def sauver(self, jeton, donnees):
+        """Enregistre `donnees` (texte) sous `jeton` et repousse l'expiration"""
+        maintenant = time.time()
+        with self._verrou:
+            try:
+                self._connexion.execute(
+                    "INSERT INTO sessions (jeton, donnees, expire) VALUES (?, ?, ?) "
+                    "ON CONFLICT(jeton) DO UPDATE SET donnees = excluded.donnees, expire = excluded.expire",
+                    (jeton, donnees, maintenant + self.ttl),
+                )
+                if maintenant - self._derniere_purge > INTERVALLE_PURGE:
+                    self._derniere_purge = maintenant
+                    self._connexion.execute("DELETE FROM sessions WHERE expire <= ?", (maintenant,))
+            except sqlite3.Error:
+                logger.exception("Échec d'enregistrement de la session %s", jeton)
+
+    def supprimer(self, jeton):
+        with self._verrou:
+            self._connexion.execute("DELETE FROM sessions WHERE jeton = ?", (jeton,))
+
+    def fermer(self):
+        with self._verrou:
+            self._connexion.close()
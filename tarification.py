@@ -0,0 +1,261 @@
+"""Moteur de tarification des clôtures, indépendant de Streamlit.
+
+Toutes les fonctions acceptent des scalaires ou des tableaux NumPy et
+calculent les estimations en une seule passe vectorisée.
+
+Le prix de base, les coefficients et la liste des localités (communes par
+département, arrondissements facultatifs) sont lus dans le fichier de tarifs (`tarifs.json`, ou le chemin de la variable
+d'environnement TARIFS_CLOTURE). Le fichier est mis en cache pour tout le
+processus et n'est relu que lorsque sa date de modification ou sa taille
+change ; chaque configuration porte une version (empreinte du contenu).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# DONNÉES
+# -----------------------------
+CHEMIN_TARIFS = Path(os.environ.get("TARIFS_CLOTURE", Path(__file__).resolve().parent / "tarifs.json"))
+
+PERIMETRE_MIN = 10
+PERIMETRE_MAX = 500
+
+COLONNES = ("perimetre", "hauteur", "localite", "type_parcelle")
+
+
+@dataclass(frozen=True)
+class ConfigTarifs:
+    """Paramètres de tarification issus du fichier de tarifs"""
+    prix_base_ml: float
+    coeff_localite: dict
+    coeff_hauteur: dict
+    types_parcelle: dict
+    localites: tuple
+    version: str
+    departements: dict = field(default_factory=dict)  # commune -> département
+    communes: dict = field(default_factory=dict)  # arrondissement -> commune
+
+    @classmethod
+    def depuis_json(cls, contenu):
+        """Construit la configuration à partir du contenu brut du fichier.
+
+        `localites` est une liste, ou un dict {département: [communes]} ;
+        `arrondissements` ({arrondissement: commune}) est facultatif. Un
+        arrondissement sans coefficient propre prend celui de sa commune.
+        """
+        try:
+            donnees = json.loads(contenu)
+            localites = donnees["localites"]
+            if isinstance(localites, dict):
+                departements = {commune: dep for dep, communes in localites.items() for commune in communes}
+            else:
+                departements = {}
+            communes = dict(donnees.get("arrondissements", {}))
+            coeff_localite = {k: float(v) for k, v in donnees["coeff_localite"].items()}
+            for arrondissement, commune in communes.items():
+                if commune in coeff_localite:
+                    coeff_localite.setdefault(arrondissement, coeff_localite[commune])
+            config = cls(
+                prix_base_ml=float(donnees["prix_base_ml"]),
+                coeff_localite=coeff_localite,
+                coeff_hauteur={k: float(v) for k, v in donnees["coeff_hauteur"].items()},
+                types_parcelle={k: float(v) for k, v in donnees["types_parcelle"].items()},
+                localites=tuple(departements or localites) + tuple(communes),
+                version=hashlib.sha256(contenu).hexdigest()[:12],
+                departements=departements,
+                communes=communes,
+            )
+        except (KeyError, AttributeError, TypeError) as exc:
+            raise ValueError(f"Fichier de tarifs invalide : {exc!r}") from exc
+        inconnues = set(config.communes.values()) - set(config.localites)
+        if inconnues:
+            raise ValueError(f"Fichier de tarifs invalide : communes inconnues {sorted(inconnues)}")
+        if config.prix_base_ml <= 0 or not config.coeff_hauteur or not config.localites:
+            raise ValueError("Fichier de tarifs invalide : prix, hauteurs ou localités manquants")
+        return config
+
+
+_configs = {}  # chemin -> (mtime_ns, taille, ConfigTarifs)
+_verrou = threading.Lock()
+
+
+def config_tarifs(chemin=None):
+    """Retourne la configuration courante du fichier de tarifs.
+
+    Le fichier n'est relu que si son mtime ou sa taille a changé, et
+    reparsé seulement si son contenu a changé. Un fichier devenu invalide
+    est ignoré : la dernière configuration valide reste en service.
+    """
+    chemin = chemin or CHEMIN_TARIFS
+    stat = os.stat(chemin)
+    cache = _configs.get(chemin)
+    if cache and cache[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cache[2]
+
+    with _verrou:
+        cache = _configs.get(chemin)
+        if cache and cache[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cache[2]
+        contenu = Path(chemin).read_bytes()
+        if cache and cache[2].version == hashlib.sha256(contenu).hexdigest()[:12]:
+            config = cache[2]
+        else:
+            try:
+                config = ConfigTarifs.depuis_json(contenu)
+            except ValueError:
+                if cache is None:
+                    raise
+                logger.exception("Tarifs %s invalides, version %s conservée", chemin, cache[2].version)
+                config = cache[2]
+            else:
+                if cache:
+                    logger.info("Tarifs rechargés : version %s -> %s", cache[2].version, config.version)
+        _configs[chemin] = (stat.st_mtime_ns, stat.st_size, config)
+        return config
+
+
+# -----------------------------
+# FONCTIONS
+# -----------------------------
+def _coefficients(valeurs, table):
+    """Traduit des libellés en coefficients (1.0 pour un libellé inconnu)"""
+    valeurs = np.asarray(valeurs, dtype=object)
+    if len(table) > 8:
+        # Une comparaison du tableau par libellé coûterait O(libellés × lignes)
+        return np.frompyfunc(table.get, 2, 1)(valeurs, 1.0).astype(np.float64)
+    coeffs = np.ones(valeurs.shape, dtype=np.float64)
+    for libelle, coeff in table.items():
+        coeffs[valeurs == libelle] = coeff
+    return coeffs
+
+
+def coefficients(hauteur, localite, type_parcelle, config=None):
+    """Retourne les coefficients (localité, hauteur, type) appliqués"""
+    config = config or config_tarifs()
+    return (
+        _coefficients(localite, config.coeff_localite),
+        _coefficients(hauteur, config.coeff_hauteur),
+        _coefficients(type_parcelle, config.types_parcelle),
+    )
+
+
+def estimer(perimetre, hauteur, localite, type_parcelle, config=None):
+    """Calcule les estimations en FCFA pour des tableaux de devis"""
+    config = config or config_tarifs()
+    coeff_localite, coeff_hauteur, coeff_type = coefficients(hauteur, localite, type_parcelle, config)
+    perimetre = np.asarray(perimetre, dtype=np.float64)
+    return config.prix_base_ml * perimetre * coeff_localite * coeff_hauteur * coeff_type
+
+
+def estimer_devis(perimetre, hauteur, localite, type_parcelle, config=None):
+    """Calcule l'estimation d'un devis unique"""
+    return float(estimer(perimetre, hauteur, localite, type_parcelle, config))
+
+
+def estimer_lot(donnees, config=None):
+    """Tarifie un DataFrame de parcelles.
+
+    `donnees` doit contenir les colonnes perimetre, hauteur, localite et
+    type_parcelle. Retourne une copie enrichie des coefficients appliqués,
+    de l'estimation et de la version des tarifs utilisée.
+    """
+    manquantes = [c for c in COLONNES if c not in donnees]
+    if manquantes:
+        raise KeyError(f"Colonnes manquantes : {', '.join(manquantes)}")
+
+    config = config or config_tarifs()
+    resultat = donnees.copy()
+    coeff_localite, coeff_hauteur, coeff_type = coefficients(
+        donnees["hauteur"].to_numpy(),
+        donnees["localite"].to_numpy(),
+        donnees["type_parcelle"].to_numpy(),
+        config,
+    )
+    perimetre = donnees["perimetre"].to_numpy(dtype=np.float64)
+    resultat["coeff_localite"] = coeff_localite
+    resultat["coeff_hauteur"] = coeff_hauteur
+    resultat["coeff_type"] = coeff_type
+    resultat["estimation"] = config.prix_base_ml * perimetre * coeff_localite * coeff_hauteur * coeff_type
+    resultat["version_tarifs"] = config.version
+    return resultat
+
+
+# -----------------------------
+# GRILLE PRÉCALCULÉE
+# -----------------------------
+class GrilleTarifs:
+    """Table de toutes les estimations proposées par l'application.
+
+    Les dimensions sont périmètre (entier, PERIMETRE_MIN à PERIMETRE_MAX),
+    hauteur, coefficient de localité et type de parcelle : un devis se
+    résout en une seule lecture d'index. Les localités de même coefficient
+    partagent une colonne, la taille de la grille ne dépend donc pas du
+    nombre de localités. Une grille correspond à une version des tarifs.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or config_tarifs()
+        self.version = self.config.version
+        self.hauteurs = list(self.config.coeff_hauteur)
+        self.localites = list(self.config.localites)
+        self.types = list(self.config.types_parcelle)
+        self._index_hauteur = {h: i for i, h in enumerate(self.hauteurs)}
+        self._index_type = {t: i for i, t in enumerate(self.types)}
+        colonnes = {}  # coefficient -> (colonne, localité représentative)
+        self._index_localite = {}
+        for localite in self.localites:
+            coeff = self.config.coeff_localite.get(localite, 1.0)
+            colonnes.setdefault(coeff, (len(colonnes), localite))
+            self._index_localite[localite] = colonnes[coeff][0]
+        representants = [localite for _, localite in colonnes.values()]
+
+        perimetres = np.arange(PERIMETRE_MIN, PERIMETRE_MAX + 1)
+        self.prix = estimer(
+            perimetres[:, None, None, None],
+            np.array(self.hauteurs, dtype=object)[None, :, None, None],
+            np.array(representants, dtype=object)[None, None, :, None],
+            np.array(self.types, dtype=object)[None, None, None, :],
+            self.config,
+        )
+        self.prix.setflags(write=False)
+
+    def _ligne(self, perimetre):
+        """Index d'un périmètre dans la grille (KeyError hors grille)"""
+        if perimetre != int(perimetre) or not PERIMETRE_MIN <= perimetre <= PERIMETRE_MAX:
+            raise KeyError(perimetre)
+        return int(perimetre) - PERIMETRE_MIN
+
+    def estimer(self, perimetre, hauteur, localite, type_parcelle):
+        """Estimation d'un devis ; hors grille, calcul direct par le moteur"""
+        try:
+            return float(self.prix[
+                self._ligne(perimetre),
+                self._index_hauteur[hauteur],
+                self._index_localite[localite],
+                self._index_type[type_parcelle],
+            ])
+        except KeyError:
+            return estimer_devis(perimetre, hauteur, localite, type_parcelle, self.config)
+
+    def comparaison(self, perimetre, localite):
+        """Estimations toutes hauteurs (lignes) × tous types (colonnes)"""
+        try:
+            return self.prix[self._ligne(perimetre), :, self._index_localite[localite], :]
+        except KeyError:
+            pass
+        return estimer(
+            perimetre,
+            np.array(self.hauteurs, dtype=object)[:, None],
+            localite,
+            np.array(self.types, dtype=object)[None, :],
+            self.config,
+        )
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+RACINE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RACINE))
+
+# Leads et analytique de l'application dans un répertoire temporaire. Fixé
+# dès le chargement : les modules lisent ces variables à leur import, qui
+# peut avoir lieu à la collecte des tests.
+_TEMPORAIRE = tempfile.TemporaryDirectory(prefix="cloture-tests-")
+os.environ.setdefault("LEADS_CLOTURE", str(Path(_TEMPORAIRE.name) / "leads.sqlite3"))
+os.environ.setdefault("ENTONNOIR_DOSSIER", str(Path(_TEMPORAIRE.name) / "analytique"))
+# Toutes les AppTest partagent un identifiant de session : sans limitation par
+# session, sinon les tests enchaînés épuisent son seau
+os.environ.setdefault("LIMITE_SESSION", "0")
+
+
+@pytest.fixture
+def app():
+    """Application chargée dans AppTest, à l'étape 1"""
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(str(RACINE / "app.py"), default_timeout=30).run()
+
+
+def aller_etape_2(app, parcelle=0, topo=0):
+    """Répond à l'étape 1 puis passe à l'étape 2"""
+    app.button(key=f"parcelle_{parcelle}").click().run()
+    if parcelle == 0:
+        app.button(key=f"topo_{topo}").click().run()
+    app.button(key="btn_step1_continue").click().run()
+    assert not app.exception, app.exception
+    return app
+
+
+def aller_etape_3(app, nom="Jean Dupont", telephone="01 23 45 67 89"):
+    """Passe à l'étape 3 et remplit les coordonnées"""
+    aller_etape_2(app)
+    app.button(key="btn_step2_continue").click().run()
+    app.text_input(key="nom_input").set_value(nom).run()
+    app.text_input(key="telephone_input").set_value(telephone).run()
+    assert not app.exception, app.exception
+    return app
+
+
+def executions_page(action):
+    """Exécutions complètes de la page provoquées par `action()`.
+
+    AppTest exécute tout le script à chaque interaction, même pour un widget
+    de fragment : une exécution supplémentaire signale le rerun complet
+    (`relancer()`) qui, dans le navigateur, met à jour les autres étapes.
+    """
+    from ressources import RERUNS
+
+    avant = RERUNS._valeurs.get(("app",), 0)
+    action()
+    return RERUNS._valeurs.get(("app",), 0) - avant
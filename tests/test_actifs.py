@@ -0,0 +1,22 @@
+import actifs
+
+
+def test_publication_supprime_les_anciennes_versions(monkeypatch, tmp_path):
+    sources, statique = tmp_path / "assets", tmp_path / "static"
+    sources.mkdir()
+    monkeypatch.setattr(actifs, "DOSSIER_SOURCES", sources)
+    monkeypatch.setattr(actifs, "DOSSIER_STATIQUE", statique)
+    (sources / "style.css").write_text("body { color: red; }")
+    (sources / "style.print.css").write_text("body { color: black; }")
+
+    actifs.url_actif.cache_clear()
+    ancienne = actifs.url_actif("style.css")
+    autre = actifs.url_actif("style.print.css")
+    (sources / "style.css").write_text("body { color: blue; }")
+    actifs.url_actif.cache_clear()
+    nouvelle = actifs.url_actif("style.css")
+    actifs.url_actif.cache_clear()
+
+    assert nouvelle != ancienne
+    assert sorted(f.name for f in statique.iterdir()) == sorted(
+        url.removeprefix(actifs.PREFIXE_URL) for url in (nouvelle, autre))
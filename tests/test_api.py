@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+
+import pytest
+
+import api
+import whatsapp
+
+DEVIS = {"perimetre": 70, "hauteur": "2.0m (standard)", "localite": "Cotonou", "type_parcelle": "Angle"}
+
+
+def appeler(route, objet):
+    return api.traiter("POST", route, json.dumps(objet).encode())
+
+
+def test_estimation():
+    statut, reponse = appeler("/estimation", DEVIS)
+    assert statut == 200
+    assert reponse["coefficients"] == {"localite": 1.05, "hauteur": 1.0, "type_parcelle": 1.1}
+
+
+@pytest.mark.parametrize("champ, valeur", [("hauteur", "9m"), ("type_parcelle", "Carré"),
+                                           ("hauteur", ["2.5m", "3.0m"]), ("type_parcelle", None)])
+def test_libelle_inconnu_refuse(champ, valeur):
+    statut, reponse = appeler("/estimation", {**DEVIS, champ: valeur})
+    assert statut == 400
+    assert "acceptées" in reponse["erreur"]
+    statut, _ = appeler("/estimations", {"devis": [DEVIS, {**DEVIS, champ: valeur}]})
+    assert statut == 400
+
+
+def test_localites_resolues_renvoyees():
+    statut, reponse = appeler("/estimations", {"devis": [{**DEVIS, "localite": "cotonou"},
+                                                         {**DEVIS, "localite": "calavi"}]})
+    assert statut == 200
+    assert reponse["localites"] == ["Cotonou", "Abomey-Calavi"]
+
+
+def test_nom_etranger_voisin_refuse():
+    # « Lagos » ressemble à Lalo mais n'est pas une localité tarifée
+    statut, reponse = appeler("/estimation", {**DEVIS, "localite": "Lagos"})
+    assert statut == 400
+    assert "Lagos" in reponse["erreur"]
+    statut, _ = appeler("/estimations", {"devis": [DEVIS, {**DEVIS, "localite": "Lagos"}]})
+    assert statut == 400
+
+
+def test_erreur_interne_renvoie_500(monkeypatch):
+    def panne(_corps):
+        raise RuntimeError("panne")
+
+    monkeypatch.setitem(api.ROUTES, ("GET", "/sante"), panne)
+    assert api.traiter("GET", "/sante", b"") == (500, {"erreur": "Erreur interne"})
+
+
+@pytest.mark.parametrize("longueur", ["abc", "-5", "1e3"])
+def test_content_length_invalide(longueur):
+    reponse = echanger(f"POST /estimation HTTP/1.1\r\nContent-Length: {longueur}\r\n\r\n".encode())
+    assert reponse.startswith(b"HTTP/1.1 400 ")
+
+
+def echanger(requete):
+    """Envoie une requête brute à un serveur api.py local, renvoie la réponse brute"""
+    async def dialoguer():
+        serveur = await asyncio.start_server(api.gerer_connexion, "127.0.0.1", 0)
+        port = serveur.sockets[0].getsockname()[1]
+        async with serveur:
+            lecteur, ecrivain = await asyncio.open_connection("127.0.0.1", port)
+            ecrivain.write(requete)
+            await ecrivain.drain()
+            reponse = await asyncio.wait_for(lecteur.read(), 5)
+            ecrivain.close()
+            return reponse
+
+    return asyncio.run(dialoguer())
+
+
+@pytest.fixture
+def webhook(monkeypatch, tmp_path):
+    """Webhook configuré, boîte d'envoi temporaire contenant le message wamid.1"""
+    monkeypatch.setattr(whatsapp, "SECRET_APP", "secret")
+    monkeypatch.setattr(whatsapp, "JETON_VERIFICATION", "jeton")
+    boite = tmp_path / "boite.sqlite3"
+    with whatsapp._connecter(boite) as connexion:
+        connexion.execute("INSERT INTO messages (cree_le, destinataire, texte, statut, prochain_essai, identifiant, maj_le)"
+                          " VALUES (0, '22901', 'texte', 'envoye', 0, 'wamid.1', 0)")
+    monkeypatch.setattr(api, "enregistrer_statuts", functools.partial(whatsapp.enregistrer_statuts, chemin=boite))
+    return boite
+
+
+def notification_statuts(statut):
+    return json.dumps({"entry": [{"changes": [{"value": {"statuses": [{"id": "wamid.1", "status": statut}]}}]}]}).encode()
+
+
+def poster_statuts(corps, signature):
+    return echanger(b"POST /whatsapp/statuts HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n"
+                    b"X-Hub-Signature-256: %s\r\n\r\n%s" % (len(corps), signature.encode(), corps))
+
+
+def test_webhook_signe_enregistre_le_statut(webhook):
+    corps = notification_statuts("delivered")
+    signature = "sha256=" + hmac.new(b"secret", corps, hashlib.sha256).hexdigest()
+    reponse = poster_statuts(corps, signature)
+    assert reponse.startswith(b"HTTP/1.1 200 ")
+    assert reponse.endswith(b'{"mis_a_jour":1}')
+
+
+@pytest.mark.parametrize("signature", ["", "sha256=" + "0" * 64, "secret"])
+def test_webhook_signature_invalide_refuse(webhook, signature):
+    assert poster_statuts(notification_statuts("read"), signature).startswith(b"HTTP/1.1 403 ")
+    with whatsapp._connecter(webhook) as connexion:
+        assert connexion.execute("SELECT statut FROM messages").fetchone() == ("envoye",)
+
+
+def test_webhook_sans_secret_refuse(webhook, monkeypatch):
+    monkeypatch.setattr(whatsapp, "SECRET_APP", "")
+    corps = notification_statuts("read")
+    assert poster_statuts(corps, "sha256=" + hmac.new(b"", corps, hashlib.sha256).hexdigest()).startswith(b"HTTP/1.1 403 ")
+
+
+def test_abonnement_webhook(webhook):
+    parametres = {"hub.mode": "subscribe", "hub.verify_token": "jeton", "hub.challenge": "1158201444"}
+    assert api.traiter("GET", "/whatsapp/statuts", b"", {}, parametres) == (200, "1158201444")
+    statut, _ = api.traiter("GET", "/whatsapp/statuts", b"", {}, {**parametres, "hub.verify_token": "autre"})
+    assert statut == 403
+    reponse = echanger(b"GET /whatsapp/statuts?hub.mode=subscribe&hub.verify_token=jeton&hub.challenge=42 HTTP/1.1\r\n"
+                       b"Connection: close\r\n\r\n")
+    assert reponse.startswith(b"HTTP/1.1 200 ") and reponse.endswith(b"\r\n\r\n42")
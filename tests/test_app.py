@@ -0,0 +1,102 @@
+from conftest import aller_etape_2, aller_etape_3, executions_page
+
+LEVE_CSV = b"x,y\n0,0\n30,0\n30,20\n0,20\n"
+
+
+def test_leve_importe_a_l_etape_2_relance_la_page(app):
+    aller_etape_2(app)
+    importer = lambda: app.file_uploader(key="leve_fichier").set_value(("leve.csv", LEVE_CSV, "text/csv")).run()  # noqa: E731
+    assert executions_page(importer) == 2
+    assert not app.exception, app.exception
+    assert app.session_state.devis.perimetre == 100
+    assert app.number_input(key="perimetre_input").value == 100
+    assert any("Levé topo : 100.00 ml" in m.value for m in app.markdown)
+
+
+def test_modification_de_l_etape_2_ne_relance_que_le_fragment(app):
+    aller_etape_2(app)
+    assert executions_page(lambda: app.button(key="hauteur_plus").click().run()) == 1
+
+
+def test_changement_de_leve_topo_a_l_etape_2_met_a_jour_la_fourchette(app):
+    aller_etape_2(app, topo=0)  # levé disponible
+    estimation = app.session_state.devis.estimation
+    carte = next(m.value for m in app.markdown if "Fourchette probable" in m.value)
+    assert executions_page(lambda: app.button(key="topo_2").click().run()) == 2  # sans levé
+    assert not app.exception, app.exception
+    nouvelle = next(m.value for m in app.markdown if "Fourchette probable" in m.value)
+    assert nouvelle != carte
+    assert app.session_state.devis.estimation == estimation  # seule la fourchette dépend du levé
+
+
+def projection_affichee(app):
+    return any("polyline" in m.value for m in app.markdown)
+
+
+def test_projection_suit_la_parcelle_choisie_a_l_etape_2(app, monkeypatch):
+    import indexation
+
+    monkeypatch.setattr(indexation, "CHEMIN_INDICES", indexation.CHEMIN_INDICES.with_name("indices_prix.exemple.json"))
+    aller_etape_2(app, parcelle=0)
+    assert not projection_affichee(app)
+    assert executions_page(lambda: app.button(key="parcelle_2").click().run()) == 2  # projet futur
+    assert not app.exception, app.exception
+    assert projection_affichee(app)
+
+
+def test_pas_de_projection_sans_fichier_d_indices(app, monkeypatch, tmp_path):
+    import indexation
+
+    monkeypatch.setattr(indexation, "CHEMIN_INDICES", tmp_path / "absent.json")
+    aller_etape_2(app, parcelle=2)
+    assert not app.exception, app.exception
+    assert not projection_affichee(app)
+
+
+def test_lien_whatsapp_compte_une_fois_par_session(app):
+    from ressources import ENTONNOIR
+
+    avant = ENTONNOIR._valeurs.get(("etape3_whatsapp",), 0)
+    aller_etape_3(app)
+    for nom in ("Jean Dupond", "Jean Dupont"):
+        app.text_input(key="nom_input").set_value(nom).run()
+    app.text_input(key="email_input").set_value("jean@exemple.com").run()
+    assert ENTONNOIR._valeurs[("etape3_whatsapp",)] - avant == 1
+
+
+def test_corrections_de_l_etape_3_mettent_a_jour_un_seul_lead(app):
+    import sqlite3
+    import time
+
+    import leads
+
+    aller_etape_3(app)
+    app.text_input(key="nom_input").set_value("Jean Dupond").run()
+    session = app.session_state.id_lead
+    fin = time.monotonic() + 5
+    while True:
+        with sqlite3.connect(leads.CHEMIN_LEADS) as connexion:
+            lignes = connexion.execute("SELECT nom FROM leads WHERE session = ?", (session,)).fetchall()
+        if lignes == [("Jean Dupond",)] or time.monotonic() > fin:
+            break
+        time.sleep(0.05)
+    assert lignes == [("Jean Dupond",)]
+
+
+def test_rafale_de_hauteurs_reporte_le_recalcul(app):
+    import time
+
+    def carte_affichee():
+        return any("Fourchette probable" in m.value for m in app.markdown)
+
+    aller_etape_2(app)
+    app.button(key="hauteur_plus").click().run()
+    assert carte_affichee()
+    app.button(key="hauteur_plus").click().run()  # dans la fenêtre de fusion
+    assert not app.exception, app.exception
+    assert not carte_affichee() and "Mise à jour" in app.info[0].value
+    assert app.session_state.devis.hauteur == "3.0m"
+    time.sleep(app.session_state.recalcul_le - time.monotonic() + 0.05)
+    app.run()
+    assert carte_affichee() and not app.info
+
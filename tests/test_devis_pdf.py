@@ -0,0 +1,21 @@
+from devis_pdf import CachePDF, donnees_devis, rendre_pdf
+
+
+def devis(perimetre):
+    return donnees_devis({"localite": "Cotonou", "type_parcelle": "Angle", "perimetre": perimetre,
+                          "hauteur": "2.0m (standard)", "estimation": perimetre * 60_000})
+
+
+def test_lot_plus_grand_que_le_cache(tmp_path):
+    taille_pdf = len(rendre_pdf(devis(50)))
+    cache = CachePDF(tmp_path, taille_max=3 * taille_pdf)
+    deja_en_cache = [devis(perimetre) for perimetre in (50, 51)]
+    for donnees in deja_en_cache:
+        cache.obtenir(donnees)
+    lot = deja_en_cache + [devis(perimetre) for perimetre in range(60, 66)] + deja_en_cache[:1]
+    chemins = cache.generer_lot(lot, workers=1)
+    assert len(chemins) == len(lot)
+    assert all(chemin.read_bytes().startswith(b"%PDF") for chemin in chemins)
+    # Hors lot, le cache revient sous sa taille maximale au stockage suivant
+    cache.obtenir(devis(99))
+    assert sum(fichier.stat().st_size for fichier in tmp_path.rglob("*.pdf")) <= cache.taille_max
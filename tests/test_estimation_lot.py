@@ -0,0 +1,21 @@
+import pyarrow.parquet as pq
+
+from estimation_lot import estimer_fichier
+
+ENTETE = "nom,telephone,perimetre,hauteur,localite,type_parcelle,note\n"
+
+
+def test_sortie_parquet_blocs_aux_types_differents(tmp_path):
+    # Un bloc par ligne : la note est un entier, vide, puis du texte ; le périmètre entier puis décimal
+    (tmp_path / "parcelles.csv").write_text(
+        ENTETE
+        + "A,0102030405,70,2.0m (standard),Cotonou,Angle,3\n"
+        + "B,01 02 03 04 05,70.5,2.0m (standard),Cotonou,Angle,\n"
+        + "C,0102030405,80,2.0m (standard),Cotonou,Angle,à rappeler\n",
+        encoding="utf-8")
+    assert estimer_fichier(tmp_path / "parcelles.csv", tmp_path / "estimations.parquet", taille_bloc=1) == 3
+    table = pq.read_table(tmp_path / "estimations.parquet")
+    assert table.column("note").to_pylist() == ["3", None, "à rappeler"]
+    assert table.column("telephone").to_pylist()[0] == "0102030405"
+    assert table.column("perimetre").to_pylist() == [70.0, 70.5, 80.0]
+    assert str(table.schema.field("estimation").type) == "double"
@@ -0,0 +1,56 @@
+import logging
+import queue
+import sqlite3
+
+import leads
+
+LEAD = {"nom": "Jean Dupont", "telephone": "01 23 45 67 89", "estimation": 4525524.85}
+
+
+def lignes(chemin):
+    with sqlite3.connect(chemin) as connexion:
+        return connexion.execute("SELECT nom, telephone, session FROM leads ORDER BY id").fetchall()
+
+
+def test_un_lead_par_session(tmp_path):
+    ecrivain = leads.EcrivainLeads(tmp_path / "leads.sqlite3", delai_lot=0.01)
+    assert ecrivain.enregistrer(LEAD, "s1")
+    assert ecrivain.enregistrer({**LEAD, "nom": "Jean Dupond"}, "s1")
+    assert ecrivain.enregistrer(LEAD, "s2")
+    assert ecrivain.enregistrer(LEAD) and ecrivain.enregistrer(LEAD)  # sans session : une ligne chacun
+    ecrivain.fermer()
+    assert lignes(tmp_path / "leads.sqlite3") == [
+        ("Jean Dupond", "01 23 45 67 89", "s1"), ("Jean Dupont", "01 23 45 67 89", "s2"),
+        ("Jean Dupont", "01 23 45 67 89", None), ("Jean Dupont", "01 23 45 67 89", None)]
+
+
+def test_base_sans_colonne_session_migree(tmp_path):
+    chemin = tmp_path / "leads.sqlite3"
+    with sqlite3.connect(chemin) as connexion:
+        connexion.execute(f"CREATE TABLE leads (id INTEGER PRIMARY KEY, cree_le REAL NOT NULL, "
+                          f"{', '.join(leads.CHAMPS)}, extra TEXT)")
+        connexion.execute("INSERT INTO leads (cree_le, nom, telephone) VALUES (0, 'Ancien', '0100')")
+    ecrivain = leads.EcrivainLeads(chemin, delai_lot=0.01)
+    ecrivain.enregistrer(LEAD, "s1")
+    ecrivain.enregistrer(LEAD, "s1")
+    ecrivain.fermer()
+    assert lignes(chemin) == [("Ancien", "0100", None), ("Jean Dupont", "01 23 45 67 89", "s1")]
+
+
+def test_base_inutilisable_refuse_les_leads(tmp_path, caplog):
+    with caplog.at_level(logging.ERROR, logger="leads"):
+        ecrivain = leads.EcrivainLeads(tmp_path)  # un répertoire : connexion impossible
+        ecrivain._thread.join(5)
+        assert not ecrivain.enregistrer(LEAD)
+    assert isinstance(ecrivain.erreur, sqlite3.Error)
+    assert "inutilisable" in caplog.text
+    assert ecrivain.file.empty() and ecrivain.rejetes == 1
+
+
+def test_file_pleine_sans_donnees_personnelles(tmp_path, caplog):
+    ecrivain = leads.EcrivainLeads(tmp_path / "leads.sqlite3")
+    ecrivain.file = queue.Queue(maxsize=1)  # le thread attend sur l'ancienne file
+    ecrivain.file.put_nowait(None)
+    with caplog.at_level(logging.WARNING, logger="leads"):
+        assert not ecrivain.enregistrer(LEAD)
+    assert "pleine" in caplog.text and LEAD["telephone"] not in caplog.text
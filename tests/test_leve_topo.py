@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from leve_topo import lire_points, mesurer_contour
+
+
+def rectangle_bruite(largeur=150.0, hauteur=100.0, points=20_000, bruit=0.01, graine=0):
+    """Contour d'un rectangle échantillonné densément, avec un bruit GPS gaussien"""
+    abscisses = np.linspace(0, 2 * (largeur + hauteur), points, endpoint=False)
+    sommets = np.array([[0, 0], [largeur, 0], [largeur, hauteur], [0, hauteur], [0, 0]], dtype=float)
+    cumul = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(sommets, axis=0).T))])
+    contour = np.column_stack([np.interp(abscisses, cumul, sommets[:, 0]), np.interp(abscisses, cumul, sommets[:, 1])])
+    return contour + np.random.default_rng(graine).normal(0, bruit, contour.shape)
+
+
+def test_bruit_dense_n_allonge_pas_le_perimetre():
+    leve = mesurer_contour(rectangle_bruite())
+    assert leve.perimetre == pytest.approx(500, rel=0.005)
+    assert leve.coins == 4
+    assert sorted(leve.cotes) == pytest.approx([100, 100, 150, 150], abs=0.5)
+
+
+def test_leve_peu_dense_mesure_entre_points():
+    leve = mesurer_contour([(0, 0), (30, 0), (30, 20), (0, 20)])
+    assert leve.perimetre == pytest.approx(100)
+    assert leve.coins == 4
+
+
+@pytest.mark.parametrize("contenu", [b"[1, 2]", b'"texte"', b'{"type": "Feature", "geometry": [1]}'])
+def test_geojson_mal_forme_leve_valueerror(contenu):
+    with pytest.raises(ValueError):
+        lire_points(contenu, "leve.geojson")
@@ -0,0 +1,23 @@
+from limitation import LimiteurReruns
+
+
+def test_seau_vide_refuse_sans_attendre():
+    limiteur = LimiteurReruns(debit_session=1.0, rafale_session=3, debit_ip=0)
+    assert [limiteur.controler("s1") for _ in range(4)] == [None, None, None, "session"]
+    assert limiteur.controler("s2") is None  # seau propre à chaque session
+
+
+def test_portee_ip_refuse_et_rend_le_jeton_de_session():
+    limiteur = LimiteurReruns(debit_session=1.0, rafale_session=2, debit_ip=1.0, rafale_ip=1)
+    assert limiteur.controler("s1", "10.0.0.1") is None
+    assert limiteur.controler("s2", "10.0.0.1") == "ip"
+    assert limiteur.controler("s1", None) is None  # sans IP connue, seule la session compte
+    assert limiteur.controler("s1", None) == "session"
+
+
+def test_rafale():
+    limiteur = LimiteurReruns(fusion=0.3)
+    assert not limiteur.en_rafale(float("-inf"), 10.0)
+    assert limiteur.en_rafale(10.0, 10.2)
+    assert not limiteur.en_rafale(10.0, 10.3)
+    assert not LimiteurReruns(fusion=0).en_rafale(10.0, 10.0)
@@ -0,0 +1,38 @@
+import pytest
+
+import metriques
+
+
+def test_valeurs_etiquettes_echappees():
+    registre = metriques.Registre()
+    registre.compteur("essais_total", "Essais", ("localite",)).inc(localite='Dos "Bo"\\\nX')
+    assert 'essais_total{localite="Dos \\"Bo\\"\\\\\\nX"} 1' in registre.exporter().splitlines()
+
+
+class Arret(BaseException):
+    pass
+
+
+def test_export_fichier_survit_a_une_erreur(monkeypatch, tmp_path):
+    registre = metriques.Registre()
+    registre.compteur("essais_total", "Essais").inc()
+    pannes = iter([RuntimeError("collecteur en panne")])
+
+    def collecteur():
+        erreur = next(pannes, None)
+        if erreur:
+            raise erreur
+
+    registre.collecteur(collecteur)
+    tours = []
+
+    def dormir(_intervalle):
+        tours.append(_intervalle)
+        if len(tours) == 2:
+            raise Arret
+
+    monkeypatch.setattr(metriques, "REGISTRE", registre)
+    monkeypatch.setattr(metriques.time, "sleep", dormir)
+    with pytest.raises(Arret):
+        metriques._ecrire_fichier(tmp_path / "cloture.prom", 15.0)
+    assert "essais_total 1" in (tmp_path / "cloture.prom").read_text(encoding="utf-8")
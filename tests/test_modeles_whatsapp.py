@@ -0,0 +1,20 @@
+from urllib.parse import quote
+
+import pytest
+
+import modeles_whatsapp
+from devis import Devis
+
+
+@pytest.mark.parametrize("projet, demande", [
+    ("Maison individuelle", "Intéressé par devis détaillé des matériaux"),
+    ("Pas de projet immédiat", "Information seulement"),
+])
+def test_demande_du_message_selon_le_projet(projet, demande):
+    devis = Devis(nom="Jean", telephone="0123", projet=projet, estimation=4525524.85, version_tarifs="a9af2d0e684d")
+    valeurs = {**dict.fromkeys(modeles_whatsapp.modele().noms, ""), **devis.champs(("nom", "telephone", "projet")),
+               "demande": devis.libelle_demande, "estimation": devis.estimation, "p10": 4e6, "p90": 5e6}
+    modele = modeles_whatsapp.modele(projet=projet)
+    message = modele.rendre(valeurs)
+    assert message.split("*Demande*\n")[1].startswith(demande + "\n")
+    assert modele.encoder(valeurs) == quote(message)
@@ -0,0 +1,116 @@
+import sqlite3
+import sys
+import time
+
+import pytest
+
+import whatsapp
+from conftest import RACINE
+
+sys.path.insert(0, str(RACINE / "benchmarks"))
+
+from charge_whatsapp import ServeurSimule, demarrer_serveur  # noqa: E402
+
+FINAUX = ("envoye", "echec")
+
+
+@pytest.fixture
+def envoyer(tmp_path):
+    """Démarre une boîte d'envoi face au serveur simulé ; (serveur, boîte)"""
+    boites = []
+
+    def demarrer(scenario=(), retry_after=1, **options):
+        serveur = ServeurSimule(latence=0.0, taux_429=0.0, taux_500=0.0, scenario=scenario, retry_after=retry_after)
+        port = demarrer_serveur(serveur)
+        options = {"debit": 1000, "rafale": 1000, "backoff_base": 0.05, **options}
+        boite = whatsapp.BoiteEnvoi(f"http://127.0.0.1:{port}/messages", "jeton-test",
+                                    tmp_path / f"boite{len(boites)}.sqlite3", **options)
+        boites.append(boite)
+        return serveur, boite
+
+    yield demarrer
+    for boite in boites:
+        boite.fermer()
+
+
+def attendre(boite, id_message, delai=10.0):
+    fin = time.monotonic() + delai
+    while (statut := boite.statut(id_message)).statut not in FINAUX:
+        assert time.monotonic() < fin, statut
+        time.sleep(0.01)
+    return statut
+
+
+def ecarts(serveur):
+    instants = [instant for instant, _ in serveur.requetes]
+    return [b - a for a, b in zip(instants, instants[1:])]
+
+
+def test_envoi_reussi(envoyer):
+    serveur, boite = envoyer()
+    id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+    assert attendre(boite, id_message) == ("envoye", 1, None)
+    assert serveur.requetes[0][1]["authorization"] == "Bearer jeton-test"
+    with sqlite3.connect(boite.chemin) as connexion:
+        assert connexion.execute("SELECT destinataire, identifiant FROM messages").fetchone() == (
+            "2290197000001", "wamid.1")
+
+
+def test_429_respecte_retry_after(envoyer):
+    serveur, boite = envoyer(scenario=[429], retry_after=1)
+    id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+    assert attendre(boite, id_message) == ("envoye", 2, None)
+    assert ecarts(serveur)[0] >= 0.95  # et non le backoff de 0.05 s
+
+
+def test_5xx_relance_avec_backoff(envoyer):
+    serveur, boite = envoyer(scenario=[500, 503, 502], backoff_base=0.1)
+    id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+    assert attendre(boite, id_message).statut == "envoye"
+    assert len(serveur.requetes) == 4
+    # base × 2^(n-1), gigue entre 50 et 100 %
+    for rang, ecart in enumerate(ecarts(serveur)):
+        assert ecart >= 0.1 * 2 ** rang * 0.5 - 0.01
+
+
+def test_4xx_abandonne_sans_relance(envoyer):
+    serveur, boite = envoyer(scenario=[400])
+    id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+    statut = attendre(boite, id_message)
+    assert (statut.statut, statut.tentatives) == ("echec", 1) and statut.erreur.startswith("HTTP 400")
+    time.sleep(0.2)
+    assert len(serveur.requetes) == 1
+
+
+def test_max_tentatives(envoyer):
+    serveur, boite = envoyer(scenario=[500] * 10, max_tentatives=3, backoff_base=0.01)
+    id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+    assert attendre(boite, id_message) == ("echec", 3, "HTTP 500")
+    time.sleep(0.2)
+    assert len(serveur.requetes) == 3
+
+
+def test_erreur_reseau_relancee(tmp_path):
+    boite = whatsapp.BoiteEnvoi("http://127.0.0.1:9/messages", chemin=tmp_path / "boite.sqlite3",
+                                max_tentatives=2, backoff_base=0.01)
+    try:
+        id_message = boite.demarrer().deposer("01 97 00 00 01", "Bonjour")
+        statut = attendre(boite, id_message)
+        assert (statut.statut, statut.tentatives) == ("echec", 2) and statut.erreur
+    finally:
+        boite.fermer()
+
+
+def test_reprise_des_messages_en_cours_abandonnes(envoyer):
+    serveur, boite = envoyer()
+    maintenant = time.time()
+    with boite._verrou:
+        # Réclamé par un worker arrêté brutalement il y a longtemps, et un autre en cours d'envoi
+        boite._connexion.executemany(
+            "INSERT INTO messages (id, cree_le, destinataire, texte, statut, prochain_essai, maj_le) "
+            "VALUES (?, ?, '22901', 'texte', 'en_cours', ?, ?)",
+            [(1, maintenant, maintenant, maintenant - 3 * whatsapp.DELAI_REQUETE), (2, maintenant, maintenant, maintenant)])
+    boite.demarrer()
+    assert attendre(boite, 1).statut == "envoye"
+    assert boite.statut(2).statut == "en_cours"
+    assert len(serveur.requetes) == 1
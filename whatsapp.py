@@ -0,0 +1,409 @@
+"""Envoi des estimations par WhatsApp Business, côté serveur (optionnel).
+
+`deposer()` enregistre le message dans une boîte d'envoi SQLite persistante
+et rend la main : l'interface n'attend jamais le réseau. Un worker asyncio
+(thread dédié) envoie les messages dus à l'API HTTP de type WhatsApp Cloud
+(`POST {"messaging_product": "whatsapp", "to": ..., "type": "text", ...}`) :
+- au plus `concurrence` requêtes en vol, faites par urllib3 (pool de
+  connexions réutilisées) dans autant de threads ;
+- débit limité par un seau à jetons (`debit` messages/s, rafale `rafale`) ;
+- erreurs réseau, 429 et 5xx relancées avec backoff exponentiel et gigue
+  (Retry-After respecté), jusqu'à `MAX_TENTATIVES` ; autres 4xx : échec ;
+- statut suivi par message : en_attente, en_cours, envoye, puis remis / lu
+  (webhook de statuts, voir `enregistrer_statuts()`), ou echec.
+Un message resté `en_cours` plus de 2 × DELAI_REQUETE (arrêt brutal d'un
+worker) est repris. Plusieurs processus peuvent partager la même boîte :
+chaque message est réclamé dans une transaction, le débit est par processus.
+
+Activé si WHATSAPP_API_URL est défini (jeton : WHATSAPP_JETON) ; la boîte
+est WHATSAPP_BOITE (par défaut `whatsapp.sqlite3` à côté de l'application).
+Le webhook de statuts (api.py) vérifie la signature X-Hub-Signature-256
+avec le secret de l'application WHATSAPP_SECRET_APP et répond à
+l'abonnement avec le jeton WHATSAPP_JETON_VERIFICATION ; sans eux, il
+refuse toute requête.
+Pour essayer sans compte WhatsApp, voir le serveur simulé de
+`benchmarks/charge_whatsapp.py`.
+"""
+import asyncio
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import urllib3
+
+from metriques import REGISTRE
+
+logger = logging.getLogger(__name__)
+
+URL_API = os.environ.get("WHATSAPP_API_URL")
+JETON_API = os.environ.get("WHATSAPP_JETON", "")
+SECRET_APP = os.environ.get("WHATSAPP_SECRET_APP", "")
+JETON_VERIFICATION = os.environ.get("WHATSAPP_JETON_VERIFICATION", "")
+CHEMIN_BOITE = Path(os.environ.get("WHATSAPP_BOITE", Path(__file__).resolve().parent / "whatsapp.sqlite3"))
+ACTIF = bool(URL_API)
+
+INDICATIF = "229"
+CONCURRENCE = 8
+DEBIT = 20.0  # messages par seconde
+RAFALE = 40
+MAX_TENTATIVES = 6
+BACKOFF_BASE = 1.0  # secondes, doublé à chaque tentative
+BACKOFF_MAX = 300.0
+DELAI_REQUETE = 15.0
+
+FINAUX = ("envoye", "remis", "lu", "echec")
+STATUTS_WEBHOOK = {"sent": "envoye", "delivered": "remis", "read": "lu", "failed": "echec"}
+# Un statut ne recule pas : « lu » arrivé avant « remis » est conservé
+RANGS = {"envoye": 1, "remis": 2, "echec": 2, "lu": 3}
+RANG_SQL = "CASE statut " + " ".join(f"WHEN '{s}' THEN {r}" for s, r in RANGS.items()) + " ELSE 0 END"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    cree_le REAL NOT NULL,
+    destinataire TEXT NOT NULL,
+    texte TEXT NOT NULL,
+    statut TEXT NOT NULL DEFAULT 'en_attente',
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    prochain_essai REAL NOT NULL,
+    identifiant TEXT,
+    erreur TEXT,
+    maj_le REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_dus ON messages (statut, prochain_essai);
+CREATE INDEX IF NOT EXISTS messages_identifiant ON messages (identifiant);
+"""
+
+Statut = namedtuple("Statut", "statut tentatives erreur")
+
+ENVOIS = REGISTRE.compteur("cloture_whatsapp_envois_total", "Tentatives d'envoi WhatsApp par résultat", ("resultat",))
+DUREE_ENVOI = REGISTRE.histogramme("cloture_whatsapp_duree_secondes", "Durée des requêtes d'envoi WhatsApp")
+
+
+def numero_international(telephone, indicatif=INDICATIF):
+    """Numéro au format international sans « + » (ValueError s'il est invalide)"""
+    chiffres = re.sub(r"\D", "", str(telephone))
+    if chiffres.startswith("00"):
+        chiffres = chiffres[2:]
+    if len(chiffres) == 8:
+        chiffres = "01" + chiffres  # ancien numéro béninois à 8 chiffres
+    if len(chiffres) == 10 and chiffres.startswith("0"):
+        chiffres = indicatif + chiffres
+    if not 11 <= len(chiffres) <= 15:
+        raise ValueError(f"Numéro WhatsApp invalide : {telephone!r}")
+    return chiffres
+
+
+def _connecter(chemin):
+    connexion = sqlite3.connect(str(chemin), timeout=5.0, check_same_thread=False, isolation_level=None)
+    connexion.execute("PRAGMA journal_mode=WAL")
+    connexion.execute("PRAGMA synchronous=NORMAL")
+    connexion.executescript(SCHEMA)
+    return connexion
+
+
+def signature_valide(corps, signature, secret=None):
+    """Vérifie l'en-tête X-Hub-Signature-256 (« sha256=<hex> ») d'un corps de webhook"""
+    secret = SECRET_APP if secret is None else secret
+    if not secret or not signature:
+        return False
+    attendue = "sha256=" + hmac.new(secret.encode(), corps, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(attendue, signature)
+
+
+def jeton_verification_valide(jeton, attendu=None):
+    """Jeton `hub.verify_token` de l'abonnement au webhook"""
+    attendu = JETON_VERIFICATION if attendu is None else attendu
+    return bool(attendu) and hmac.compare_digest(str(jeton), attendu)
+
+
+_connexions_statuts = {}  # chemin -> connexion réutilisée par enregistrer_statuts
+_verrou_statuts = threading.Lock()
+
+
+def enregistrer_statuts(notification, chemin=CHEMIN_BOITE):
+    """Applique une notification de statuts (webhook WhatsApp Cloud) ; nombre de messages mis à jour.
+
+    Bloquant (SQLite) : à appeler hors de la boucle d'événements. La
+    connexion est ouverte au premier appel puis réutilisée.
+    """
+    statuts = [
+        (STATUTS_WEBHOOK[statut["status"]], time.time(), statut["id"], RANGS[STATUTS_WEBHOOK[statut["status"]]])
+        for entree in notification.get("entry", [])
+        for changement in entree.get("changes", [])
+        for statut in changement.get("value", {}).get("statuses", [])
+        if statut.get("status") in STATUTS_WEBHOOK and statut.get("id")
+    ]
+    if not statuts:
+        return 0
+    with _verrou_statuts:
+        connexion = _connexions_statuts.get(chemin)
+        if connexion is None:
+            connexion = _connexions_statuts[chemin] = _connecter(chemin)
+        return connexion.executemany(
+            f"UPDATE messages SET statut = ?, maj_le = ? WHERE identifiant = ? AND {RANG_SQL} < ?", statuts
+        ).rowcount
+
+
+# -----------------------------
+# LIMITATION DE DÉBIT
+# -----------------------------
+class SeauJetons:
+    """Seau à jetons asyncio : `debit` jetons/s, au plus `capacite` d'avance.
+
+    Chaque appel réserve son jeton immédiatement (le solde peut devenir
+    négatif) puis attend le temps de le rembourser : les appelants sont
+    servis dans l'ordre, sans verrou ni réveil inutile.
+    """
+
+    def __init__(self, debit, capacite):
+        self.debit = debit
+        self.capacite = capacite
+        self._jetons = float(capacite)
+        self._maj = time.monotonic()
+
+    async def acquerir(self):
+        maintenant = time.monotonic()
+        self._jetons = min(self.capacite, self._jetons + (maintenant - self._maj) * self.debit)
+        self._maj = maintenant
+        self._jetons -= 1
+        if self._jetons < 0:
+            await asyncio.sleep(-self._jetons / self.debit)
+
+
+# -----------------------------
+# CLIENT HTTP
+# -----------------------------
+class ErreurEnvoi(Exception):
+    """Échec d'envoi ; `relancer` indique si une nouvelle tentative a un sens"""
+
+    def __init__(self, message, relancer=True, attente=None):
+        super().__init__(message)
+        self.relancer = relancer
+        self.attente = attente
+
+
+def poster_json(http, url, objet, jeton="", delai=DELAI_REQUETE):
+    """POST JSON bloquant via le pool urllib3 `http`, sans relance ; (statut, entêtes en minuscules, corps)"""
+    entetes = {"Content-Type": "application/json"}
+    if jeton:
+        entetes["Authorization"] = f"Bearer {jeton}"
+    reponse = http.request("POST", url, body=json.dumps(objet, ensure_ascii=False).encode(), headers=entetes,
+                           timeout=urllib3.Timeout(total=delai), retries=False)
+    return reponse.status, {nom.lower(): valeur for nom, valeur in reponse.headers.items()}, reponse.data
+
+
+# -----------------------------
+# BOÎTE D'ENVOI
+# -----------------------------
+class BoiteEnvoi:
+    """Boîte d'envoi persistante et worker asyncio d'envoi des messages"""
+
+    def __init__(self, url, jeton="", chemin=CHEMIN_BOITE, concurrence=CONCURRENCE, debit=DEBIT,
+                 rafale=RAFALE, max_tentatives=MAX_TENTATIVES, backoff_base=BACKOFF_BASE):
+        self.url = url
+        self.jeton = jeton
+        self.chemin = str(chemin)
+        self.concurrence = concurrence
+        self.max_tentatives = max_tentatives
+        self.backoff_base = backoff_base
+        self.seau = SeauJetons(debit, rafale)
+        # Une connexion et un thread par requête en vol
+        self._http = urllib3.PoolManager(maxsize=concurrence, block=True)
+        self._executeur = ThreadPoolExecutor(max_workers=concurrence, thread_name_prefix="requete-whatsapp")
+        self._connexion = _connecter(self.chemin)
+        self._verrou = threading.Lock()
+        self._boucle = None
+        self._reveil = None
+        self._en_vol = set()
+        self._arret = False
+        self._thread = None
+
+    def demarrer(self):
+        """Lance le worker dans un thread dédié ; retourne la boîte"""
+        pret = threading.Event()
+        self._thread = threading.Thread(target=self._executer, args=(pret,), name="envoi-whatsapp", daemon=True)
+        self._thread.start()
+        pret.wait()
+        return self
+
+    def deposer(self, telephone, texte):
+        """Met un message en file (persisté) et retourne son identifiant"""
+        maintenant = time.time()
+        with self._verrou:
+            curseur = self._connexion.execute(
+                "INSERT INTO messages (cree_le, destinataire, texte, prochain_essai, maj_le) VALUES (?, ?, ?, ?, ?)",
+                (maintenant, numero_international(telephone), texte, maintenant, maintenant),
+            )
+        self._reveiller()
+        return curseur.lastrowid
+
+    def statut(self, id_message):
+        """Statut, nombre de tentatives et dernière erreur d'un message (None s'il est inconnu)"""
+        with self._verrou:
+            ligne = self._connexion.execute(
+                "SELECT statut, tentatives, erreur FROM messages WHERE id = ?", (id_message,)
+            ).fetchone()
+        return Statut(*ligne) if ligne else None
+
+    def compter(self):
+        """Nombre de messages par statut"""
+        with self._verrou:
+            return dict(self._connexion.execute("SELECT statut, COUNT(*) FROM messages GROUP BY statut"))
+
+    def fermer(self, delai=10.0):
+        """Termine les envois en vol puis arrête le worker"""
+        if self._thread and self._thread.is_alive():
+            self._arret = True
+            self._reveiller()
+            self._thread.join(delai)
+        with self._verrou:
+            self._connexion.close()
+
+    # Worker asyncio -------------------------------------------------
+    def _reveiller(self):
+        if self._boucle is not None:
+            self._boucle.call_soon_threadsafe(self._reveil.set)
+
+    def _executer(self, pret):
+        self._boucle = asyncio.new_event_loop()
+        self._reveil = asyncio.Event()
+        pret.set()
+        try:
+            self._boucle.run_until_complete(self._travailler())
+        finally:
+            self._boucle.close()
+            self._executeur.shutdown()
+            self._http.clear()
+
+    def _reclamer(self, nombre):
+        """Passe jusqu'à `nombre` messages dus en `en_cours` ; (messages, prochaine échéance)"""
+        maintenant = time.time()
+        with self._verrou:
+            self._connexion.execute("BEGIN IMMEDIATE")
+            try:
+                lignes = self._connexion.execute(
+                    "SELECT id, destinataire, texte, tentatives FROM messages "
+                    "WHERE (statut = 'en_attente' AND prochain_essai <= ?) OR (statut = 'en_cours' AND maj_le < ?) "
+                    "ORDER BY prochain_essai LIMIT ?",
+                    (maintenant, maintenant - 2 * DELAI_REQUETE, nombre),
+                ).fetchall()
+                self._connexion.executemany(
+                    "UPDATE messages SET statut = 'en_cours', maj_le = ? WHERE id = ?",
+                    [(maintenant, ligne[0]) for ligne in lignes],
+                )
+                suivant = self._connexion.execute(
+                    "SELECT MIN(prochain_essai) FROM messages WHERE statut = 'en_attente'"
+                ).fetchone()[0]
+                self._connexion.execute("COMMIT")
+            except sqlite3.Error:
+                self._connexion.execute("ROLLBACK")
+                raise
+        return lignes, suivant
+
+    def _terminer(self, id_message, statut, tentatives, erreur=None, identifiant=None, prochain_essai=None):
+        maintenant = time.time()
+        with self._verrou:
+            self._connexion.execute(
+                "UPDATE messages SET statut = ?, tentatives = ?, erreur = ?, identifiant = COALESCE(?, identifiant), "
+                "prochain_essai = COALESCE(?, prochain_essai), maj_le = ? WHERE id = ?",
+                (statut, tentatives, erreur, identifiant, prochain_essai, maintenant, id_message),
+            )
+
+    async def _travailler(self):
+        while True:
+            self._reveil.clear()
+            libres = self.concurrence - len(self._en_vol)
+            suivant = None
+            if libres > 0 and not self._arret:
+                try:
+                    lignes, suivant = self._reclamer(libres)
+                except sqlite3.Error:
+                    logger.exception("Lecture de la boîte d'envoi impossible")
+                    lignes, suivant = [], time.time() + 1.0
+                for ligne in lignes:
+                    tache = asyncio.ensure_future(self._envoyer(*ligne))
+                    self._en_vol.add(tache)
+                    tache.add_done_callback(self._fin_envoi)
+            if self._arret:
+                if self._en_vol:
+                    await asyncio.wait(self._en_vol)
+                return
+            attente = 60.0 if suivant is None else min(60.0, max(0.0, suivant - time.time()))
+            try:
+                await asyncio.wait_for(self._reveil.wait(), attente)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fin_envoi(self, tache):
+        self._en_vol.discard(tache)
+        self._reveil.set()
+
+    async def _envoyer(self, id_message, destinataire, texte, tentatives):
+        tentatives += 1
+        await self.seau.acquerir()
+        debut = time.perf_counter()
+        try:
+            message = {
+                "messaging_product": "whatsapp", "to": destinataire, "type": "text",
+                "text": {"preview_url": False, "body": texte},
+            }
+            statut, entetes, corps = await self._boucle.run_in_executor(
+                self._executeur, poster_json, self._http, self.url, message, self.jeton)
+            if statut == 429 or statut >= 500:
+                attente = entetes.get("retry-after")
+                raise ErreurEnvoi(f"HTTP {statut}", attente=float(attente) if attente and attente.isdigit() else None)
+            if statut >= 300:
+                raise ErreurEnvoi(f"HTTP {statut} : {corps[:200].decode('utf-8', 'replace')}", relancer=False)
+            try:
+                identifiant = json.loads(corps)["messages"][0]["id"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                identifiant = None
+        except (urllib3.exceptions.HTTPError, OSError, ErreurEnvoi) as exc:
+            DUREE_ENVOI.observer(time.perf_counter() - debut)
+            relancer = getattr(exc, "relancer", True) and tentatives < self.max_tentatives
+            ENVOIS.inc(resultat="relance" if relancer else "echec")
+            erreur = str(exc) or exc.__class__.__name__
+            if not relancer:
+                logger.warning("Message WhatsApp %s abandonné après %d tentatives : %s", id_message, tentatives, erreur)
+                self._terminer(id_message, "echec", tentatives, erreur)
+                return
+            attente = getattr(exc, "attente", None)
+            if attente is None:
+                attente = min(BACKOFF_MAX, self.backoff_base * 2 ** (tentatives - 1)) * random.uniform(0.5, 1.0)
+            self._terminer(id_message, "en_attente", tentatives, erreur, prochain_essai=time.time() + attente)
+            return
+        DUREE_ENVOI.observer(time.perf_counter() - debut)
+        ENVOIS.inc(resultat="envoye")
+        self._terminer(id_message, "envoye", tentatives, identifiant=identifiant)
+
+
+_boite = None
+_verrou = threading.Lock()
+
+
+def boite_envoi():
+    """Boîte d'envoi partagée par tout le processus, worker démarré à la première utilisation"""
+    global _boite
+    if _boite is None:
+        with _verrou:
+            if _boite is None:
+                _boite = BoiteEnvoi(URL_API, JETON_API).demarrer()
+                atexit.register(_boite.fermer)
+    return _boite
+
+
+def deposer(telephone, texte):
+    """Met un message en file d'envoi ; identifiant du message"""
+    return boite_envoi().deposer(telephone, texte)